@@ -0,0 +1,69 @@
+"""
+Compares the single-pass document cleaner with the original multi-pass one.
+
+Cleans every wording under files/submission_* with both implementations,
+checks that the outputs are identical and prints the median time per
+document. Exits with status 1 if any output differs.
+
+Example:
+    python benchmarks/clean_document.py --runs 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+from reporter.util.document_cleaner import clean_document_multipass, clean_text
+
+# the multi-pass cleaner does not detect running headers and footers
+clean_single_pass = partial(clean_text, detect_headers_footers=False)
+
+FILES = Path(__file__).resolve().parent.parent / "files"
+
+
+def median_ms(clean, text: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        clean(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--files", type=Path, default=FILES)
+    args = parser.parse_args()
+
+    paths = sorted(args.files.glob("submission_*/*.md"))
+    if not paths:
+        sys.exit(f"No wordings found under {args.files}")
+
+    identical = True
+    print(
+        f"{'document':<50} {'size':>9} {'multi-pass':>11} {'single':>9} {'speedup':>8}"
+    )
+    for path in paths:
+        text = path.read_text(encoding="utf-8")
+        if clean_single_pass(text) != clean_document_multipass(text):
+            print(f"{path.name}: outputs differ")
+            identical = False
+            continue
+        before = median_ms(clean_document_multipass, text, args.runs)
+        after = median_ms(clean_single_pass, text, args.runs)
+        name = f"{path.parent.name}/{path.name}"
+        print(
+            f"{name:<50} {len(text):>9,} {before:>9.2f}ms {after:>7.2f}ms "
+            f"{before / after:>7.1f}x"
+        )
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
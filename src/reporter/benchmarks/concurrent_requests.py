@@ -0,0 +1,103 @@
+"""
+Measures how request throughput of a running reporter scales with concurrency.
+
+While the requests are in flight, /health is polled continuously; if the event
+loop is blocked by an endpoint, its latency jumps to the duration of that request.
+
+Example:
+    python benchmarks/concurrent_requests.py --endpoint contractdiff \
+        --payload '{"contract_old": "a.md", "contract_new": "b.md"}' \
+        --concurrency 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def poll_health(
+    client: httpx.AsyncClient, url: str, stop: asyncio.Event
+) -> list[float]:
+    """Polls the health endpoint until `stop` is set and returns latencies (s)."""
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(url)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def run_level(
+    base_url: str, endpoint: str, payload: dict, concurrency: int, rounds: int
+) -> dict:
+    """Sends `concurrency * rounds` requests, `concurrency` at a time."""
+    timeout = httpx.Timeout(None)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        stop = asyncio.Event()
+        health_task = asyncio.create_task(
+            poll_health(client, f"{base_url}/health", stop)
+        )
+
+        statuses = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            responses = await asyncio.gather(
+                *(
+                    client.post(f"{base_url}/{endpoint}", json=payload)
+                    for _ in range(concurrency)
+                )
+            )
+            statuses.extend(r.status_code for r in responses)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        health_latencies = await health_task
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(statuses),
+        "errors": sum(1 for s in statuses if s >= 400),
+        "elapsed": elapsed,
+        "throughput": len(statuses) / elapsed,
+        "health_p50": statistics.median(health_latencies) if health_latencies else 0,
+        "health_max": max(health_latencies) if health_latencies else 0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--endpoint", default="contractdiff")
+    parser.add_argument("--payload", required=True, help="JSON request body.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    payload = json.loads(args.payload)
+    baseline = None
+
+    print(
+        f"{'conc':>5} {'reqs':>5} {'err':>4} {'time s':>8} {'req/s':>7} "
+        f"{'scaling':>8} {'health p50':>11} {'health max':>11}"
+    )
+    for concurrency in args.concurrency:
+        result = await run_level(
+            args.url, args.endpoint, payload, concurrency, args.rounds
+        )
+        baseline = baseline or result["throughput"]
+        print(
+            f"{result['concurrency']:>5} {result['requests']:>5} "
+            f"{result['errors']:>4} {result['elapsed']:>8.2f} "
+            f"{result['throughput']:>7.2f} {result['throughput'] / baseline:>7.2f}x "
+            f"{result['health_p50'] * 1000:>9.1f}ms "
+            f"{result['health_max'] * 1000:>9.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
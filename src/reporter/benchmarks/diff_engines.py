@@ -0,0 +1,56 @@
+"""
+Compares the diff engines on the contract wordings under files/submission_*.
+
+Every pair of wordings of a submission is cleaned and diffed with each
+engine. Prints the median time of untraced runs, the peak memory of one run
+traced with tracemalloc, the number of changed hunks and the number of
+changed characters (lower means a more precise diff).
+
+Example:
+    python benchmarks/diff_engines.py --runs 3 --engines char,line,patience
+"""
+
+import argparse
+import itertools
+import statistics
+from pathlib import Path
+
+from reporter.util.contract_diff import clean_document
+from reporter.util.diff_engines import DIFF_ENGINES, run_diff_engine
+
+FILES = Path(__file__).resolve().parent.parent / "files"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--engines", default=",".join(DIFF_ENGINES))
+    parser.add_argument("--files", type=Path, default=FILES)
+    args = parser.parse_args()
+
+    print(
+        f"{'submission':<24} {'engine':<10} {'time':>8} {'peak mem':>10} "
+        f"{'hunks':>6} {'changed':>9}"
+    )
+    for submission in sorted(args.files.glob("submission_*")):
+        wordings = sorted(submission.glob("*.md"))
+        for old, new in itertools.combinations(wordings, 2):
+            text1 = clean_document(old.read_text(encoding="utf-8"))
+            text2 = clean_document(new.read_text(encoding="utf-8"))
+            for engine in args.engines.split(","):
+                timings = []
+                for _ in range(args.runs):
+                    diffs, stats = run_diff_engine(engine, text1, text2, False)
+                    timings.append(stats["seconds"])
+                _, traced = run_diff_engine(engine, text1, text2, True)
+                changed = sum(len(text) for op, text in diffs if op)
+                print(
+                    f"{submission.name:<24} {engine:<10} "
+                    f"{statistics.median(timings):>7.3f}s "
+                    f"{traced['peak_memory_bytes'] / 1024:>7.0f}KiB "
+                    f"{stats['hunks']:>6} {changed:>9,}"
+                )
+
+
+if __name__ == "__main__":
+    main()
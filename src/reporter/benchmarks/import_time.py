@@ -0,0 +1,85 @@
+"""
+Measures the cold-start import time of the reporter app against a budget.
+
+Runs `python -X importtime -c "import reporter.main"` in fresh interpreters,
+prints the slowest top-level imports and exits with status 1 if the median
+total exceeds the budget. Placeholder settings are used for anything missing
+from the environment; no LLM or S3 connection is made.
+
+Example:
+    python benchmarks/import_time.py --budget-ms 1500 --runs 5
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PLACEHOLDER_ENV = {
+    "S3_BUCKET": "benchmark",
+    "S3_ENDPOINT_URL": "localhost:9000",
+    "S3_ACCESS_KEY": "benchmark",
+    "S3_SECRET_KEY": "benchmark",
+}
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    """Imports `module` in a fresh interpreter and returns
+    (module, nesting depth, cumulative microseconds) per imported module."""
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            imports.append((name, len(indent) // 2, int(cumulative)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="reporter.main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [
+        next(us for name, _, us in imports if name == args.module) / 1000
+        for imports in runs
+    ]
+
+    # slowest imports of the last run that were not pulled in by another one
+    top_level = sorted(
+        ((us, name) for name, depth, us in runs[-1] if depth == 1),
+        reverse=True,
+    )
+    print(f"{'cumulative ms':>13}  module")
+    for us, name in top_level[: args.top]:
+        print(f"{us / 1000:>13.1f}  {name}")
+
+    median = statistics.median(totals)
+    print(
+        f"\n{args.module}: median {median:.1f}ms over {args.runs} runs "
+        f"(min {min(totals):.1f}ms, max {max(totals):.1f}ms), "
+        f"budget {args.budget_ms:.0f}ms"
+    )
+    if median > args.budget_ms:
+        print("Import time budget exceeded.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
-import tempfile
-from pathlib import Path
-
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from reporter.core.config import settings
+from reporter.core.s3 import fetch_objects
+from reporter.core.token_budget import PromptTooLargeError
 from reporter.schemas.contract_diff import DiffRequest, DiffResponse
+from reporter.util.cleaning_rules import UnknownRuleSetError, get_rule_set
 from reporter.util.compare_contracts import compare_contracts
+from reporter.util.diff_engines import UnknownDiffEngineError, get_diff_engine
 
 # --------------------------------------------------------------------------------------
 # router
@@ -18,26 +20,31 @@ router = APIRouter(tags=["contract_diff"])
 # --------------------------------------------------------------------------------------
 @router.post("/contractdiff", response_model=DiffResponse)
 async def analyze_contract_diff(diff_request: DiffRequest):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            temp_dir_path = Path(temp_dir)
+    try:
+        rule_set = get_rule_set(diff_request.cleaning_rules).name
+        if diff_request.diff_engine:
+            get_diff_engine(diff_request.diff_engine)
+    except (UnknownRuleSetError, UnknownDiffEngineError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
 
-            file1_path = str(temp_dir_path / "c1.md")
-            file2_path = str(temp_dir_path / "c2.md")
-            settings.S3_CLIENT.fget_object(
-                bucket_name=settings.S3_BUCKET,
-                object_name=diff_request.contract_old,
-                file_path=file1_path,
-            )
-            settings.S3_CLIENT.fget_object(
-                bucket_name=settings.S3_BUCKET,
-                object_name=diff_request.contract_new,
-                file_path=file2_path,
-            )
-            comp = compare_contracts(file1_path, file2_path)
+    try:
+        downloads = await run_in_threadpool(
+            fetch_objects,
+            settings.S3_BUCKET,
+            [diff_request.contract_old, diff_request.contract_new],
+        )
+        comp = await compare_contracts(
+            downloads[diff_request.contract_old].data,
+            downloads[diff_request.contract_new].data,
+            rule_set,
+            diff_request.diff_engine,
+            diff_request.by_clause,
+        )
 
-            return comp
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, detail=f"Error Processing contracts: {e}"
-            )
+        return comp
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Processing contracts: {e}"
+        ) from e
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+
+from reporter.core.diff_cache import get_diff_cache
+from reporter.core.llm_cache import get_llm_cache
+from reporter.core.object_cache import get_object_cache
+from reporter.core.report_cache import get_report_cache
+from reporter.core.s3 import pool_stats
+from reporter.core.singleflight import single_flight_snapshots
+from reporter.core.token_budget import prompt_token_snapshots
+from reporter.schemas.metrics import MetricsResponse
+
+# --------------------------------------------------------------------------------------
+# router
+# --------------------------------------------------------------------------------------
+router = APIRouter(tags=["metrics"])
+
+
+# --------------------------------------------------------------------------------------
+# routes
+# --------------------------------------------------------------------------------------
+@router.get("/metrics", response_model=MetricsResponse)
+async def get_metrics():
+    return MetricsResponse(
+        s3_pool=pool_stats.snapshot(),
+        object_cache=await run_in_threadpool(get_object_cache().snapshot),
+        llm_cache=await run_in_threadpool(get_llm_cache().snapshot),
+        report_cache=await run_in_threadpool(get_report_cache().snapshot),
+        diff_cache=await run_in_threadpool(get_diff_cache().snapshot),
+        coalescing=single_flight_snapshots(),
+        prompt_tokens=prompt_token_snapshots(),
+    )
@@ -1,11 +1,32 @@
-import tempfile
-from pathlib import Path
+import asyncio
+import json
+from typing import NamedTuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from reporter.core.config import settings
-from reporter.schemas.report import ReportRequest, ReportResponse
-from reporter.util.orchestrator.orchestrator import generate_report_for_client
+from reporter.core.jobs import JobQueue, QueueFullError
+from reporter.core.report_cache import (
+    get_report_cache,
+    normalize_investigation_points,
+    report_cache_key,
+)
+from reporter.core.s3 import (
+    MissingObjectError,
+    ObjectChangedError,
+    fetch_objects,
+    stat_objects,
+)
+from reporter.core.singleflight import get_single_flight
+from reporter.schemas.job import JobResponse
+from reporter.schemas.report import ReportJobResponse, ReportRequest, ReportResponse
+from reporter.util.orchestrator.orchestrator import (
+    generate_report_for_client,
+    get_agent,
+)
+from reporter.util.orchestrator.streaming import Emit
 
 # --------------------------------------------------------------------------------------
 # router
@@ -13,39 +34,272 @@ from reporter.util.orchestrator.orchestrator import generate_report_for_client
 router = APIRouter(tags=["report_generation"])
 
 
+# --------------------------------------------------------------------------------------
+# report generation
+# --------------------------------------------------------------------------------------
+class SubmissionSnapshot(NamedTuple):
+    # ETags of the submission files the client's agent reads
+    etags: dict[str, str]
+    # key of the report generated from exactly these files and request
+    cache_key: str
+
+
+def _object_name(request: ReportRequest, file_name: str) -> str:
+    return f"submission_{request.client.lower()}/{file_name}"
+
+
+async def snapshot_submission(request: ReportRequest) -> SubmissionSnapshot:
+    """Looks up the current ETags of the files the client's agent reads."""
+    agent = get_agent(request.client)
+    input_files = agent.input_files if agent else ()
+    etags = await run_in_threadpool(
+        stat_objects,
+        settings.S3_BUCKET,
+        [_object_name(request, name) for name in input_files],
+    )
+    return SubmissionSnapshot(
+        etags=etags,
+        cache_key=report_cache_key(
+            request.client,
+            etags,
+            request.investigation_points,
+            agent.version if agent else None,
+        ),
+    )
+
+
+async def run_report(
+    request: ReportRequest,
+    emit: Emit | None = None,
+    snapshot: SubmissionSnapshot | None = None,
+) -> dict:
+    """Fetches the submission files the client's agent reads and runs the agent.
+
+    Successful reports are cached until one of the files changes. Concurrent
+    identical requests without `emit` share one generation.
+    """
+    _, result = await _run_report(request, emit, snapshot)
+    return result
+
+
+async def _run_report(
+    request: ReportRequest,
+    emit: Emit | None = None,
+    snapshot: SubmissionSnapshot | None = None,
+) -> tuple[SubmissionSnapshot, dict]:
+    # the report is keyed on the snapshot's ETags, a file that changes before
+    # it is downloaded takes a new snapshot
+    for attempt in range(1, settings.S3_SNAPSHOT_ATTEMPTS + 1):
+        if snapshot is None:
+            snapshot = await snapshot_submission(request)
+        try:
+            return snapshot, await _run_snapshot(request, snapshot, emit)
+        except ObjectChangedError:
+            if attempt == settings.S3_SNAPSHOT_ATTEMPTS:
+                raise
+            snapshot = None
+
+
+async def _run_snapshot(
+    request: ReportRequest,
+    snapshot: SubmissionSnapshot,
+    emit: Emit | None = None,
+) -> dict:
+    cached = await run_in_threadpool(get_report_cache().get, snapshot.cache_key)
+    if cached is not None:
+        if emit:
+            await emit("status", {"stage": "cached"})
+        return json.loads(cached)
+
+    if emit:
+        return await _generate_report(request, snapshot, emit)
+    return await get_single_flight("report").run(
+        snapshot.cache_key, lambda: _generate_report(request, snapshot)
+    )
+
+
+async def _generate_report(
+    request: ReportRequest,
+    snapshot: SubmissionSnapshot,
+    emit: Emit | None = None,
+) -> dict:
+    if emit:
+        await emit("status", {"stage": "download"})
+
+    downloads = await run_in_threadpool(
+        fetch_objects,
+        settings.S3_BUCKET,
+        list(snapshot.etags),
+        etags=snapshot.etags,
+    )
+
+    if emit:
+        await emit(
+            "status",
+            {
+                "stage": "generate",
+                "downloads": [
+                    {
+                        "object_name": download.object_name,
+                        "size": download.size,
+                        "seconds": download.seconds,
+                        "cached": download.cached,
+                    }
+                    for download in downloads.values()
+                ],
+            },
+        )
+
+    agent = get_agent(request.client)
+    result = await generate_report_for_client(
+        client_name=request.client,
+        inputs={
+            name: downloads[_object_name(request, name)].data.decode("utf-8")
+            for name in (agent.input_files if agent else ())
+        },
+        investigation_points=normalize_investigation_points(
+            request.investigation_points
+        ),
+        emit=emit,
+    )
+
+    if not isinstance(result, dict):
+        raise TypeError("Report agent did not return a result")
+
+    if result.get("status") == "success":
+        await run_in_threadpool(
+            get_report_cache().set,
+            snapshot.cache_key,
+            json.dumps(result).encode("utf-8"),
+        )
+
+    return result
+
+
+async def _run_report_job(payload: dict) -> dict:
+    return await run_report(ReportRequest(**payload))
+
+
+report_jobs = JobQueue(
+    kind="report",
+    handler=_run_report_job,
+    workers=settings.REPORT_JOB_WORKERS,
+    max_size=settings.REPORT_JOB_QUEUE_SIZE,
+)
+
+
+def _job_response(job: dict) -> ReportJobResponse:
+    return ReportJobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        error=job["error"],
+        result=job["result"],
+    )
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 # --------------------------------------------------------------------------------------
 # routes
 # --------------------------------------------------------------------------------------
 @router.post("/generate", response_model=ReportResponse)
-async def generate_report_endpoint(request: ReportRequest):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            client_data_dir = Path(temp_dir)
+async def generate_report_endpoint(
+    request: ReportRequest,
+    response: Response,
+    if_none_match: str | None = Header(None),
+):
+    """Generates the report, or returns the cached one if the submission is
+    unchanged. Successful reports carry an ETag; sending it back as
+    If-None-Match returns 304 while neither the submission nor the request
+    have changed."""
+    try:
+        snapshot = await snapshot_submission(request)
+        etag = f'"{snapshot.cache_key}"'
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
 
-            objects = settings.S3_CLIENT.list_objects(
-                bucket_name=settings.S3_BUCKET,
-                prefix=f"submission_{request.client.lower()}",
-                recursive=True,
-            )
+        snapshot, result = await _run_report(request, snapshot=snapshot)
+        if result.get("status") == "success":
+            response.headers["ETag"] = f'"{snapshot.cache_key}"'
+        return result
+    except MissingObjectError as e:
+        raise HTTPException(
+            status_code=404, detail=f"Submission incomplete for {request.client}: {e}"
+        ) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error Processing report: {e}"
+        ) from e
 
-            for obj in objects:
-                object_name = obj.object_name
-                local_file_path = client_data_dir / str(obj.object_name)
 
-                # Download file from MinIO
-                settings.S3_CLIENT.fget_object(
-                    bucket_name=settings.S3_BUCKET,
-                    object_name=str(object_name),
-                    file_path=str(local_file_path),
-                )
+@router.post("/generate/stream")
+async def stream_report_endpoint(request: ReportRequest):
+    """Streams the report as server-sent events.
 
-            result = generate_report_for_client(
-                client_name=request.client,
-                data_path=client_data_dir / f"submission_{request.client.lower()}",
-                investigation_points=request.investigation_points,
-            )
+    `token` events carry LLM output as it arrives and `section` events each
+    finished report section with its calculated values filled in. The final
+    `done` event carries the complete report, `error` a failure.
+    """
+    events: asyncio.Queue = asyncio.Queue()
 
-            return result
+    async def emit(event: str, data: dict):
+        await events.put((event, data))
 
+    async def produce():
+        try:
+            await emit("done", await run_report(request, emit=emit))
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error Processing report: {e}")
+            await emit("error", {"error": f"Error Processing report: {e}"})
+        finally:
+            await events.put(None)
+
+    async def event_stream():
+        task = asyncio.create_task(produce())
+        try:
+            while (item := await events.get()) is not None:
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            # the client went away, stop generating
+            task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/generate/jobs", response_model=JobResponse, status_code=202)
+async def submit_report_job(request: ReportRequest):
+    try:
+        job = await report_jobs.submit(request.model_dump())
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "30"}
+        ) from e
+
+    return _job_response(job)
+
+
+@router.get("/generate/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: str,
+    wait: float = Query(
+        0, ge=0, le=60, description="Seconds to wait for the job to finish."
+    ),
+):
+    if wait:
+        job = await report_jobs.wait(job_id, wait)
+    else:
+        job = await report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown report job: {job_id}")
+
+    return _job_response(job)
@@ -1,6 +1,3 @@
-from typing import List, Optional
-
-from minio import Minio
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings
 
@@ -16,37 +13,116 @@ class Settings(BaseSettings):
     RELOAD: bool = False
 
     # CORS settings
-    CORS_ALLOW_ORIGINS: List[str] = ["*"]
+    CORS_ALLOW_ORIGINS: list[str] = ["*"]
     CORS_ALLOW_CREDENTIALS: bool = True
-    CORS_ALLOW_METHODS: List[str] = ["GET", "POST"]
-    CORS_ALLOW_HEADERS: List[str] = ["*"]
+    CORS_ALLOW_METHODS: list[str] = ["GET", "POST"]
+    CORS_ALLOW_HEADERS: list[str] = ["*"]
 
     # openapi schemas
-    OPENAPI_URL: Optional[str] = None
-    DOCS_URL: Optional[str] = None
-    REDOC_URL: Optional[str] = None
+    OPENAPI_URL: str | None = None
+    DOCS_URL: str | None = None
+    REDOC_URL: str | None = None
 
     # S3 configuration
     S3_BUCKET: str
     S3_REGION: str = "us-east-1"
     S3_ENDPOINT_URL: str
-    S3_ENDPOINT_EXTERNAL_URL: Optional[str] = None
+    S3_ENDPOINT_EXTERNAL_URL: str | None = None
     S3_ACCESS_KEY: SecretStr
     S3_SECRET_KEY: SecretStr
     S3_SECURE: bool = False
 
-    # AI api config
-    GOOGLE_API_KEY: str
-
-    @property
-    def S3_CLIENT(self) -> Minio:
-        return Minio(
-            endpoint=self.S3_ENDPOINT_URL,
-            access_key=self.S3_ACCESS_KEY.get_secret_value(),
-            secret_key=self.S3_SECRET_KEY.get_secret_value(),
-            region=self.S3_REGION,
-            secure=self.S3_SECURE,
-        )
+    # S3 connection pool, shared by all requests of a worker process
+    S3_POOL_MAXSIZE: int = 16
+    S3_CONNECT_TIMEOUT: float = 5.0
+    S3_READ_TIMEOUT: float = 60.0
+    S3_RETRIES: int = 3
+    S3_RETRY_BACKOFF: float = 0.2
+    # parallel object downloads per request, keep at or below S3_POOL_MAXSIZE
+    S3_DOWNLOAD_CONCURRENCY: int = 8
+    # snapshots taken of objects that change while they are downloaded
+    S3_SNAPSHOT_ATTEMPTS: int = 3
+
+    # on-disk cache of S3 object bodies, shared by all worker processes
+    OBJECT_CACHE_PATH: str = "/tmp/flooq-reporter/objects"
+    OBJECT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # AI api config, only needed once an LLM is used
+    GOOGLE_API_KEY: str | None = None
+    # build the shared LLM clients at startup instead of on first use
+    LLM_WARM_UP: bool = True
+
+    # persistent cache of LLM completions, shared by all worker processes
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "/tmp/flooq-reporter/llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # estimated prompt size limits per LLM call, see reporter.core.token_budget;
+    # LLM_PROMPT_BUDGETS overrides the default per call name, e.g. "turkey.pass1"
+    LLM_CHARS_PER_TOKEN: float = 4.0
+    LLM_PROMPT_TOKEN_BUDGET: int = 200_000
+    LLM_PROMPT_BUDGETS: dict[str, int] = {}
+    # how over-budget prompts are reduced: drop, truncate, summarize or none
+    LLM_REDUCTION_STRATEGY: str = "truncate"
+
+    # embedding model of the report retrieval, see reporter.core.llm.get_embed_model:
+    # google, huggingface (a local model, needs llama-index-embeddings-huggingface)
+    # or hashing (local, lexical, no model at all); None -> the backend's default
+    EMBEDDING_BACKEND: str = "google"
+    EMBEDDING_MODEL: str | None = None
+
+    # give the report prompts only the chunks of the submission documents most
+    # relevant to each report section and investigation point instead of the
+    # whole documents, see reporter.util.orchestrator.retrieval
+    REPORT_RETRIEVAL: bool = True
+    RETRIEVAL_CHUNK_TOKENS: int = 256
+    RETRIEVAL_CHUNK_OVERLAP: int = 32
+    RETRIEVAL_TOP_K: int = 3
+
+    # diff summaries above this many tokens are analysed in chunks of at most
+    # this size, ANALYSIS_CONCURRENCY at a time, see reporter.util.significant_analysis
+    ANALYSIS_CHUNK_TOKENS: int = 32000
+    ANALYSIS_CONCURRENCY: int = 4
+
+    # persistent cache of generated reports, keyed by their inputs' ETags
+    REPORT_CACHE_PATH: str = "/tmp/flooq-reporter/report_cache.sqlite3"
+    REPORT_CACHE_TTL_SECONDS: float = 30 * 24 * 3600
+    REPORT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # persistent cache of contract comparison stages, keyed by content hashes
+    DIFF_CACHE_PATH: str = "/tmp/flooq-reporter/diff_cache.sqlite3"
+    DIFF_CACHE_TTL_SECONDS: float = 30 * 24 * 3600
+    DIFF_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # directory of per-client/per-broker document cleaning rule sets (<name>.json)
+    CLEANING_RULES_DIR: str | None = None
+
+    # diff engine used when a request names none, see reporter.util.diff_engines
+    DIFF_ENGINE: str = "char"
+    # report the peak memory of every diff; tracing slows diffing down severalfold,
+    # so the char engine reaches its timeout sooner and returns coarser diffs
+    DIFF_TRACE_MEMORY: bool = False
+    # segment contracts into clauses, align them and diff the pairs in parallel
+    DIFF_BY_CLAUSE: bool = True
+    # leave hunks differing only in whitespace, punctuation, markdown etc. out of
+    # the LLM summary, see reporter.util.hunk_filter
+    DIFF_DROP_COSMETIC: bool = True
+    # count changes of case as cosmetic too; off as wordings capitalise their
+    # defined terms ("insured" -> "Insured")
+    DIFF_COSMETIC_CASE: bool = False
+
+    # worker processes for CPU-bound diff work (None -> number of CPUs)
+    DIFF_PROCESS_WORKERS: int | None = None
+
+    # background report jobs
+    REPORT_JOB_WORKERS: int = 2
+    REPORT_JOB_QUEUE_SIZE: int = 100
+    JOB_STORE_PATH: str = "/tmp/flooq-reporter/jobs.sqlite3"
+    # a worker's claim on a job expires unless renewed, so another process can
+    # run the jobs of one that died; idle workers look for jobs this often
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_POLL_SECONDS: float = 1.0
 
 
 settings = Settings()
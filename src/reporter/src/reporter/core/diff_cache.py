@@ -0,0 +1,16 @@
+from reporter.core.config import settings
+from reporter.core.sqlite_cache import SqliteCache
+
+_diff_cache: SqliteCache | None = None
+
+
+def get_diff_cache() -> SqliteCache:
+    """Returns the cache of contract comparison stages, see `compare_contracts`."""
+    global _diff_cache
+    if _diff_cache is None:
+        _diff_cache = SqliteCache(
+            settings.DIFF_CACHE_PATH,
+            ttl_seconds=settings.DIFF_CACHE_TTL_SECONDS,
+            max_bytes=settings.DIFF_CACHE_MAX_BYTES,
+        )
+    return _diff_cache
@@ -0,0 +1,33 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+
+from reporter.core.config import settings
+
+T = TypeVar("T")
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Returns the shared process pool used for CPU-bound work."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.DIFF_PROCESS_WORKERS)
+    return _process_pool
+
+
+async def run_in_process_pool(func: Callable[..., T], *args: Any) -> T:
+    """Runs a picklable function in the shared process pool without blocking the
+    event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def shutdown_executors() -> None:
+    """Stops the shared process pool, cancelling work that has not started yet."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
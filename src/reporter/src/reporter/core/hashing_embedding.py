@@ -0,0 +1,41 @@
+"""
+A local embedding without a model, for tests and offline use.
+
+Words are hashed into a fixed number of dimensions ("feature hashing") with
+log-scaled counts and the vector is normalized, so the similarity of two
+texts is their lexical overlap. That is much weaker than a trained embedding
+model but deterministic, fast and needs no network or extra packages.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbedding(BaseEmbedding):
+    model_name: str = "hashing"
+    dimensions: int = 1024
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word, count in Counter(_WORD.findall(text.lower())).items():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dimensions] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._embed(text)
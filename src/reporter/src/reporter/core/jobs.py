@@ -0,0 +1,346 @@
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+
+from reporter.core.config import settings
+from reporter.schemas.job import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that has no free slots."""
+
+
+class JobStore:
+    """Persists job state in SQLite so queued jobs survive a restart.
+
+    The store is shared by all worker processes. A job is run by the queue
+    that claimed it, which holds a lease on it (`owner`, `lease_until`) and
+    renews it while the job runs; a job whose lease expired, because its
+    process died, can be claimed again.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            columns = {
+                row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")
+            }
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["status"] = JobStatus(job["status"])
+        return job
+
+    def create(self, kind: str, payload: dict) -> dict:
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    JobStatus.QUEUED.value,
+                    json.dumps(payload),
+                    time.time(),
+                ),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def count(self, kind: str, status: JobStatus) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = ?",
+                (kind, JobStatus(status).value),
+            ).fetchone()[0]
+
+    def claim(self, kind: str, owner: str, lease_seconds: float) -> dict | None:
+        """Atomically claims the oldest queued job of `kind`, or a running one
+        whose lease has expired, for `owner`. Returns it, None if there is
+        none."""
+        now = time.time()
+        # the conditions are checked again on the row itself, so two
+        # processes racing for the same job cannot both claim it
+        claimable = "(status = ? OR (status = ? AND COALESCE(lease_until, 0) < ?))"
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"""
+                UPDATE jobs
+                SET status = ?, owner = ?, lease_until = ?, started_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs WHERE kind = ? AND {claimable}
+                    ORDER BY created_at LIMIT 1
+                ) AND {claimable}
+                RETURNING *
+                """,
+                (
+                    JobStatus.RUNNING.value,
+                    owner,
+                    now + lease_seconds,
+                    now,
+                    kind,
+                    *(JobStatus.QUEUED.value, JobStatus.RUNNING.value, now) * 2,
+                ),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extends the lease of `owner` on a running job, False if it lost it."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (time.time() + lease_seconds, job_id, owner, JobStatus.RUNNING.value),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Puts a job claimed by `owner` back in the queue."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, "
+                "started_at = NULL WHERE id = ? AND owner = ? AND status = ?",
+                (JobStatus.QUEUED.value, job_id, owner, JobStatus.RUNNING.value),
+            )
+
+    def finish(self, job_id: str, owner: str, **fields: Any) -> bool:
+        """Updates a job claimed by `owner`, False if it lost its lease."""
+        fields["status"] = JobStatus(fields["status"]).value
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {columns}, lease_until = NULL "
+                "WHERE id = ? AND owner = ?",
+                (*fields.values(), job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+
+_job_store: JobStore | None = None
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore(settings.JOB_STORE_PATH)
+    return _job_store
+
+
+class JobQueue:
+    """A bounded queue of jobs processed by a fixed number of asyncio workers.
+
+    `handler` receives the job payload and returns a JSON-serialisable result;
+    a result with status "error", as the report agents return, fails the job.
+    The queue lives in the job store, so the workers of all processes share
+    it: every worker claims the next job atomically and holds a lease on it
+    for `settings.JOB_LEASE_SECONDS`, renewed while the job runs. Jobs of a
+    process that died are claimed again once their lease has expired; jobs
+    of a process shut down are put back in the queue.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        handler: Callable[[dict], Awaitable[dict]],
+        workers: int,
+        max_size: int,
+    ):
+        self.kind = kind
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        # identifies this process's claims in the shared store
+        self.owner = uuid.uuid4().hex
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._done: dict[str, asyncio.Event] = {}
+        # ids of the jobs the workers of this process are running
+        self._running: set[str] = set()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.kind}-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, payload: dict) -> dict:
+        if self._wakeup is None:
+            raise RuntimeError(f"{self.kind} job queue has not been started")
+        store = get_job_store()
+        queued = await run_in_threadpool(store.count, self.kind, JobStatus.QUEUED)
+        if queued >= self.max_size:
+            raise QueueFullError(
+                f"{self.kind} job queue is full ({self.max_size} jobs waiting)"
+            )
+        job = await run_in_threadpool(store.create, self.kind, payload)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        job = await run_in_threadpool(get_job_store().get, job_id)
+        return job if job and job["kind"] == self.kind else None
+
+    async def wait(self, job_id: str, seconds: float) -> dict | None:
+        """Returns the job once it has finished or `seconds` have passed.
+
+        Jobs run by this process signal when they finish, the store is polled
+        every `settings.JOB_POLL_SECONDS` for jobs run by other processes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + seconds
+        try:
+            job = await self.get(job_id)
+            while job is not None and job["status"] not in (
+                JobStatus.SUCCEEDED,
+                JobStatus.FAILED,
+            ):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done = self._done.setdefault(job_id, asyncio.Event())
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(
+                        done.wait(), min(remaining, settings.JOB_POLL_SECONDS)
+                    )
+                job = await self.get(job_id)
+            return job
+        finally:
+            # the worker running a job drops its event once it has finished,
+            # nothing would drop those of jobs run by other processes
+            if job_id not in self._running:
+                self._done.pop(job_id, None)
+
+    async def _next_job(self) -> dict:
+        """Claims the next job, waiting for a submission or polling the store
+        for jobs of other processes while there is none."""
+        store = get_job_store()
+        while True:
+            self._wakeup.clear()
+            job = await run_in_threadpool(
+                store.claim, self.kind, self.owner, settings.JOB_LEASE_SECONDS
+            )
+            if job is not None:
+                # there may be more, let another idle worker look
+                self._wakeup.set()
+                return job
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_SECONDS)
+
+    async def _keep_lease(self, job_id: str) -> None:
+        store = get_job_store()
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            renewed = await run_in_threadpool(
+                store.renew, job_id, self.owner, settings.JOB_LEASE_SECONDS
+            )
+            if not renewed:
+                logger.warning(f"Lost the lease on {self.kind} job {job_id}")
+                return
+
+    async def _worker(self) -> None:
+        """Runs jobs until cancelled. Errors of the store are logged and
+        retried after a delay, doubled up to `settings.JOB_LEASE_SECONDS`
+        while they last, so a worker never dies of them."""
+        backoff = settings.JOB_POLL_SECONDS
+        while True:
+            try:
+                await self._run(await self._next_job())
+                backoff = settings.JOB_POLL_SECONDS
+            except Exception:
+                logger.exception(f"{self.kind} worker failed, retrying in {backoff:g}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, settings.JOB_LEASE_SECONDS)
+
+    async def _run(self, job: dict) -> None:
+        store = get_job_store()
+        job_id = job["id"]
+        self._running.add(job_id)
+        lease = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            result = await self.handler(job["payload"])
+            if isinstance(result, dict) and result.get("status") == "error":
+                fields = {
+                    "status": JobStatus.FAILED,
+                    "result": result,
+                    "error": result.get("error") or f"{self.kind} job failed",
+                }
+            else:
+                fields = {"status": JobStatus.SUCCEEDED, "result": result}
+        except asyncio.CancelledError:
+            # shutting down, let another worker run the job; the event
+            # loop is going away, so this is done right here
+            store.release(job_id, self.owner)
+            self._running.discard(job_id)
+            raise
+        except Exception as e:
+            logger.exception(f"{self.kind} job {job_id} failed")
+            fields = {"status": JobStatus.FAILED, "error": str(e)}
+        finally:
+            lease.cancel()
+        try:
+            finished = await run_in_threadpool(
+                store.finish, job_id, self.owner, finished_at=time.time(), **fields
+            )
+            if not finished:
+                logger.warning(
+                    f"{self.kind} job {job_id} finished after losing its lease"
+                )
+        finally:
+            self._running.discard(job_id)
+            done = self._done.pop(job_id, None)
+            if done is not None:
+                done.set()
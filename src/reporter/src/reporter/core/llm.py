@@ -0,0 +1,134 @@
+"""
+LLM and embedding clients, constructed on first use and shared by all requests.
+
+llama_index and the Google GenAI SDK take seconds to import and their clients
+need GOOGLE_API_KEY, so neither is imported or built when the app is imported.
+Constructing a GoogleGenAI client also fetches the model's metadata, and each
+client owns its HTTP connection pool, so clients are built once per model and
+temperature and then reused; `warm_up_llms` builds them at startup. Their
+completions are cached, see `reporter.core.llm_cache`. Embedding models come
+from one of the `EMBEDDING_BACKENDS`, `hashing` needs neither a model nor the
+network and stands in for the others in tests.
+"""
+
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from functools import cache
+from typing import TYPE_CHECKING
+
+from reporter.core.config import settings
+from reporter.core.llm_cache import CachedLLM, get_llm_cache
+
+if TYPE_CHECKING:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.llms import LLM
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL_NAME = "models/gemini-2.0-flash"
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+LOCAL_EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
+_llms: dict[tuple[str, float | None], "LLM"] = {}
+_llms_lock = threading.Lock()
+
+
+def get_llm(
+    model_name: str = ANALYSIS_MODEL_NAME, temperature: float | None = None
+) -> "LLM":
+    """Returns the shared LLM client for `model_name` and `temperature`."""
+    key = (model_name, temperature)
+    llm = _llms.get(key)
+    if llm is not None:
+        return llm
+
+    with _llms_lock:
+        llm = _llms.get(key)
+        if llm is None:
+            from llama_index.llms.google_genai import GoogleGenAI
+
+            logger.info(f"Initializing LLM {model_name} (temperature {temperature})")
+            llm = GoogleGenAI(
+                model=model_name,
+                temperature=temperature,
+                api_key=settings.GOOGLE_API_KEY,
+            )
+            if settings.LLM_CACHE_ENABLED:
+                llm = CachedLLM(llm, model_name, temperature, get_llm_cache())
+            _llms[key] = llm
+    return llm
+
+
+def warm_up_llms(models: Iterable[tuple[str, float | None]]) -> None:
+    """Builds the clients for the given (model name, temperature) pairs.
+
+    Failures are logged and not raised, so the app still starts; the client is
+    then built, or the error raised, on first use.
+    """
+    for model_name, temperature in models:
+        try:
+            get_llm(model_name, temperature)
+        except Exception as e:
+            logger.warning(f"Could not initialize LLM {model_name}: {e}")
+
+
+def _google_embedding(model_name: str | None) -> "BaseEmbedding":
+    from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
+
+    return GoogleGenAIEmbedding(
+        model_name=model_name or EMBEDDING_MODEL_NAME, api_key=settings.GOOGLE_API_KEY
+    )
+
+
+def _huggingface_embedding(model_name: str | None) -> "BaseEmbedding":
+    try:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    except ImportError:
+        raise ImportError(
+            "The huggingface embedding backend needs the "
+            "llama-index-embeddings-huggingface package"
+        ) from None
+
+    return HuggingFaceEmbedding(model_name=model_name or LOCAL_EMBEDDING_MODEL_NAME)
+
+
+def _hashing_embedding(model_name: str | None) -> "BaseEmbedding":
+    from reporter.core.hashing_embedding import HashingEmbedding
+
+    return HashingEmbedding()
+
+
+# Builds the embedding model of a backend from a model name, None for its default
+EMBEDDING_BACKENDS: dict[str, Callable[[str | None], "BaseEmbedding"]] = {
+    "google": _google_embedding,
+    "huggingface": _huggingface_embedding,
+    "hashing": _hashing_embedding,
+}
+
+
+class UnknownEmbeddingBackendError(Exception):
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(
+            f"Unknown embedding backend {name!r}, "
+            f"available: {', '.join(EMBEDDING_BACKENDS)}"
+        )
+
+
+def get_embed_model(
+    backend: str | None = None, model_name: str | None = None
+) -> "BaseEmbedding":
+    """Returns the shared embedding model of `backend` (`settings.EMBEDDING_BACKEND`
+    if None) called `model_name` (`settings.EMBEDDING_MODEL` if None, then the
+    backend's default)."""
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise UnknownEmbeddingBackendError(backend)
+    return _embed_model(backend, model_name or settings.EMBEDDING_MODEL)
+
+
+@cache
+def _embed_model(backend: str, model_name: str | None) -> "BaseEmbedding":
+    logger.info(f"Initializing {backend} embedding model {model_name or 'default'}")
+    return EMBEDDING_BACKENDS[backend](model_name)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+
+from fastapi.concurrency import run_in_threadpool
+
+from reporter.core.config import settings
+from reporter.core.sqlite_cache import SqliteCache
+
+_llm_cache: SqliteCache | None = None
+
+
+def get_llm_cache() -> SqliteCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SqliteCache(
+            settings.LLM_CACHE_PATH,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+        )
+    return _llm_cache
+
+
+class CachedLLM:
+    """Wraps an LLM client and answers repeated completions from the response
+    cache, keyed by a hash of the model, temperature, prompt and arguments.
+
+    `complete`, `acomplete` and `astream_complete` are cached; everything else
+    is passed through to the client. Empty responses are not cached.
+    """
+
+    def __init__(
+        self, llm, model_name: str, temperature: float | None, cache: SqliteCache
+    ):
+        self.llm = llm
+        self.model_name = model_name
+        self.temperature = temperature
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _key(self, prompt: str, kwargs: dict) -> str:
+        payload = json.dumps(
+            [self.model_name, self.temperature, prompt, kwargs],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _response(text: str, delta: str | None = None):
+        from llama_index.core.llms import CompletionResponse
+
+        return CompletionResponse(text=text, delta=delta)
+
+    def complete(self, prompt: str, **kwargs):
+        key = self._key(prompt, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self._response(cached.decode("utf-8"))
+
+        response = self.llm.complete(prompt, **kwargs)
+        if response.text:
+            self.cache.set(key, response.text.encode("utf-8"))
+        return response
+
+    async def acomplete(self, prompt: str, **kwargs):
+        key = self._key(prompt, kwargs)
+        cached = await run_in_threadpool(self.cache.get, key)
+        if cached is not None:
+            return self._response(cached.decode("utf-8"))
+
+        response = await self.llm.acomplete(prompt, **kwargs)
+        if response.text:
+            await run_in_threadpool(self.cache.set, key, response.text.encode("utf-8"))
+        return response
+
+    async def astream_complete(self, prompt: str, **kwargs):
+        key = self._key(prompt, kwargs)
+        cached = await run_in_threadpool(self.cache.get, key)
+        if cached is not None:
+            text = cached.decode("utf-8")
+
+            async def replay():
+                yield self._response(text, delta=text)
+
+            return replay()
+
+        stream = await self.llm.astream_complete(prompt, **kwargs)
+
+        async def record():
+            text = ""
+            async for chunk in stream:
+                text += chunk.delta or ""
+                yield chunk
+            # only reached if the stream was consumed completely
+            if text:
+                await run_in_threadpool(self.cache.set, key, text.encode("utf-8"))
+
+        return record()
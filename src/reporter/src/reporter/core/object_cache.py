@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from reporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ObjectCache:
+    """A size-bounded, least-recently-used cache of S3 object bodies on disk.
+
+    Entries are keyed by bucket, object name and ETag, so a changed object is
+    never served from the cache. Every entry is a single file written
+    atomically, which lets all worker processes on a host share the cache
+    directory. The access time of an entry is its file's mtime.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, bucket: str, object_name: str, etag: str) -> Path:
+        key = "/".join((bucket, object_name, etag.strip('"')))
+        return self.path / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, bucket: str, object_name: str, etag: str) -> bytes | None:
+        entry = self._entry(bucket, object_name, etag)
+        try:
+            data = entry.read_bytes()
+            os.utime(entry)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, bucket: str, object_name: str, etag: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        # write to a temporary file first, so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry(bucket, object_name, etag))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Returns (mtime, size, path) of every complete entry."""
+        entries = []
+        for entry in self.path.iterdir():
+            if entry.suffix == ".tmp":
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # removed by another worker in the meantime
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            logger.info(f"Evicted {entry.name} ({size} bytes) from the object cache")
+
+    def snapshot(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_object_cache: ObjectCache | None = None
+
+
+def get_object_cache() -> ObjectCache:
+    global _object_cache
+    if _object_cache is None:
+        _object_cache = ObjectCache(
+            settings.OBJECT_CACHE_PATH, settings.OBJECT_CACHE_MAX_BYTES
+        )
+    return _object_cache
@@ -0,0 +1,62 @@
+import hashlib
+import json
+
+from reporter.core.config import settings
+from reporter.core.sqlite_cache import SqliteCache
+
+_report_cache: SqliteCache | None = None
+
+
+def get_report_cache() -> SqliteCache:
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = SqliteCache(
+            settings.REPORT_CACHE_PATH,
+            ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+            max_bytes=settings.REPORT_CACHE_MAX_BYTES,
+        )
+    return _report_cache
+
+
+def normalize_investigation_points(points: list[str] | None) -> list[str]:
+    """Collapses whitespace in the points and drops empty ones, keeping order."""
+    normalized = (" ".join(point.split()) for point in points or [])
+    return [point for point in normalized if point]
+
+
+def report_cache_key(
+    client: str,
+    etags: dict[str, str],
+    investigation_points: list[str] | None,
+    agent_version: str | None,
+) -> str:
+    """Returns the key of a report generated from the input objects with the
+    given ETags, so it changes as soon as any input object changes. The
+    retrieval and prompt budget settings are part of the key, they change the
+    agents' prompts."""
+    payload = json.dumps(
+        {
+            "client": client.lower(),
+            "etags": {name: etag.strip('"') for name, etag in etags.items()},
+            "investigation_points": normalize_investigation_points(
+                investigation_points
+            ),
+            "agent_version": agent_version,
+            "retrieval": settings.REPORT_RETRIEVAL
+            and [
+                settings.EMBEDDING_BACKEND,
+                settings.EMBEDDING_MODEL,
+                settings.RETRIEVAL_CHUNK_TOKENS,
+                settings.RETRIEVAL_CHUNK_OVERLAP,
+                settings.RETRIEVAL_TOP_K,
+            ],
+            "prompt_budget": [
+                settings.LLM_CHARS_PER_TOKEN,
+                settings.LLM_PROMPT_TOKEN_BUDGET,
+                settings.LLM_PROMPT_BUDGETS,
+                settings.LLM_REDUCTION_STRATEGY,
+            ],
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,284 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import certifi
+import urllib3
+from minio import Minio
+from minio.error import S3Error
+from urllib3.connection import HTTPConnection
+from urllib3.util import Retry, Timeout
+
+from reporter.core.config import settings
+from reporter.core.object_cache import get_object_cache
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Thread-safe counters describing how the S3 connection pool is used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.max_in_use = 0
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.new_connections = 0
+
+    def record_acquire(self, waited: bool, wait_seconds: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += wait_seconds
+
+    def record_release(self) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def record_new_connection(self) -> None:
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "maxsize": settings.S3_POOL_MAXSIZE,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "new_connections": self.new_connections,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _InstrumentedPoolMixin:
+    """Records connection checkouts, waits for a free connection and new
+    connections of a urllib3 connection pool in `pool_stats`."""
+
+    def _new_conn(self):
+        pool_stats.record_new_connection()
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        # all connections are checked out, this call blocks until one is returned
+        waited = self.pool is not None and self.pool.empty()
+        start = time.perf_counter()
+        conn = super()._get_conn(timeout)
+        pool_stats.record_acquire(waited, time.perf_counter() - start)
+        return conn
+
+    def _put_conn(self, conn):
+        pool_stats.record_release()
+        super()._put_conn(conn)
+
+
+class _InstrumentedHTTPConnectionPool(
+    _InstrumentedPoolMixin, urllib3.HTTPConnectionPool
+):
+    pass
+
+
+class _InstrumentedHTTPSConnectionPool(
+    _InstrumentedPoolMixin, urllib3.HTTPSConnectionPool
+):
+    pass
+
+
+def _build_http_client() -> urllib3.PoolManager:
+    http_client = urllib3.PoolManager(
+        num_pools=4,
+        maxsize=settings.S3_POOL_MAXSIZE,
+        # wait for a free connection instead of opening throwaway ones
+        block=True,
+        timeout=Timeout(
+            connect=settings.S3_CONNECT_TIMEOUT, read=settings.S3_READ_TIMEOUT
+        ),
+        retries=Retry(
+            total=settings.S3_RETRIES,
+            backoff_factor=settings.S3_RETRY_BACKOFF,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        # keep idle pooled connections alive through proxies and NAT
+        socket_options=[
+            *HTTPConnection.default_socket_options,
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ],
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+    http_client.pool_classes_by_scheme = {
+        "http": _InstrumentedHTTPConnectionPool,
+        "https": _InstrumentedHTTPSConnectionPool,
+    }
+    return http_client
+
+
+@lru_cache(maxsize=1)
+def get_s3_client() -> Minio:
+    """Returns the process-wide MinIO client, shared by all endpoints."""
+    return Minio(
+        endpoint=settings.S3_ENDPOINT_URL,
+        access_key=settings.S3_ACCESS_KEY.get_secret_value(),
+        secret_key=settings.S3_SECRET_KEY.get_secret_value(),
+        region=settings.S3_REGION,
+        secure=settings.S3_SECURE,
+        http_client=_build_http_client(),
+    )
+
+
+class MissingObjectError(Exception):
+    """Raised when objects that are required do not exist in the bucket."""
+
+    def __init__(self, object_names: list[str]):
+        self.object_names = object_names
+        super().__init__(f"Missing objects: {', '.join(object_names)}")
+
+
+class ObjectChangedError(Exception):
+    """Raised when objects changed between their stat and their download."""
+
+    def __init__(self, object_names: list[str]):
+        self.object_names = object_names
+        super().__init__(f"Objects changed: {', '.join(object_names)}")
+
+
+@dataclass
+class ObjectDownload:
+    object_name: str
+    size: int
+    seconds: float
+    cached: bool = False
+    data: bytes = field(default=b"", repr=False)
+
+
+def stat_objects(
+    bucket: str, object_names: list[str], max_workers: int | None = None
+) -> dict[str, str]:
+    """Returns the current ETag of each of the given objects, keyed by name.
+
+    Raises `MissingObjectError` naming every object that does not exist.
+    Blocking; call it from a worker thread.
+    """
+    s3_client = get_s3_client()
+
+    def stat(object_name: str) -> str | None:
+        try:
+            return s3_client.stat_object(
+                bucket_name=bucket, object_name=object_name
+            ).etag
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers or settings.S3_DOWNLOAD_CONCURRENCY,
+        thread_name_prefix="s3-stat",
+    ) as pool:
+        etags = list(pool.map(stat, object_names))
+
+    missing = [
+        name for name, etag in zip(object_names, etags, strict=True) if etag is None
+    ]
+    if missing:
+        raise MissingObjectError(missing)
+    return dict(zip(object_names, etags, strict=True))
+
+
+def fetch_objects(
+    bucket: str,
+    object_names: list[str],
+    max_workers: int | None = None,
+    etags: dict[str, str] | None = None,
+) -> dict[str, ObjectDownload]:
+    """Fetches the given objects into memory, keyed by object name.
+
+    All objects are first revalidated with `stat_objects`, unless their
+    `etags` are passed in, so a missing object fails the call before any body
+    is transferred. Bodies whose ETag is in the local object cache are served
+    from it; the rest are downloaded on up to `max_workers` threads and added
+    to the cache. Every body is fetched with If-Match on its ETag, so the
+    downloads are exactly the snapshot of the ETags. An object changed since
+    its stat raises `ObjectChangedError` if `etags` were passed in; otherwise
+    the objects are stat'ed again, up to `settings.S3_SNAPSHOT_ATTEMPTS`
+    times. Blocking; call it from a worker thread.
+    """
+    s3_client = get_s3_client()
+    cache = get_object_cache()
+
+    def fetch(object_name: str) -> ObjectDownload:
+        start = time.perf_counter()
+        etag = etags[object_name]
+        data = cache.get(bucket, object_name, etag)
+        if data is not None:
+            return ObjectDownload(
+                object_name, len(data), time.perf_counter() - start, True, data
+            )
+
+        try:
+            response = s3_client.get_object(
+                bucket_name=bucket,
+                object_name=object_name,
+                request_headers={"If-Match": f'"{etag}"'},
+            )
+        except S3Error as e:
+            if e.code == "PreconditionFailed":
+                raise ObjectChangedError([object_name]) from e
+            if e.code == "NoSuchKey":
+                raise MissingObjectError([object_name]) from e
+            raise
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        cache.put(bucket, object_name, etag, data)
+
+        download = ObjectDownload(
+            object_name, len(data), time.perf_counter() - start, False, data
+        )
+        logger.info(
+            f"Downloaded {download.object_name} "
+            f"({download.size} bytes) in {download.seconds:.3f}s"
+        )
+        return download
+
+    start = time.perf_counter()
+    snapshot = etags is None
+    attempts = settings.S3_SNAPSHOT_ATTEMPTS if snapshot else 1
+    for attempt in range(1, attempts + 1):
+        if snapshot:
+            etags = stat_objects(bucket, object_names, max_workers)
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max_workers or settings.S3_DOWNLOAD_CONCURRENCY,
+                thread_name_prefix="s3-download",
+            ) as pool:
+                downloads = list(pool.map(fetch, object_names))
+            break
+        except ObjectChangedError as e:
+            if attempt == attempts:
+                raise
+            logger.info(f"{e}, fetching a new snapshot")
+
+    logger.info(
+        f"Fetched {len(downloads)} objects "
+        f"({sum(d.size for d in downloads)} bytes, "
+        f"{sum(d.cached for d in downloads)} cached) "
+        f"in {time.perf_counter() - start:.3f}s"
+    )
+    return {download.object_name: download for download in downloads}
@@ -0,0 +1,59 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one computation.
+
+    The first caller for a key starts the computation, callers arriving while
+    it is in flight wait for it and share its result or exception. The
+    computation runs as its own task, so it is not cancelled when one of its
+    callers goes away.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # avoid "exception was never retrieved" if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+_single_flights: dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Returns the process-wide `SingleFlight` group called `name`."""
+    if name not in _single_flights:
+        _single_flights[name] = SingleFlight()
+    return _single_flights[name]
+
+
+def single_flight_snapshots() -> dict[str, dict]:
+    return {name: group.snapshot() for name, group in _single_flights.items()}
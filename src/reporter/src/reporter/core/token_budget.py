@@ -0,0 +1,230 @@
+"""
+Prompt token budgets for the LLM calls.
+
+Every LLM call has a name ("turkey.pass1", "analysis", ...) and a budget of
+prompt tokens, `settings.LLM_PROMPT_BUDGETS[name]` or else
+`settings.LLM_PROMPT_TOKEN_BUDGET`. Tokens are estimated from the prompt
+length, which is good enough to size prompts without a tokenizer round trip.
+
+Prompts embedding several sources (terms, submission info, contract) are
+written with the `placeholder` of every source in place of its text and
+built by `fit_prompt`. If the prompt is over budget, the sources of lowest
+priority are reduced first, with one of `REDUCTION_STRATEGIES`
+(`settings.LLM_REDUCTION_STRATEGY` by default). `check_prompt` is the
+pre-flight check right before a call; it records the prompt size per call
+and raises `PromptTooLargeError` rather than sending a prompt over budget.
+"""
+
+import logging
+import math
+import re
+import threading
+import uuid
+from typing import NamedTuple
+
+from reporter.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# drop: leave the source out, truncate: keep its beginning, summarize: have the
+# LLM summarize it (truncating what is still over), none: fail the call
+REDUCTION_STRATEGIES = ("drop", "truncate", "summarize", "none")
+
+# budget name of the LLM calls summarizing sources for `fit_sources`
+SUMMARIZE_CALL = "summarize"
+
+
+class PromptTooLargeError(Exception):
+    def __init__(self, call: str, tokens: int, budget: int):
+        self.call = call
+        self.tokens = tokens
+        self.budget = budget
+        super().__init__(
+            f"Prompt of {call} has about {tokens} tokens, over its budget of {budget}"
+        )
+
+
+# Unique per process, so no text can contain a placeholder by chance
+_PLACEHOLDER_ID = uuid.uuid4().hex
+_PLACEHOLDER = re.compile(f"\0{_PLACEHOLDER_ID}:([^\0]*)\0")
+
+
+class ContextSource(NamedTuple):
+    name: str
+    text: str
+    # sources of lower priority are reduced first
+    priority: int = 0
+
+    @property
+    def placeholder(self) -> str:
+        """Stands for the text of the source in a prompt for `fit_prompt`."""
+        return f"\0{_PLACEHOLDER_ID}:{self.name}\0"
+
+
+class _PromptStats:
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self.max_tokens = 0
+        self.reduced = 0
+        self.rejected = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "tokens": self.tokens,
+            "max_tokens": self.max_tokens,
+            "reduced": self.reduced,
+            "rejected": self.rejected,
+        }
+
+
+_stats: dict[str, _PromptStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(call: str, **changes: int) -> None:
+    with _stats_lock:
+        stats = _stats.setdefault(call, _PromptStats())
+        for name, value in changes.items():
+            if name == "max_tokens":
+                stats.max_tokens = max(stats.max_tokens, value)
+            else:
+                setattr(stats, name, getattr(stats, name) + value)
+
+
+def prompt_token_snapshots() -> dict[str, dict]:
+    with _stats_lock:
+        return {call: stats.snapshot() for call, stats in _stats.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated number of tokens of `text`."""
+    return math.ceil(len(text) / settings.LLM_CHARS_PER_TOKEN)
+
+
+def get_budget(call: str) -> int:
+    """Prompt token budget of the LLM call named `call`."""
+    return settings.LLM_PROMPT_BUDGETS.get(call, settings.LLM_PROMPT_TOKEN_BUDGET)
+
+
+def check_prompt(call: str, prompt: str) -> int:
+    """Pre-flight check of a prompt: records its estimated size and raises
+    `PromptTooLargeError` if it is over the budget of `call`. Returns the
+    estimated number of tokens."""
+    tokens = estimate_tokens(prompt)
+    budget = get_budget(call)
+    if tokens > budget:
+        _record(call, rejected=1)
+        raise PromptTooLargeError(call, tokens, budget)
+    _record(call, calls=1, tokens=tokens, max_tokens=tokens)
+    return tokens
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """Keeps the beginning of `text`, about `tokens` tokens with the note."""
+    chars = max(0, int((tokens - 20) * settings.LLM_CHARS_PER_TOKEN))
+    omitted = estimate_tokens(text[chars:])
+    return f"{text[:chars]}\n[... truncated, about {omitted} tokens omitted ...]"
+
+
+async def _summarize(source: ContextSource, tokens: int) -> str:
+    from reporter.core.llm import get_llm
+
+    words = max(50, int(tokens * 0.75))
+    instructions = f"""
+Summarize the following document "{source.name}" in at most {words} words.
+Keep every figure, amount, percentage, date, party and defined term exactly as written;
+leave out boilerplate. Output only the summary.
+
+"""
+    # the document may itself be over the budget of the summarizing call
+    allowance = get_budget(SUMMARIZE_CALL) - estimate_tokens(instructions) - 100
+    prompt = instructions + _truncate(source.text, allowance)
+    check_prompt(SUMMARIZE_CALL, prompt)
+    response = await get_llm().acomplete(prompt)
+    return response.text.strip()
+
+
+async def fit_sources(
+    call: str,
+    sources: list[ContextSource],
+    reserved_tokens: int = 0,
+    strategy: str | None = None,
+) -> list[str]:
+    """Returns the texts of `sources`, reduced so that they and the
+    `reserved_tokens` of the rest of the prompt fit the budget of `call`.
+
+    Sources are reduced in order of ascending priority, each only as far as
+    needed, with `strategy` (`settings.LLM_REDUCTION_STRATEGY` if None).
+    Raises `PromptTooLargeError` with the "none" strategy or if the prompt
+    cannot be made to fit.
+    """
+    strategy = strategy or settings.LLM_REDUCTION_STRATEGY
+    if strategy not in REDUCTION_STRATEGIES:
+        raise ValueError(
+            f"Unknown reduction strategy {strategy!r}, "
+            f"available: {', '.join(REDUCTION_STRATEGIES)}"
+        )
+    budget = get_budget(call)
+    texts = [source.text for source in sources]
+    sizes = [estimate_tokens(text) for text in texts]
+    excess = reserved_tokens + sum(sizes) - budget
+    if excess <= 0:
+        return texts
+    if strategy == "none":
+        _record(call, rejected=1)
+        raise PromptTooLargeError(call, budget + excess, budget)
+
+    logger.warning(
+        f"Prompt of {call} is about {excess} tokens over its budget of {budget}, "
+        f"reducing its sources ({strategy})"
+    )
+    for index in sorted(range(len(sources)), key=lambda i: sources[i].priority):
+        if excess <= 0:
+            break
+        source, size = sources[index], sizes[index]
+        allowance = size - excess
+        if strategy == "drop" or allowance <= 0:
+            texts[index] = f"[{source.name} omitted, over the prompt budget]"
+        elif strategy == "summarize":
+            texts[index] = await _summarize(source, allowance)
+            if estimate_tokens(texts[index]) > allowance:
+                texts[index] = _truncate(texts[index], allowance)
+        else:
+            texts[index] = _truncate(source.text, allowance)
+        excess -= size - estimate_tokens(texts[index])
+        logger.info(f"Reduced {source.name} of {call} from {size} tokens")
+
+    if excess > 0:
+        _record(call, rejected=1)
+        raise PromptTooLargeError(call, budget + excess, budget)
+    _record(call, reduced=1)
+    return texts
+
+
+async def fit_prompt(
+    call: str,
+    template: str,
+    sources: list[ContextSource],
+    strategy: str | None = None,
+) -> str:
+    """Builds a prompt from `template`, with the text of every source in
+    place of its `placeholder`, fitted to the budget of `call` as in
+    `fit_sources`, and checks it before it is sent."""
+    names = [source.name for source in sources]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Prompt sources of {call} have duplicate names: {names}")
+
+    def fill(texts: list[str]) -> str:
+        by_name = dict(zip(names, texts, strict=True))
+        return _PLACEHOLDER.sub(lambda match: by_name[match[1]], template)
+
+    texts = [source.text for source in sources]
+    prompt = fill(texts)
+    tokens = estimate_tokens(prompt)
+    if tokens > get_budget(call):
+        reserved = tokens - sum(estimate_tokens(text) for text in texts)
+        prompt = fill(await fit_sources(call, sources, reserved, strategy))
+    check_prompt(call, prompt)
+    return prompt
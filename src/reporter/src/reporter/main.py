@@ -1,13 +1,32 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from reporter.api.v1.endpoints import contract_diff, health, report
+from reporter.api.v1.endpoints import contract_diff, health, metrics, report
 from reporter.core.config import settings
+from reporter.core.executors import shutdown_executors
+from reporter.core.llm import ANALYSIS_MODEL_NAME, warm_up_llms
+from reporter.util.orchestrator.orchestrator import get_agent_models
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.LLM_WARM_UP:
+        await run_in_threadpool(
+            warm_up_llms, [(ANALYSIS_MODEL_NAME, None), *get_agent_models()]
+        )
+    await report.report_jobs.start()
+    yield
+    await report.report_jobs.stop()
+    shutdown_executors()
 
 
 def create_app() -> FastAPI:
     app = FastAPI(
+        lifespan=lifespan,
         title=settings.PROJECT_NAME,
         version=settings.VERSION,
         openapi_url=settings.OPENAPI_URL,
@@ -27,6 +46,7 @@ def create_app() -> FastAPI:
     app.include_router(health.router, prefix="/api/v1")
     app.include_router(contract_diff.router, prefix="/api/v1")
     app.include_router(report.router, prefix="/api/v1")
+    app.include_router(metrics.router, prefix="/api/v1")
 
     return app
 
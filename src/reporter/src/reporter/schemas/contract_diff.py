@@ -1,14 +1,89 @@
-from typing import List
-
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class DiffRequest(BaseModel):
     contract_old: str
     contract_new: str
+    cleaning_rules: str | None = Field(
+        None,
+        description="Cleaning rule set of the client or broker, "
+        "the default rule set if omitted.",
+    )
+    diff_engine: str | None = Field(
+        None,
+        description="Diff engine: char, line, word, patience or histogram, "
+        "the configured default if omitted.",
+    )
+    by_clause: bool | None = Field(
+        None,
+        description="Segment the contracts into clauses, align and diff them "
+        "clause by clause; the configured default if omitted.",
+    )
+
+
+class RemovedCharacters(BaseModel):
+    old: dict[str, int] = Field(..., description="Per rule, in the old contract.")
+    new: dict[str, int] = Field(..., description="Per rule, in the new contract.")
+
+
+class CleaningReport(BaseModel):
+    rule_set: str = Field(..., description="Cleaning rule set that was applied.")
+    removed_characters: RemovedCharacters
+
+
+class DiffStats(BaseModel):
+    engine: str = Field(..., description="Diff engine that was used.")
+    seconds: float = Field(..., description="Wall time of the diff stage.")
+    peak_memory_bytes: int | None = Field(
+        None, description="Largest peak memory allocated by the engine, if traced."
+    )
+    hunks: int = Field(..., description="Changed hunks found by the engine.")
+
+
+class ClauseDiff(BaseModel):
+    clause_id: str = Field(..., description="Id of the clause, e.g. article-3.")
+    old_clause_id: str | None = Field(
+        None, description="Id in the old contract, None if the clause was added."
+    )
+    new_clause_id: str | None = Field(
+        None, description="Id in the new contract, None if the clause was deleted."
+    )
+    title: str
+    status: str = Field(
+        ..., description="One of unchanged, modified, added or deleted."
+    )
+    moved: bool = Field(..., description="Clause moved relative to the others.")
+    renumbered: bool = Field(..., description="Clause id differs between versions.")
+    stats: DiffStats | None = Field(
+        None, description="Statistics of the clause's diff, None if unchanged."
+    )
+
+
+class NumericChange(BaseModel):
+    clause_id: str = Field(..., description="Clause the amount is in.")
+    old_value: float = Field(..., description="Amount in the old contract.")
+    new_value: float = Field(..., description="Amount in the new contract.")
+    unit: str = Field(
+        ..., description='Currency code, "%" or empty for a plain number.'
+    )
+    old_text: str = Field(..., description="Amount as written in the old contract.")
+    new_text: str = Field(..., description="Amount as written in the new contract.")
+    offset: int = Field(
+        ..., description="Offset of the amount in the clause's cleaned new text."
+    )
+    context: str = Field(..., description="Text before the amount.")
 
 
 class DiffResponse(BaseModel):
-    significant_changes: List[str]
+    significant_changes: list[str]
     overall_impression: str
-    suggestions_for_investigation: List[str]
+    suggestions_for_investigation: list[str]
+    cleaning: CleaningReport
+    diff: DiffStats
+    clauses: list[ClauseDiff]
+    numeric_changes: list[NumericChange]
+    change_classes: dict[str, int] = Field(
+        ...,
+        description="Changed hunks per class: substantive or the kind of cosmetic "
+        "change (whitespace, typography, markdown, table, punctuation, case).",
+    )
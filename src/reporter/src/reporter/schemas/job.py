@@ -0,0 +1,23 @@
+from enum import StrEnum
+
+from pydantic import BaseModel, Field
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier used to poll the job.")
+    status: JobStatus = Field(..., description="The current state of the job.")
+    created_at: float = Field(..., description="Submission time (unix seconds).")
+    started_at: float | None = Field(
+        None, description="Time a worker picked the job up (unix seconds)."
+    )
+    finished_at: float | None = Field(
+        None, description="Time the job succeeded or failed (unix seconds)."
+    )
+    error: str | None = Field(None, description="Error message if the job failed.")
@@ -0,0 +1,62 @@
+from pydantic import BaseModel, Field
+
+
+class S3PoolMetrics(BaseModel):
+    maxsize: int = Field(..., description="Connections kept per S3 host.")
+    in_use: int = Field(..., description="Connections currently checked out.")
+    max_in_use: int = Field(..., description="Highest number of connections in use.")
+    acquired: int = Field(..., description="Connection checkouts since startup.")
+    waits: int = Field(
+        ..., description="Checkouts that had to wait for a free connection."
+    )
+    wait_seconds: float = Field(..., description="Total time spent waiting.")
+    new_connections: int = Field(..., description="Connections opened since startup.")
+
+
+class ObjectCacheMetrics(BaseModel):
+    max_bytes: int = Field(..., description="Size limit of the cache.")
+    entries: int = Field(..., description="Objects currently cached.")
+    bytes: int = Field(..., description="Size of the cached objects.")
+    hits: int = Field(..., description="Lookups served from the cache.")
+    misses: int = Field(..., description="Lookups that had to download the object.")
+    evictions: int = Field(..., description="Objects evicted to stay within size.")
+
+
+class CacheMetrics(BaseModel):
+    max_bytes: int = Field(..., description="Size limit of the cache.")
+    ttl_seconds: float = Field(..., description="Age after which entries expire.")
+    entries: int = Field(..., description="Entries currently cached.")
+    bytes: int = Field(..., description="Size of the cached values.")
+    hits: int = Field(..., description="Lookups served from the cache.")
+    misses: int = Field(..., description="Lookups not found or expired.")
+    hit_rate: float = Field(..., description="Share of lookups that were hits.")
+    expirations: int = Field(..., description="Entries dropped after their TTL.")
+    evictions: int = Field(..., description="Entries evicted to stay within size.")
+
+
+class CoalescingMetrics(BaseModel):
+    calls: int = Field(..., description="Computations requested.")
+    coalesced: int = Field(
+        ..., description="Requests that joined an identical in-flight computation."
+    )
+    in_flight: int = Field(..., description="Computations currently running.")
+
+
+class PromptTokenMetrics(BaseModel):
+    calls: int = Field(..., description="Prompts sent within the budget.")
+    tokens: int = Field(..., description="Estimated tokens of the prompts sent.")
+    max_tokens: int = Field(..., description="Estimated tokens of the largest prompt.")
+    reduced: int = Field(
+        ..., description="Prompts whose sources were reduced to fit the budget."
+    )
+    rejected: int = Field(..., description="Prompts rejected as over the budget.")
+
+
+class MetricsResponse(BaseModel):
+    s3_pool: S3PoolMetrics
+    object_cache: ObjectCacheMetrics
+    llm_cache: CacheMetrics
+    report_cache: CacheMetrics
+    diff_cache: CacheMetrics
+    coalescing: dict[str, CoalescingMetrics]
+    prompt_tokens: dict[str, PromptTokenMetrics]
@@ -1,14 +1,14 @@
-from typing import List, Optional
-
 from pydantic import BaseModel, Field
 
+from reporter.schemas.job import JobResponse
+
 
 class ReportRequest(BaseModel):
     client: str = Field(
         ...,
         description="The client identifier (e.g., 'florida', 'turkey', 'netherlands'). Corresponds to the data subfolder name prefix.",
     )
-    investigation_points: Optional[List[str]] = Field(
+    investigation_points: list[str] | None = Field(
         None, description="A list of specific questions or points to investigate."
     )
     # Add significant_changes_json: Optional[str] = Field(None, description="JSON string for significant changes") later if needed
@@ -21,6 +21,12 @@ class ReportResponse(BaseModel):
     status: str = Field(
         ..., description="The status of the generation process ('success' or 'error')."
     )
-    error: Optional[str] = Field(
+    error: str | None = Field(
         None, description="Error message if the status is 'error'."
     )
+
+
+class ReportJobResponse(JobResponse):
+    result: ReportResponse | None = Field(
+        None, description="The generated report once the job has succeeded."
+    )
@@ -0,0 +1,385 @@
+"""
+Clause-aware contract comparison.
+
+Wordings are segmented into clauses at their numbered articles, sections,
+schedules and appendices and at markdown headings. The clauses of the two
+versions are aligned, including clauses that moved or were renumbered, and
+every changed pair is diffed on its own, so the pairs can be diffed in
+parallel and every change is attributed to a clause.
+"""
+
+import asyncio
+import re
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from reporter.core.executors import run_in_process_pool
+from reporter.util.contract_diff import generate_llm_diff_summary, iter_change_blocks
+from reporter.util.diff_engines import run_diff_engine
+from reporter.util.hunk_filter import (
+    CHANGE_CLASSES,
+    SUBSTANTIVE,
+    filter_cosmetic_changes,
+)
+from reporter.util.numeric_diff import merge_numerical_diffs
+
+# Bump whenever segmentation or alignment change
+CLAUSE_VERSION = "1"
+
+_MAX_HEADING_LENGTH = 80
+_MAX_TITLE_LENGTH = 60
+# Minimum share of common words for clauses to be aligned by their text
+_MIN_SIMILARITY = 0.5
+
+_HEADING = re.compile(
+    r"(?:#{1,6}\s+(?P<markdown>\S.*)"
+    r"|(?P<kind>article|section|clause|schedule|appendix|annex)\s+(?:no\.\s*)?"
+    r"(?P<number>\d+(?:\.\d+)*[a-z]?|[ivxlc]+)"
+    r"(?:\s*[-\u2013:.]\s*(?P<title>.*)|\s+(?P<trailing>[A-Z].*))?)\s*",
+    re.IGNORECASE,
+)
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_WORDS = re.compile(r"\w+")
+
+
+class Clause(NamedTuple):
+    id: str
+    title: str
+    text: str
+
+
+def _slug(text: str) -> str:
+    return _NON_WORD.sub("-", text.lower()).strip("-")
+
+
+def segment_clauses(text: str) -> list[Clause]:
+    """Splits a cleaned wording into clauses, each starting at its heading.
+
+    Text before the first heading becomes the "preamble" clause. Joining the
+    clause texts gives back `text`. A wording without headings is one clause
+    with the id "document".
+    """
+    lines = text.split("\n")
+    starts: list[tuple[int, str, str]] = []  # (line index, id, title)
+    for index, line in enumerate(lines):
+        if len(line) > _MAX_HEADING_LENGTH:
+            continue
+        match = _HEADING.fullmatch(line)
+        if not match:
+            continue
+        if match["markdown"]:
+            title = match["markdown"].strip("# ")
+            clause_id = _slug(title)
+        else:
+            title = (match["title"] or match["trailing"] or "").strip()
+            clause_id = f"{match['kind'].lower()}-{match['number'].lower()}"
+            if not title:
+                # "ARTICLE 1" followed by its title on the next line
+                following = next(
+                    (ln.strip() for ln in lines[index + 1 :] if ln.strip()), ""
+                )
+                if len(following) <= _MAX_TITLE_LENGTH and not following.endswith("."):
+                    title = following
+        if clause_id:
+            starts.append((index, clause_id, title))
+
+    if not starts:
+        return [Clause("document", "", text)]
+
+    if starts[0][0] > 0:
+        starts.insert(0, (0, "preamble", ""))
+    seen: Counter = Counter()
+    clauses = []
+    for position, (start, base_id, title) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(lines)
+        seen[base_id] += 1
+        clause_id = base_id if seen[base_id] == 1 else f"{base_id}-{seen[base_id]}"
+        clause_text = "\n".join(lines[start:end])
+        if end < len(lines):
+            clause_text += "\n"
+        clauses.append(Clause(clause_id, title, clause_text))
+    return clauses
+
+
+def _similarity(words1: set[str], words2: set[str]) -> float:
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def align_clauses(
+    old: list[Clause], new: list[Clause]
+) -> list[tuple[int | None, int | None]]:
+    """Pairs up the clauses of two versions of a wording.
+
+    Clauses are paired by their title when it is unique in both versions
+    (which follows renumbered and moved clauses), then by their id (retitled
+    clauses) and finally by the share of words they have in common. Returns
+    (old index, new index) pairs in the order of the new version, with the
+    old clauses left over inserted after their predecessor; None marks an
+    added or deleted clause.
+    """
+    pairs: dict[int, int] = {}  # new index -> old index
+
+    def match(key_of) -> None:
+        old_keys = Counter(
+            key_of(c) for i, c in enumerate(old) if i not in pairs.values()
+        )
+        new_keys = Counter(key_of(c) for i, c in enumerate(new) if i not in pairs)
+        old_index = {
+            key_of(c): i
+            for i, c in enumerate(old)
+            if i not in pairs.values() and old_keys[key_of(c)] == 1
+        }
+        for j, clause in enumerate(new):
+            key = key_of(clause)
+            if j not in pairs and key and new_keys[key] == 1 and key in old_index:
+                pairs[j] = old_index[key]
+
+    match(lambda clause: _slug(clause.title))
+    match(lambda clause: clause.id)
+
+    old_words = [set(_WORDS.findall(c.text.lower())) for c in old]
+    new_words = [set(_WORDS.findall(c.text.lower())) for c in new]
+    candidates = sorted(
+        (
+            (_similarity(old_words[i], new_words[j]), i, j)
+            for j in range(len(new))
+            if j not in pairs
+            for i in range(len(old))
+            if i not in pairs.values()
+        ),
+        reverse=True,
+    )
+    for similarity, i, j in candidates:
+        if similarity < _MIN_SIMILARITY:
+            break
+        if j not in pairs and i not in pairs.values():
+            pairs[j] = i
+
+    paired_old = set(pairs.values())
+    deleted = [i for i in range(len(old)) if i not in paired_old]
+    aligned: list[tuple[int | None, int | None]] = [
+        (pairs.get(j), j) for j in range(len(new))
+    ]
+    # a deleted clause goes after the pair holding the old clause before it
+    for i in deleted:
+        position = 0
+        for index, (old_index, _) in enumerate(aligned):
+            if old_index is not None and old_index < i:
+                position = index + 1
+        aligned.insert(position, (i, None))
+    return aligned
+
+
+def _moved(aligned: list[tuple[int | None, int | None]]) -> set[int]:
+    """Old indices of the paired clauses that are out of order, i.e. not on
+    the longest run of pairs in the same order in both versions."""
+    old_order = [i for i, j in aligned if i is not None and j is not None]
+    tails: list[int] = []
+    previous: list[int] = [-1] * len(old_order)
+    for index, value in enumerate(old_order):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if old_order[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    in_order = set()
+    index = tails[-1] if tails else -1
+    while index != -1:
+        in_order.add(old_order[index])
+        index = previous[index]
+    return set(old_order) - in_order
+
+
+def pair_clauses(text1: str, text2: str) -> list[dict]:
+    """Segments and aligns two cleaned wordings. Returns one entry per clause
+    pair with the clause ids, title, status ("unchanged", "modified", "added"
+    or "deleted"), whether it moved or was renumbered and both texts."""
+    old, new = segment_clauses(text1), segment_clauses(text2)
+    aligned = align_clauses(old, new)
+    moved = _moved(aligned)
+    pairs = []
+    for i, j in aligned:
+        old_clause = old[i] if i is not None else None
+        new_clause = new[j] if j is not None else None
+        if old_clause is None:
+            status = "added"
+        elif new_clause is None:
+            status = "deleted"
+        elif old_clause.text == new_clause.text:
+            status = "unchanged"
+        else:
+            status = "modified"
+        clause = new_clause or old_clause
+        pairs.append(
+            {
+                "clause_id": clause.id,
+                "old_clause_id": old_clause.id if old_clause else None,
+                "new_clause_id": new_clause.id if new_clause else None,
+                "title": clause.title,
+                "status": status,
+                "moved": i in moved,
+                "renumbered": bool(
+                    old_clause and new_clause and old_clause.id != new_clause.id
+                ),
+                "old_text": old_clause.text if old_clause else "",
+                "new_text": new_clause.text if new_clause else "",
+            }
+        )
+    return pairs
+
+
+async def diff_clauses(
+    text1: str,
+    text2: str,
+    engine: str,
+    trace_memory: bool = False,
+    by_clause: bool = True,
+) -> tuple[list[dict], dict]:
+    """Diffs two cleaned wordings clause by clause with `engine`, the changed
+    clause pairs in parallel across the process pool. If not `by_clause`, the
+    wordings are diffed as one "document" clause.
+
+    Returns the clause pairs of `pair_clauses` with their "diffs" and "stats"
+    of `run_diff_engine` (None for unchanged clauses) in place of the texts,
+    and the overall statistics: wall time, the largest peak memory of a
+    clause and the total number of hunks.
+    """
+    start = time.perf_counter()
+    if by_clause:
+        clauses = await run_in_process_pool(pair_clauses, text1, text2)
+    else:
+        clauses = [
+            {
+                "clause_id": "document",
+                "old_clause_id": "document",
+                "new_clause_id": "document",
+                "title": "",
+                "status": "unchanged" if text1 == text2 else "modified",
+                "moved": False,
+                "renumbered": False,
+                "old_text": text1,
+                "new_text": text2,
+            }
+        ]
+
+    async def diff(clause: dict) -> tuple[list, dict | None]:
+        if clause["status"] == "unchanged" and clause["clause_id"] != "document":
+            return [], None
+        return await run_in_process_pool(
+            run_diff_engine,
+            engine,
+            clause.pop("old_text"),
+            clause.pop("new_text"),
+            trace_memory,
+        )
+
+    results = await asyncio.gather(*(diff(clause) for clause in clauses))
+    for clause, (diffs, stats) in zip(clauses, results, strict=True):
+        clause.pop("old_text", None)
+        clause.pop("new_text", None)
+        clause["diffs"] = diffs
+        clause["stats"] = stats
+
+    stats = [s for _, s in results if s is not None]
+    peaks = [
+        s["peak_memory_bytes"] for s in stats if s["peak_memory_bytes"] is not None
+    ]
+    diff_stats = {
+        "engine": engine,
+        "seconds": time.perf_counter() - start,
+        "peak_memory_bytes": max(peaks) if peaks else None,
+        "hunks": sum(s["hunks"] for s in stats),
+    }
+    return clauses, diff_stats
+
+
+def _clause_label(clause: dict) -> str:
+    label = f"CLAUSE {clause['clause_id']}"
+    if clause["title"]:
+        label += f" ({clause['title']})"
+    notes = [clause["status"]]
+    if clause["renumbered"]:
+        notes.append(f"renumbered from {clause['old_clause_id']}")
+    if clause["moved"]:
+        notes.append("moved")
+    return f"{label}: {', '.join(notes)}"
+
+
+def generate_clause_diff_summary(clauses: list[dict], context_chars=75) -> str:
+    """Generates the summary of diffs for LLM analysis clause by clause.
+
+    `clauses` are the entries of `pair_clauses` with their "diffs". Clauses
+    that only moved or were renumbered, or whose changes were all dropped as
+    cosmetic, are listed without changes; other clauses without changes are
+    left out.
+    """
+    if len(clauses) == 1 and clauses[0]["clause_id"] == "document":
+        return generate_llm_diff_summary(clauses[0]["diffs"], context_chars)
+
+    parts = [f"Summary of Contract Changes by Clause:\n{'=' * 39}\n"]
+    changes = 0
+    for clause in clauses:
+        label = _clause_label(clause)
+        blocks = []
+        if clause["status"] != "unchanged":
+            blocks = list(
+                iter_change_blocks(clause["diffs"], context_chars, changes + 1)
+            )
+        if blocks:
+            parts.append(f"{label}\n{'=' * 30}\n")
+            parts.extend(blocks)
+            changes += len(blocks)
+        elif clause["moved"] or clause["renumbered"]:
+            if clause["status"] == "unchanged":
+                parts.append(f"{label}, text unchanged\n")
+            else:
+                parts.append(f"{label}, cosmetic changes only\n")
+    print(f"LLM summary generated with {changes} change blocks.")
+    return "\n".join(parts)
+
+
+def summarize_clauses(
+    clauses: list[dict], context_chars=75, drop_cosmetic=True, cosmetic_case=False
+) -> tuple[str, list[dict], dict[str, int]]:
+    """Merges the numeric changes of every clause's diffs, classifies their
+    hunks and generates the summary for LLM analysis, without the cosmetic
+    hunks if `drop_cosmetic`. Changes of case are cosmetic only if
+    `cosmetic_case`, see `hunk_filter`.
+
+    Returns the summary, the changed amounts (the fields of
+    `numeric_diff.NumericDelta` and the id of the clause, whose new text the
+    offset refers to) and the number of hunks per class of
+    `hunk_filter.CHANGE_CLASSES`. Pure CPU work, runs in a worker process.
+    """
+    numeric_changes = []
+    change_classes = Counter(dict.fromkeys(CHANGE_CLASSES, 0))
+    for clause in clauses:
+        deltas = []
+        diffs = merge_numerical_diffs(clause["diffs"], deltas)
+        clause["diffs"] = filter_cosmetic_changes(
+            diffs, change_classes, drop_cosmetic, cosmetic_case
+        )
+        numeric_changes.extend(
+            {"clause_id": clause["clause_id"], **delta._asdict()} for delta in deltas
+        )
+    summary = generate_clause_diff_summary(clauses, context_chars)
+    cosmetic = {
+        name: count
+        for name, count in change_classes.items()
+        if name != SUBSTANTIVE and count
+    }
+    if drop_cosmetic and cosmetic:
+        counts = ", ".join(f"{name}: {count}" for name, count in cosmetic.items())
+        summary += f"\n\n{sum(cosmetic.values())} cosmetic changes omitted ({counts})."
+    return summary, numeric_changes, dict(change_classes)
@@ -0,0 +1,122 @@
+"""
+Per-client and per-broker rule sets for `reporter.util.document_cleaner`.
+
+A rule set is a JSON file `<name>.json` in `settings.CLEANING_RULES_DIR`:
+
+    {
+        "extends": "default",
+        "detect_headers_footers": true,
+        "rules": [
+            {"name": "slip_header", "kind": "header_footer", "pattern": "XYZ Re Slip"}
+        ]
+    }
+
+`kind` is one of `document_cleaner.RULE_KINDS`. The rules of the rule set
+named by `extends` (optional) come first, a rule with the same name replaces
+the inherited one. "default" is the built-in `DEFAULT_RULES`. Running
+headers and footers are detected per document as well unless
+`detect_headers_footers` is false. The files are read and validated once per
+process; the compiled cleaners are cached by `document_cleaner.get_cleaner`.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from reporter.core.config import settings
+from reporter.util.document_cleaner import DEFAULT_RULES, RULE_KINDS, Rule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULE_SET = "default"
+
+
+class UnknownRuleSetError(Exception):
+    def __init__(self, name: str, available: list[str]):
+        self.name = name
+        self.available = available
+        super().__init__(
+            f"Unknown cleaning rule set {name!r}, available: {', '.join(available)}"
+        )
+
+
+class RuleSet(NamedTuple):
+    name: str
+    rules: tuple[Rule, ...]
+    detect_headers_footers: bool = True
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the rules, changes whenever the cleaning output may change."""
+        payload = json.dumps(
+            [[list(rule) for rule in self.rules], self.detect_headers_footers]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _parse_rules(path: Path, data: dict) -> list[Rule]:
+    rules = []
+    for entry in data.get("rules", []):
+        try:
+            rule = Rule(entry["name"], entry["kind"], entry["pattern"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{path}: invalid rule {entry!r}") from e
+        if rule.kind not in RULE_KINDS:
+            raise ValueError(f"{path}: unknown kind {rule.kind!r} of rule {rule.name}")
+        try:
+            re.compile(rule.pattern)
+        except re.error as e:
+            raise ValueError(f"{path}: invalid pattern of rule {rule.name}: {e}") from e
+        rules.append(rule)
+    return rules
+
+
+@lru_cache(maxsize=1)
+def load_rule_sets() -> dict[str, RuleSet]:
+    """Reads the rule sets from `settings.CLEANING_RULES_DIR`."""
+    files: dict[str, tuple[str | None, list[Rule], bool]] = {}
+    if settings.CLEANING_RULES_DIR:
+        for path in sorted(Path(settings.CLEANING_RULES_DIR).glob("*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            extends = data.get("extends")
+            files[path.stem.lower()] = (
+                extends.lower() if extends else None,
+                _parse_rules(path, data),
+                bool(data.get("detect_headers_footers", True)),
+            )
+
+    rule_sets = {DEFAULT_RULE_SET: RuleSet(DEFAULT_RULE_SET, DEFAULT_RULES)}
+
+    def resolve(name: str, seen: tuple[str, ...] = ()) -> RuleSet:
+        if name in rule_sets:
+            return rule_sets[name]
+        if name in seen:
+            raise ValueError(f"Cleaning rule sets extend each other: {seen}")
+        if name not in files:
+            raise UnknownRuleSetError(name, [*sorted(files), DEFAULT_RULE_SET])
+        extends, own_rules, detect_headers_footers = files[name]
+        rules = {}
+        if extends:
+            rules = {r.name: r for r in resolve(extends, (*seen, name)).rules}
+        rules.update((rule.name, rule) for rule in own_rules)
+        rule_sets[name] = RuleSet(name, tuple(rules.values()), detect_headers_footers)
+        return rule_sets[name]
+
+    for name in files:
+        resolve(name)
+    logger.info(f"Loaded cleaning rule sets: {', '.join(sorted(rule_sets))}")
+    return rule_sets
+
+
+def get_rule_set(name: str | None = None) -> RuleSet:
+    """Returns the rule set called `name` (case-insensitive), the default rule
+    set if `name` is None."""
+    rule_sets = load_rule_sets()
+    key = (name or DEFAULT_RULE_SET).lower()
+    if key not in rule_sets:
+        raise UnknownRuleSetError(name, sorted(rule_sets))
+    return rule_sets[key]
@@ -1,50 +1,218 @@
+import asyncio
+import hashlib
+import json
 import logging
+from collections.abc import Awaitable, Callable
+from typing import Any, BinaryIO
 
-from diff_match_patch import diff_match_patch
+from fastapi.concurrency import run_in_threadpool
 
-from reporter.util.contract_diff import clean_document, generate_llm_diff_summary
-from reporter.util.significant_analysis import SignificantAnalysis
+from reporter.core.config import settings
+from reporter.core.diff_cache import get_diff_cache
+from reporter.core.executors import run_in_process_pool
+from reporter.core.llm import ANALYSIS_MODEL_NAME
+from reporter.core.singleflight import get_single_flight
+from reporter.util.clause_diff import (
+    CLAUSE_VERSION,
+    diff_clauses,
+    summarize_clauses,
+)
+from reporter.util.cleaning_rules import DEFAULT_RULE_SET, RuleSet, get_rule_set
+from reporter.util.contract_diff import (
+    CLEAN_VERSION,
+    SUMMARY_VERSION,
+    clean_document_with_stats,
+)
+from reporter.util.diff_engines import get_diff_engine
+from reporter.util.significant_analysis import ANALYSIS_VERSION, SignificantAnalysis
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the cached diff stage changes, the engines have their own versions
+DIFF_VERSION = "3"
 
-def compare_contracts(file1_path: str, file2_path: str):
-    """Compares two markdown contract files from MinIO and returns significant change analysis."""
 
-    analysis_json = None
+def _key(stage: str, *parts: str) -> str:
+    return f"{stage}:" + hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
 
-    # 1. Read and Clean Documents
-    with open(file1_path, "r", encoding="utf-8") as f:
-        text1_raw = f.read()
-    with open(file2_path, "r", encoding="utf-8") as f:
-        text2_raw = f.read()
+
+async def _cached_stage(key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Returns the JSON-serialisable result of a pipeline stage from the diff
+    cache, computing and storing it on a miss."""
+    diff_cache = get_diff_cache()
+    cached = await run_in_threadpool(diff_cache.get, key)
+    if cached is not None:
+        logger.info(f"Using cached {key.partition(':')[0]} result.")
+        return json.loads(cached)
+
+    result = await compute()
+    await run_in_threadpool(diff_cache.set, key, json.dumps(result).encode("utf-8"))
+    return result
+
+
+async def compare_contracts(
+    contract_old: str | bytes | BinaryIO,
+    contract_new: str | bytes | BinaryIO,
+    rule_set: str = DEFAULT_RULE_SET,
+    diff_engine: str | None = None,
+    by_clause: bool | None = None,
+):
+    """Compares two markdown contracts from MinIO and returns significant change analysis.
+
+    The contracts are given as text, UTF-8 bytes or binary streams and cleaned
+    with the cleaning rule set called `rule_set`; the characters each rule
+    removed are returned under "cleaning". They are diffed with `diff_engine`
+    (`settings.DIFF_ENGINE` if None), whose statistics are returned under
+    "diff". Unless `by_clause` is false (`settings.DIFF_BY_CLAUSE` if None)
+    the contracts are segmented into clauses, which are aligned and diffed in
+    parallel; the per-clause results are returned under "clauses". Changed
+    amounts (currency, percentages) are returned under "numeric_changes" and
+    the number of cosmetic and substantive hunks under "change_classes";
+    cosmetic hunks are left out of the summary unless
+    `settings.DIFF_DROP_COSMETIC` is false, changes of case only count as
+    cosmetic if `settings.DIFF_COSMETIC_CASE`. The result
+    of every stage (cleaned texts, diff, summary text, analysis) is cached.
+    Stage keys are derived from the contract contents and the versions of
+    the stage and all stages before it, so changing one stage only recomputes
+    the stages from there on. Concurrent comparisons of the same contracts
+    share one computation.
+    """
+    # streams cannot be sent to the worker process, read them here
+    if not isinstance(contract_old, (str, bytes)):
+        contract_old = contract_old.read()
+    if not isinstance(contract_new, (str, bytes)):
+        contract_new = contract_new.read()
+
+    def content_hash(contract: str | bytes) -> str:
+        if isinstance(contract, str):
+            contract = contract.encode("utf-8")
+        return hashlib.sha256(contract).hexdigest()
+
+    rules = get_rule_set(rule_set)
+    engine = (diff_engine or settings.DIFF_ENGINE).lower()
+    get_diff_engine(engine)
+    if by_clause is None:
+        by_clause = settings.DIFF_BY_CLAUSE
+    old_hash = content_hash(contract_old)
+    new_hash = content_hash(contract_new)
+    return await get_single_flight("contract_diff").run(
+        f"{old_hash}:{new_hash}:{rules.fingerprint}:{engine}:{by_clause}",
+        lambda: _compare(
+            contract_old, contract_new, old_hash, new_hash, rules, engine, by_clause
+        ),
+    )
+
+
+async def _compare(
+    contract_old: str | bytes,
+    contract_new: str | bytes,
+    old_hash: str,
+    new_hash: str,
+    rule_set: RuleSet,
+    diff_engine: str,
+    by_clause: bool,
+) -> dict:
+    diff_key = _key(
+        "diff",
+        old_hash,
+        new_hash,
+        CLEAN_VERSION,
+        rule_set.fingerprint,
+        DIFF_VERSION,
+        diff_engine,
+        get_diff_engine(diff_engine).version,
+        CLAUSE_VERSION if by_clause else "document",
+    )
+    summary_key = _key(
+        "summary",
+        diff_key,
+        SUMMARY_VERSION,
+        str(settings.DIFF_DROP_COSMETIC),
+        str(settings.DIFF_COSMETIC_CASE),
+    )
+
+    # 1. Clean Documents, always needed for the removal counts
+    async def clean(contract: str | bytes, contract_hash: str) -> list:
+        return await _cached_stage(
+            _key("clean", contract_hash, CLEAN_VERSION, rule_set.fingerprint),
+            lambda: run_in_process_pool(
+                clean_document_with_stats,
+                contract,
+                rule_set.rules,
+                rule_set.detect_headers_footers,
+            ),
+        )
 
     logger.info("Cleaning documents...")
-    text1 = clean_document(text1_raw)
-    text2 = clean_document(text2_raw)
-    logger.info("Documents cleaned.")
-
-    # 2. Perform Diff
-    logger.info("Performing diff...")
-    dmp = diff_match_patch()
-    diffs = dmp.diff_main(text1, text2)
-    dmp.diff_cleanupSemantic(diffs)
-    logger.info("Diff calculation complete.")
-
-    # 3. Generate Summary Text (with context)
-    logger.info("Generating LLM summary text...")
-    summary_text = generate_llm_diff_summary(diffs)
-    logger.info("LLM summary text generated.")
+    (text1, removed_old), (text2, removed_new) = await asyncio.gather(
+        clean(contract_old, old_hash), clean(contract_new, new_hash)
+    )
+
+    # 2. Perform Diff, returns the clauses with their diffs and the statistics
+    async def diff() -> tuple[list[dict], dict]:
+        logger.info(f"Performing diff ({diff_engine}, by clause: {by_clause})...")
+        return await diff_clauses(
+            text1, text2, diff_engine, settings.DIFF_TRACE_MEMORY, by_clause
+        )
+
+    # 3. Generate Summary Text (with context), the numeric changes and the
+    # number of hunks per class, kept with the diff statistics
+    async def summarize() -> tuple[str, dict, list[dict], list[dict], dict]:
+        clauses, diff_stats = await _cached_stage(diff_key, diff)
+        for clause in clauses:
+            clause["diffs"] = [tuple(d) for d in clause["diffs"]]
+        logger.info("Generating LLM summary text...")
+        summary, numeric_changes, change_classes = await run_in_process_pool(
+            summarize_clauses,
+            clauses,
+            75,
+            settings.DIFF_DROP_COSMETIC,
+            settings.DIFF_COSMETIC_CASE,
+        )
+        for clause in clauses:
+            del clause["diffs"]
+        return summary, diff_stats, clauses, numeric_changes, change_classes
+
+    (
+        summary_text,
+        diff_stats,
+        clauses,
+        numeric_changes,
+        change_classes,
+    ) = await _cached_stage(summary_key, summarize)
 
     # 4. Perform Significant Analysis (JSON Output)
-    logger.info("Running significant changes analysis...")
-    analyzer = SignificantAnalysis(summary_text)
-    analysis_json = analyzer.run_analysis()
-    logger.info("Significant changes analysis complete.")
+    async def analyze() -> dict:
+        logger.info("Running significant changes analysis...")
+        analysis_json = await SignificantAnalysis(summary_text).arun_analysis()
 
-    # Check if analysis itself reported an error
-    if isinstance(analysis_json, dict) and "error" in analysis_json:
-        logger.error(f"Significant analysis failed: {analysis_json['error']}")
-        raise RuntimeError(f"LLM analysis failed: {analysis_json['error']}")
+        # Check if analysis itself reported an error, errors are not cached
+        if isinstance(analysis_json, dict) and "error" in analysis_json:
+            logger.error(f"Significant analysis failed: {analysis_json['error']}")
+            raise RuntimeError(f"LLM analysis failed: {analysis_json['error']}")
+        return analysis_json
+
+    analysis_json = await _cached_stage(
+        _key(
+            "analysis",
+            hashlib.sha256(summary_text.encode("utf-8")).hexdigest(),
+            ANALYSIS_VERSION,
+            ANALYSIS_MODEL_NAME,
+            str(settings.ANALYSIS_CHUNK_TOKENS),
+            str(settings.LLM_CHARS_PER_TOKEN),
+        ),
+        analyze,
+    )
+    logger.info("Significant changes analysis complete.")
 
-    return analysis_json
+    return {
+        **analysis_json,
+        "cleaning": {
+            "rule_set": rule_set.name,
+            "removed_characters": {"old": removed_old, "new": removed_new},
+        },
+        "diff": diff_stats,
+        "clauses": clauses,
+        "numeric_changes": numeric_changes,
+        "change_classes": change_classes,
+    }
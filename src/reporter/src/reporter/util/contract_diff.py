@@ -1,43 +1,50 @@
 import argparse
 import html
 import os
-import re
 import sys
+from collections import Counter
 
 from diff_match_patch import diff_match_patch
 
+from reporter.util.diff_engines import change_runs
+from reporter.util.document_cleaner import DEFAULT_RULES, clean_text
+from reporter.util.numeric_diff import merge_numerical_diffs
 
-def clean_document(text):
-    """Remove page numbers, headers, footers and page break indicators."""
-    # Remove page numbers with various formats
-    text = re.sub(
-        r"^Page\s+\d+\s+X$", "", text, flags=re.MULTILINE
-    )  # Format: "Page 16 X"
-    text = re.sub(r"^Page\s+\d+$", "", text, flags=re.MULTILINE)  # Format: "Page 5"
-    text = re.sub(
-        r"^Page\s+[A-Z]-\d+$", "", text, flags=re.MULTILINE
-    )  # Format: "Page X-5"
+# Bump whenever `clean_document` or `generate_llm_diff_summary` produce different
+# output, this invalidates the cached results of the stage and all later ones
+CLEAN_VERSION = "4"
+SUMMARY_VERSION = "7"
 
-    # Remove page break indicators
-    text = re.sub(r"\*\*---\s*PAGE BREAK\s*---\*\*", "", text)
 
-    # Remove standalone contract headers/footers that often appear at page breaks
-    # (Adjust patterns if needed based on actual contract headers/footers)
-    text = re.sub(r"^\s*Contract X\s*$", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^\s*Broker ABC\s*$", "", text, flags=re.MULTILINE)
-    text = re.sub(
-        r"^\s*2[34]\\X\s*$", "", text, flags=re.MULTILINE
-    )  # Example: 23\X or 24\X (Corrected: Escaped backslash)
+def read_contract(source):
+    """Return the text of a contract given as text, UTF-8 bytes or a binary stream."""
+    if isinstance(source, str):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source).decode("utf-8")
+    return source.read().decode("utf-8")
 
-    # Optional: Remove lines containing "page" anywhere (can be aggressive)
-    # text = re.sub(r'^.*?page\s+\d+.*?$', '', text, flags=re.IGNORECASE|re.MULTILINE)
 
-    # Remove any extra blank lines that might have been created by removals
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # Remove leading/trailing whitespace from the whole document
-    text = text.strip()
+def clean_document(
+    text, rules=DEFAULT_RULES, removed=None, detect_headers_footers=True
+):
+    """Remove page numbers, headers, footers and page break indicators.
 
-    return text
+    The document is cleaned with `rules` in a single pass over its lines, see
+    `reporter.util.document_cleaner`. Running headers and footers repeating at
+    the page breaks are detected and removed as well unless
+    `detect_headers_footers` is false, as in `clean_text`. `removed` counts
+    the characters removed per rule. `text` may also be UTF-8 bytes or a
+    binary stream, see `read_contract`.
+    """
+    return clean_text(read_contract(text), rules, removed, detect_headers_footers)
+
+
+def clean_document_with_stats(text, rules=DEFAULT_RULES, detect_headers_footers=True):
+    """Returns the cleaned document and the characters removed per rule."""
+    removed = Counter()
+    cleaned = clean_document(text, rules, removed, detect_headers_footers)
+    return cleaned, dict(removed)
 
 
 def generate_custom_html_diff(diffs, file1_name, file2_name, text1_len, text2_len):
@@ -133,180 +140,70 @@ def generate_custom_html_diff(diffs, file1_name, file2_name, text1_len, text2_le
     return "".join(html_parts)
 
 
-def merge_numerical_diffs(diffs):
-    """
-    Attempts to merge adjacent numerical diffs with surrounding context.
-    Looks for patterns like [EQUAL, DELETE, INSERT, EQUAL] where DELETE/INSERT
-    are number-like and merges them with number context from EQUAL blocks.
-    """
-    print("Attempting to merge numerical diffs...")
-    new_diffs = []
-    i = 0
-    n = len(diffs)
-    # Allow symbols/space around digits/dots/commas/hyphens, robust to internal whitespace
-    num_part_pattern = re.compile(r"^[^\da-zA-Z]*[\d,\.\s\-]+[^\da-zA-Z]*$")
-    # Prefix: Capture symbol/bracket/space + optional digits/dots/spaces at end
-    prefix_pattern = re.compile(r"([\$\€\£\(\s\{\[])([\d,\.\s]*)$")
-    # Suffix: Capture optional digits/dots/spaces + %/bracket/space/unit/hyphen at start
-    suffix_pattern = re.compile(
-        r"^([\d,\.\s]*)([\%\)\s\}\]kKmMBb\-]|(?:\s*(?:million|billion|thousand)))",
-        re.IGNORECASE,
-    )
+def iter_change_blocks(diffs, context_chars=75, start=1):
+    """Yields the change blocks of a summary of diffs for LLM analysis.
 
-    processed_indices = set()
+    Makes a single pass over the diffs and only keeps the equal text around
+    the current block, never the whole documents. Changes whose context
+    windows would overlap, i.e. that are less than `2 * context_chars` apart,
+    are merged into one block with the unchanged text between them. Blocks
+    are numbered from `start`.
+    """
 
-    while i < n:
-        if i in processed_indices:
-            i += 1
+    def flat(text):
+        return text.replace("\n", " ").strip()
+
+    def block(number, before, hunk, after):
+        lines = [
+            f"\n\n==================== CHANGE {number} ====================",
+            f"CONTEXT_BEFORE: ...{flat(before)}",
+        ]
+        for kind, value in hunk:
+            if kind == 0:
+                lines.append(f"UNCHANGED: {flat(value)}")
+            else:
+                deleted, inserted = value
+                if deleted is None:
+                    deleted = "(No text deleted)"
+                if inserted is None:
+                    inserted = "(No text inserted)"
+                lines.append(f"--- DELETED ---\n{deleted.strip()}")
+                lines.append(f"+++ INSERTED +++\n{inserted.strip()}")
+        lines.append(f"CONTEXT_AFTER: {flat(after)}...")
+        lines.append("=============================================")
+        return "\n".join(lines)
+
+    number = start
+    before = ""  # context before the current block
+    hunk = []  # changes and the short equal runs between them
+    tail = None  # equal run after the last change of the block
+    for kind, value in change_runs(diffs):
+        if kind == 0:
+            if hunk:
+                tail = value
+            else:
+                before = value[max(0, len(value) - context_chars) :]
             continue
-
-        op1, text1 = diffs[i]
-        merged = False  # Flag to track if merge happens
-
-        # Look for EQUAL, DEL/INS, INS/DEL, EQUAL pattern
-        if op1 == 0 and i + 3 < n:
-            op2, text2 = diffs[i + 1]
-            op3, text3 = diffs[i + 2]
-            op4, text4 = diffs[i + 3]
-
-            if op2 != 0 and op3 == -op2 and op4 == 0:
-                # Check if changed parts look number-like (ignoring surrounding whitespace)
-                if num_part_pattern.match(text2.strip()) and num_part_pattern.match(
-                    text3.strip()
-                ):
-                    prefix, text1_remainder = "", text1
-                    prefix_match = prefix_pattern.search(text1)
-                    if prefix_match and (
-                        not prefix_match.group(1).isalnum()
-                        or prefix_match.group(1) in "$€£(["
-                    ):
-                        prefix = prefix_match.group(1) + prefix_match.group(
-                            2
-                        )  # Symbol + digits/spaces
-                        text1_remainder = text1[: prefix_match.start(1)]
-
-                    suffix, text4_remainder = "", text4
-                    suffix_match = suffix_pattern.search(text4)
-                    if suffix_match:
-                        match_grp1 = suffix_match.group(1)  # digits/dots/spaces
-                        match_grp2 = suffix_match.group(2)  # suffix char/unit
-                        if match_grp2 and (
-                            not match_grp2.strip().isalnum()
-                            or match_grp2.strip().lower()
-                            in [
-                                "k",
-                                "m",
-                                "b",
-                                "%",
-                                "-",
-                                "million",
-                                "thousand",
-                                "billion",
-                            ]
-                            or match_grp2 in ")]}"
-                        ):
-                            suffix = match_grp1 + match_grp2
-                            text4_remainder = text4[
-                                suffix_match.end(0) :
-                            ]  # Use end(0) to get end of entire match
-
-                    # If we found a prefix or suffix, perform merge
-                    if prefix or suffix:
-                        print(
-                            f"  Merging: '{prefix}{text2.strip()}{suffix}' vs '{prefix}{text3.strip()}{suffix}'"
-                        )
-                        if text1_remainder:
-                            new_diffs.append((0, text1_remainder))
-                        new_diffs.append((op2, prefix + text2 + suffix))
-                        new_diffs.append((op3, prefix + text3 + suffix))
-                        if text4_remainder:
-                            new_diffs.append((0, text4_remainder))
-
-                        processed_indices.update([i, i + 1, i + 2, i + 3])
-                        i += 4
-                        merged = True  # Mark merge occurred
-                        # No 'continue' here, let loop check 'merged' flag
-
-        # Default: If no merge happened, process current diff normally
-        if not merged:
-            new_diffs.append((op1, text1))
-            # Mark this index as processed since we are adding it to new_diffs
-            processed_indices.add(i)
-            i += 1  # Only increment by 1 if no merge happened
-
-    print(f"Finished merging. Original diffs: {n}, Merged diffs: {len(new_diffs)}")
-    return new_diffs
+        if tail is not None:
+            if len(tail) < 2 * context_chars:
+                hunk.append((0, tail))
+            else:
+                yield block(number, before, hunk, tail[:context_chars])
+                number += 1
+                before = tail[len(tail) - context_chars :]
+                hunk = []
+            tail = None
+        hunk.append((kind, value))
+    if hunk:
+        yield block(number, before, hunk, (tail or "")[:context_chars])
 
 
 def generate_llm_diff_summary(diffs, context_chars=75):
     """Generates a summary of diffs suitable for LLM analysis, including context."""
     summary_parts = ["Summary of Contract Changes:\n==============================\n"]
-    change_count = 0
-    text1_pos = 0
-    text2_pos = 0
-    # Reconstruct original texts to easily get context
-    original_text1 = "".join([text for op, text in diffs if op != 1])
-    original_text2 = "".join([text for op, text in diffs if op != -1])
-
-    processed_insertion_index = -1  # To skip adjacent insertions already handled
-
-    for i, (op, data) in enumerate(diffs):
-        if i == processed_insertion_index:
-            continue  # Skip insertion that was handled along with previous deletion
-
-        current_len = len(data)
-        if op == 0:  # Equal
-            text1_pos += current_len
-            text2_pos += current_len
-        elif op == -1 or op == 1:  # Deletion or Insertion
-            change_count += 1
-            summary_parts.append(
-                f"\n\n==================== CHANGE {change_count} ===================="
-            )
-
-            # --- Calculate Context --- Context based on position *before* this change
-            start_context1 = max(0, text1_pos - context_chars)
-            # Use original_text1 for context before deletion/change start
-            context_before = (
-                original_text1[start_context1:text1_pos].replace("\n", " ").strip()
-            )
-            summary_parts.append(f"CONTEXT_BEFORE: ...{context_before}")
-
-            # --- Process Change --- Handle deletions and adjacent/standalone insertions
-            deleted_text = "(No text deleted)"
-            inserted_text = "(No text inserted)"
-
-            if op == -1:  # Deletion
-                deleted_text = data.strip()
-                text1_pos += current_len
-                # Check for adjacent insertion
-                if i + 1 < len(diffs) and diffs[i + 1][0] == 1:
-                    inserted_text = diffs[i + 1][1].strip()
-                    text2_pos += len(diffs[i + 1][1])  # Advance text2 pointer
-                    processed_insertion_index = i + 1  # Mark insertion as processed
-            elif op == 1:  # Standalone Insertion (already checked it wasn't processed)
-                inserted_text = data.strip()
-                text2_pos += current_len
-                # text1_pos remains unchanged for standalone insertion
-
-            summary_parts.append(f"--- DELETED ---\n{deleted_text}")
-            summary_parts.append(f"+++ INSERTED +++\n{inserted_text}")
-
-            # --- Context After --- Context based on position *after* this change in the *new* text
-            end_context2 = min(len(original_text2), text2_pos + context_chars)
-            context_after = (
-                original_text2[text2_pos:end_context2].replace("\n", " ").strip()
-            )
-            summary_parts.append(f"CONTEXT_AFTER: {context_after}...")
-
-            summary_parts.append("=============================================")
-
+    summary_parts.extend(iter_change_blocks(diffs, context_chars))
     summary = "\n".join(summary_parts)
-    print(f"LLM summary generated with {change_count} change blocks.")
-    # Optional: Print a snippet for verification
-    # print("\n--- LLM Diff Summary Snippet ---")
-    # print(summary[:2000]) # Print first 2000 chars
-    # print("--- End Snippet ---")
+    print(f"LLM summary generated with {len(summary_parts) - 1} change blocks.")
     return summary
 
 
@@ -342,7 +239,7 @@ def main():
     except FileNotFoundError as e:
         print(f"Error: File not found - {e}", file=sys.stderr)
         sys.exit(1)
-    except Exception as e:
+    except (OSError, UnicodeDecodeError) as e:
         print(f"Error reading files: {e}", file=sys.stderr)
         sys.exit(1)
 
@@ -367,7 +264,10 @@ def main():
     print("Diff cleaned up.")
 
     # Merge numerical diffs
+    print("Merging numerical diffs...")
+    n = len(diffs)
     diffs = merge_numerical_diffs(diffs)
+    print(f"Finished merging. Original diffs: {n}, Merged diffs: {len(diffs)}")
 
     # Generate HTML representation of the diff using the custom function
     print("Generating HTML...")
@@ -391,7 +291,7 @@ def main():
         with open(output_filename, "w", encoding="utf-8") as f_out:
             f_out.write(output_content)  # Write the generated HTML directly
         print(f"HTML diff saved to {output_filename}")
-    except Exception as e:
+    except OSError as e:
         print(f"Error writing HTML file: {e}", file=sys.stderr)
         sys.exit(1)
 
@@ -418,7 +318,7 @@ def main():
         with open(summary_filename, "w", encoding="utf-8") as f:
             f.write(llm_summary)
         print(f"LLM summary saved to {summary_filename}")
-    except Exception as e:
+    except OSError as e:
         print(f"Error writing LLM summary file: {e}", file=sys.stderr)
 
 
@@ -0,0 +1,384 @@
+"""
+Diff engines for cleaned contract wordings.
+
+`char` is the character-level `diff_main` of diff-match-patch, which on long
+wordings either hits its `Diff_Timeout` and returns coarse diffs or spends a
+lot of CPU. The other engines first diff coarse tokens and then refine only
+the changed hunks character by character:
+
+- `line` and `word` encode every distinct line or word as one character
+  (`diff_linesToChars`) and run `diff_main` on the encoded texts.
+- `patience` anchors on lines that occur exactly once in both texts.
+- `histogram` splits at the common line that occurs least often.
+
+All engines return diff-match-patch style (op, text) pairs after
+`diff_cleanupSemantic`. `run_diff_engine` also reports how long the engine
+took and its peak memory allocation.
+"""
+
+import re
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from typing import NamedTuple
+
+from diff_match_patch import diff_match_patch
+
+Diffs = list[tuple[int, str]]
+
+DELETE, EQUAL, INSERT = -1, 0, 1
+
+
+def _dmp() -> diff_match_patch:
+    return diff_match_patch()
+
+
+def _split_lines(text: str) -> list[str]:
+    """Splits `text` into lines, keeping the newline at the end of each."""
+    lines = text.split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+_WORD = re.compile(r"\s+|[^\s]+")
+
+
+def _tokens_to_chars(
+    tokens1: list[str], tokens2: list[str]
+) -> tuple[str, str, list[str]]:
+    """Encodes every distinct token as one character, like `diff_linesToChars`
+    does for lines."""
+    token_array = [""]  # index 0 is unused, as in diff-match-patch
+    token_hash: dict[str, int] = {}
+
+    def encode(tokens: list[str]) -> str:
+        chars = []
+        for token in tokens:
+            if token not in token_hash:
+                token_array.append(token)
+                token_hash[token] = len(token_array) - 1
+            chars.append(chr(token_hash[token]))
+        return "".join(chars)
+
+    return encode(tokens1), encode(tokens2), token_array
+
+
+def _diff_tokens(text1: str, text2: str, tokenize: Callable[[str], list[str]]):
+    dmp = _dmp()
+    chars1, chars2, token_array = _tokens_to_chars(tokenize(text1), tokenize(text2))
+    diffs = dmp.diff_main(chars1, chars2, False)
+    dmp.diff_charsToLines(diffs, token_array)
+    return diffs
+
+
+def _refine(diffs: Diffs, by_words: bool = True) -> Diffs:
+    """Refines every changed hunk, replacing its deleted and inserted text by
+    their word-level diff (if `by_words`) and then the changed words by their
+    character-level diff, and cleans the result up semantically. Diffing a
+    large hunk character by character at once would be as slow as diffing
+    the whole documents."""
+    dmp = _dmp()
+    refined: Diffs = []
+    deleted: list[str] = []
+    inserted: list[str] = []
+
+    def flush():
+        if deleted and inserted:
+            text1, text2 = "".join(deleted), "".join(inserted)
+            if by_words:
+                refined.extend(
+                    _refine(_diff_tokens(text1, text2, _WORD.findall), False)
+                )
+            else:
+                refined.extend(dmp.diff_main(text1, text2, False))
+        elif deleted:
+            refined.append((DELETE, "".join(deleted)))
+        elif inserted:
+            refined.append((INSERT, "".join(inserted)))
+        deleted.clear()
+        inserted.clear()
+
+    for op, text in diffs:
+        if op == DELETE:
+            deleted.append(text)
+        elif op == INSERT:
+            inserted.append(text)
+        else:
+            flush()
+            refined.append((EQUAL, text))
+    flush()
+
+    dmp.diff_cleanupMerge(refined)
+    dmp.diff_cleanupSemantic(refined)
+    return refined
+
+
+def change_runs(diffs: Diffs):
+    """Groups diffs into runs: (EQUAL, text), or (None, (deleted, inserted))
+    for consecutive deletions and insertions, None if there was none."""
+    equal: list[str] = []
+    deleted: list[str] = []
+    inserted: list[str] = []
+
+    def change():
+        return None, (
+            "".join(deleted) if deleted else None,
+            "".join(inserted) if inserted else None,
+        )
+
+    for op, data in diffs:
+        if op == EQUAL:
+            if deleted or inserted:
+                yield change()
+                deleted, inserted = [], []
+            equal.append(data)
+        else:
+            if equal:
+                yield EQUAL, "".join(equal)
+                equal = []
+            (deleted if op == DELETE else inserted).append(data)
+    if deleted or inserted:
+        yield change()
+    elif equal:
+        yield EQUAL, "".join(equal)
+
+
+def _from_line_ops(ops: list[tuple[int, str]]) -> Diffs:
+    """Joins consecutive per-line operations into (op, text) pairs."""
+    diffs: Diffs = []
+    for op, line in ops:
+        if diffs and diffs[-1][0] == op:
+            diffs[-1] = (op, diffs[-1][1] + line)
+        else:
+            diffs.append((op, line))
+    return diffs
+
+
+def diff_chars(text1: str, text2: str) -> Diffs:
+    """Character-level `diff_main` with the default timeout."""
+    dmp = _dmp()
+    diffs = dmp.diff_main(text1, text2)
+    dmp.diff_cleanupSemantic(diffs)
+    return diffs
+
+
+def diff_lines(text1: str, text2: str) -> Diffs:
+    dmp = _dmp()
+    chars1, chars2, line_array = dmp.diff_linesToChars(text1, text2)
+    diffs = dmp.diff_main(chars1, chars2, False)
+    dmp.diff_charsToLines(diffs, line_array)
+    return _refine(diffs)
+
+
+def diff_words(text1: str, text2: str) -> Diffs:
+    return _refine(_diff_tokens(text1, text2, _WORD.findall), by_words=False)
+
+
+def _diff_line_ranges(
+    a: list[str],
+    b: list[str],
+    split: Callable[[list[str], list[str], int, int, int, int], tuple | None],
+) -> Diffs:
+    """Diffs two lists of lines by repeatedly splitting the ranges at matching
+    blocks chosen by `split`.
+
+    `split(a, b, alo, ahi, blo, bhi)` returns a list of (i, j, size) matching
+    blocks inside the ranges, in order, or None if the ranges have nothing in
+    common it can anchor on. Ranges are processed with an explicit stack, so
+    long documents do not hit the recursion limit.
+    """
+    ops: list[tuple[int, str]] = []
+    stack = [("range", 0, len(a), 0, len(b))]
+    while stack:
+        task, alo, ahi, blo, bhi = stack.pop()
+        if task == "equal":
+            ops.extend((EQUAL, line) for line in a[alo:ahi])
+            continue
+
+        # common prefix and suffix
+        prefix = 0
+        while (
+            alo + prefix < ahi
+            and blo + prefix < bhi
+            and a[alo + prefix] == b[blo + prefix]
+        ):
+            prefix += 1
+        suffix = 0
+        while (
+            ahi - suffix > alo + prefix
+            and bhi - suffix > blo + prefix
+            and a[ahi - suffix - 1] == b[bhi - suffix - 1]
+        ):
+            suffix += 1
+        ops.extend((EQUAL, line) for line in a[alo : alo + prefix])
+        if suffix:
+            stack.append(("equal", ahi - suffix, ahi, bhi - suffix, bhi))
+        alo, blo, ahi, bhi = alo + prefix, blo + prefix, ahi - suffix, bhi - suffix
+
+        blocks = split(a, b, alo, ahi, blo, bhi) if alo < ahi and blo < bhi else None
+        if not blocks:
+            ops.extend((DELETE, line) for line in a[alo:ahi])
+            ops.extend((INSERT, line) for line in b[blo:bhi])
+            continue
+
+        # push in reverse so the ranges are processed in document order
+        tasks = []
+        i, j = alo, blo
+        for bi, bj, size in blocks:
+            tasks.append(("range", i, bi, j, bj))
+            tasks.append(("equal", bi, bi + size, bj, bj + size))
+            i, j = bi + size, bj + size
+        tasks.append(("range", i, ahi, j, bhi))
+        stack.extend(reversed(tasks))
+    return _from_line_ops(ops)
+
+
+def _patience_split(a, b, alo, ahi, blo, bhi):
+    """Matches the lines occurring exactly once in both ranges and keeps the
+    longest run of them that is in the same order in both (patience sorting)."""
+    counts_a = Counter(a[alo:ahi])
+    counts_b = Counter(b[blo:bhi])
+    positions_b = {
+        line: j for j, line in enumerate(b[blo:bhi], blo) if counts_b[line] == 1
+    }
+    pairs = [
+        (i, positions_b[line])
+        for i, line in enumerate(a[alo:ahi], alo)
+        if counts_a[line] == 1 and line in positions_b
+    ]
+    if not pairs:
+        return None
+
+    # longest increasing subsequence of the b positions
+    tails: list[int] = []  # index into pairs of the smallest tail per length
+    previous = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if pairs[tails[middle]][1] < j:
+                low = middle + 1
+            else:
+                high = middle
+        if low:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    anchors = []
+    index = tails[-1]
+    while index != -1:
+        anchors.append(pairs[index])
+        index = previous[index]
+    return [(i, j, 1) for i, j in reversed(anchors)]
+
+
+def _histogram_split(a, b, alo, ahi, blo, bhi):
+    """Matches the common line occurring least often in the first range,
+    extended to the longest run of equal lines around it."""
+    counts_a = Counter(a[alo:ahi])
+    best = None
+    for j, line in enumerate(b[blo:bhi], blo):
+        count = counts_a.get(line)
+        if count and (best is None or count < best[0]):
+            best = (count, j)
+            if count == 1:
+                break
+    if best is None:
+        return None
+
+    j = best[1]
+    i = a.index(b[j], alo, ahi)
+    start_i, start_j = i, j
+    while start_i > alo and start_j > blo and a[start_i - 1] == b[start_j - 1]:
+        start_i, start_j = start_i - 1, start_j - 1
+    end_i, end_j = i + 1, j + 1
+    while end_i < ahi and end_j < bhi and a[end_i] == b[end_j]:
+        end_i, end_j = end_i + 1, end_j + 1
+    return [(start_i, start_j, end_i - start_i)]
+
+
+def diff_patience(text1: str, text2: str) -> Diffs:
+    lines = _diff_line_ranges(_split_lines(text1), _split_lines(text2), _patience_split)
+    return _refine(lines)
+
+
+def diff_histogram(text1: str, text2: str) -> Diffs:
+    lines = _diff_line_ranges(
+        _split_lines(text1), _split_lines(text2), _histogram_split
+    )
+    return _refine(lines)
+
+
+class DiffEngine(NamedTuple):
+    diff: Callable[[str, str], Diffs]
+    # Bump whenever the engine produces different diffs
+    version: str
+
+
+DIFF_ENGINES = {
+    "char": DiffEngine(diff_chars, "1"),
+    "line": DiffEngine(diff_lines, "1"),
+    "word": DiffEngine(diff_words, "1"),
+    "patience": DiffEngine(diff_patience, "1"),
+    "histogram": DiffEngine(diff_histogram, "1"),
+}
+
+
+class UnknownDiffEngineError(Exception):
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(
+            f"Unknown diff engine {name!r}, available: {', '.join(DIFF_ENGINES)}"
+        )
+
+
+def get_diff_engine(name: str) -> DiffEngine:
+    try:
+        return DIFF_ENGINES[name.lower()]
+    except KeyError:
+        raise UnknownDiffEngineError(name) from None
+
+
+def run_diff_engine(
+    name: str, text1: str, text2: str, trace_memory: bool = True
+) -> tuple[Diffs, dict]:
+    """Diffs two cleaned documents with the engine called `name`.
+
+    Returns the diffs and the engine's statistics: wall time in seconds, peak
+    memory allocated while diffing (traced with `tracemalloc`, which also
+    slows the diff down; None if `trace_memory` is false) and the number of
+    changed hunks. This is pure CPU work and runs in a worker process, away
+    from the event loop.
+    """
+    engine = get_diff_engine(name)
+    if trace_memory:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    diffs = engine.diff(text1, text2)
+    seconds = time.perf_counter() - start
+
+    peak_memory_bytes = None
+    if trace_memory:
+        peak_memory_bytes = tracemalloc.get_traced_memory()[1] - baseline
+        if not tracing:
+            tracemalloc.stop()
+
+    stats = {
+        "engine": name.lower(),
+        "seconds": seconds,
+        "peak_memory_bytes": peak_memory_bytes,
+        "hunks": sum(1 for op, _ in diffs if op != EQUAL),
+    }
+    return diffs, stats
@@ -0,0 +1,98 @@
+"""
+Classification of changed hunks as cosmetic or substantive.
+
+Many hunks of a cleaned wording's diff only differ in whitespace, smart
+quotes and dashes, markdown emphasis, table padding or punctuation. A hunk
+is cosmetic if its deleted and inserted text become equal after the
+normalizations of `_NORMALIZATIONS`, applied one after the other; its class
+is the first normalization that makes them equal. Case is only cosmetic if
+asked for: wordings capitalise their defined terms, so "insured" becoming
+"Insured" may well change what a clause refers to. Cosmetic hunks can be
+dropped from the diffs before the summary for the LLM is generated. Numbers
+should be merged first (`numeric_diff.merge_numerical_diffs`), so a changed
+decimal point is no punctuation change.
+"""
+
+import re
+from collections import Counter
+
+from reporter.util.diff_engines import DELETE, EQUAL, INSERT, Diffs, change_runs
+
+SUBSTANTIVE = "substantive"
+
+_TYPOGRAPHY = str.maketrans(
+    {
+        "\u2018": "'",  # left single quotation mark
+        "\u2019": "'",  # right single quotation mark
+        "\u201a": "'",  # single low-9 quotation mark
+        "\u201b": "'",  # single high-reversed-9 quotation mark
+        "\u201c": '"',  # left double quotation mark
+        "\u201d": '"',  # right double quotation mark
+        "\u201e": '"',  # double low-9 quotation mark
+        "\u201f": '"',  # double high-reversed-9 quotation mark
+        "\u2013": "-",  # en dash
+        "\u2014": "-",  # em dash
+        "\u00a0": " ",  # no-break space
+    }
+)
+_WHITESPACE = re.compile(r"\s+")
+_MARKDOWN = re.compile(r"[*_`~#\\]")
+_TABLE = re.compile(r"\||:?-{3,}:?")
+# quotes, brackets, ;:!? and dashes; a minus sign or a separator between
+# digits is no punctuation ("-5" is no "5", "1.5" no "15"), and currency,
+# percent, comparison and plus signs are always substantive
+_PUNCTUATION = re.compile(
+    r"[\"'()\[\]{};:!?\u2013\u2014]|-(?!\d)|[.,](?!\d)|(?<!\d)[.,]"
+)
+
+_NORMALIZATIONS = (
+    ("whitespace", lambda text: _WHITESPACE.sub("", text)),
+    ("typography", lambda text: text.translate(_TYPOGRAPHY)),
+    ("markdown", lambda text: _MARKDOWN.sub("", text)),
+    ("table", lambda text: _TABLE.sub("", text)),
+    ("punctuation", lambda text: _PUNCTUATION.sub("", text)),
+)
+_CASE = ("case", str.lower)
+
+CHANGE_CLASSES = (*(name for name, _ in _NORMALIZATIONS), _CASE[0], SUBSTANTIVE)
+
+
+def classify_change(
+    deleted: str | None, inserted: str | None, case: bool = False
+) -> str:
+    """Returns the class of the change of `deleted` into `inserted`, one of
+    `CHANGE_CLASSES`. Changes of case are substantive unless `case`."""
+    old, new = deleted or "", inserted or ""
+    normalizations = (*_NORMALIZATIONS, _CASE) if case else _NORMALIZATIONS
+    for name, normalize in normalizations:
+        old, new = normalize(old), normalize(new)
+        if old == new:
+            return name
+    return SUBSTANTIVE
+
+
+def filter_cosmetic_changes(
+    diffs: Diffs, counts: Counter | None = None, drop: bool = True, case: bool = False
+) -> Diffs:
+    """Classifies every hunk of `diffs`, counting the hunks per class in
+    `counts`; changes of case are cosmetic only if `case`. If `drop`,
+    cosmetic hunks are replaced by their inserted text as equal text, so
+    they do not show up as changes."""
+    filtered: Diffs = []
+    for op, text in change_runs(diffs):
+        if op == EQUAL:
+            filtered.append((EQUAL, text))
+            continue
+        deleted, inserted = text
+        change_class = classify_change(deleted, inserted, case)
+        if counts is not None:
+            counts[change_class] += 1
+        if drop and change_class != SUBSTANTIVE:
+            if inserted:
+                filtered.append((EQUAL, inserted))
+            continue
+        if deleted is not None:
+            filtered.append((DELETE, deleted))
+        if inserted is not None:
+            filtered.append((INSERT, inserted))
+    return filtered
@@ -0,0 +1,219 @@
+"""
+Numeric changes between contract wordings.
+
+Character diffs split amounts: "USD 5,000,000" -> "USD 7,500,000" typically
+comes out as an equal "USD ", a deleted "5" and an inserted "7", an equal
+",", ... `merge_numerical_diffs` joins such changes with the digits, currency
+and units around them into one deletion and insertion of the whole amounts,
+in a single pass over the diffs, and parses the amounts into `NumericDelta`s
+so limit, retention and premium changes can be reported without the LLM.
+"""
+
+import re
+from typing import NamedTuple
+
+from reporter.util.diff_engines import DELETE, EQUAL, INSERT, change_runs
+
+# Characters of the text before an amount reported as its context
+CONTEXT_CHARS = 40
+
+_CURRENCY_CODES = {
+    "$": "USD",
+    "€": "EUR",
+    "£": "GBP",
+    "¥": "JPY",
+    "₺": "TRY",
+    "TL": "TRY",
+}
+_CURRENCY = r"[$€£¥₺]|\b(?:USD|EUR|GBP|CHF|JPY|TRY|TL)\b"
+_MAGNITUDES = {
+    "k": 1e3,
+    "thousand": 1e3,
+    "m": 1e6,
+    "mn": 1e6,
+    "million": 1e6,
+    "b": 1e9,
+    "bn": 1e9,
+    "billion": 1e9,
+}
+# words may follow the number after a space, single letters only directly
+# ("5m", not "10,000 m" of a distance or "1,000 b)" of a list)
+_MAGNITUDE_WORD = r"(?i:thousand|million|billion|mn|bn)\b"
+_MAGNITUDE_LETTER = r"(?i:k|m|b)\b"
+_PERCENT = r"%|(?i:percent|per cent)\b"
+
+# Digits and currency at the end of the equal text before a change
+_PREFIX = re.compile(rf"(?:(?:{_CURRENCY})\s?)?(?:\d[\d.,]*)?$")
+# Digits and units at the start of the equal text after a change
+_SUFFIX = re.compile(
+    rf"(?:[\d.,]*\d)?"
+    rf"(?:\s?(?:{_PERCENT}|{_MAGNITUDE_WORD})|{_MAGNITUDE_LETTER})?"
+    rf"(?:\s?(?:{_CURRENCY}))?"
+)
+# A changed part of an amount, or the equal digits between two changed parts
+_NUMBER_PART = re.compile(r"\s*[$€£¥₺(]?[\d.,\s]*[%)]?\s*")
+_DIGITS = re.compile(r"[\d.,]+")
+
+_AMOUNT = re.compile(
+    rf"(?:(?P<currency>{_CURRENCY})\s?)?"
+    r"(?P<number>\d[\d.,]*)"
+    rf"(?:\s?(?P<magnitude>{_MAGNITUDE_WORD})|(?P<letter>{_MAGNITUDE_LETTER}))?"
+    rf"(?:\s?(?P<percent>{_PERCENT})|\s?(?P<currency_after>{_CURRENCY}))?"
+)
+
+
+class NumericDelta(NamedTuple):
+    old_value: float
+    new_value: float
+    # currency code, "%" or "" for a plain number
+    unit: str
+    old_text: str
+    new_text: str
+    # offset of the amount in the new text
+    offset: int
+    # text before the amount, e.g. "Retention: "
+    context: str
+
+
+def _parse_number(text: str) -> float | None:
+    """Parses "1,000,000.50", "1.000.000,50", "7,5" or "12.5"."""
+    text = text.rstrip(".,")
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        text = text.replace("." if decimal == "," else ",", "")
+        text = text.replace(decimal, ".")
+    elif "," in text:
+        if re.fullmatch(r"\d{1,3}(?:,\d{3})+", text):
+            text = text.replace(",", "")
+        else:
+            text = text.replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3}){2,}", text):
+        text = text.replace(".", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_amount(text: str) -> tuple[float, str] | None:
+    """Parses an amount like "USD 5,000,000", "$5m", "TL 2.500.000" or "7.5%".
+
+    Returns its value, with magnitudes applied, and its unit: the currency
+    code, "%" or "" for a plain number. None if `text` is no amount.
+    """
+    match = _AMOUNT.fullmatch(text.strip())
+    if not match:
+        return None
+    value = _parse_number(match["number"])
+    if value is None:
+        return None
+    magnitude = match["magnitude"] or match["letter"]
+    if magnitude:
+        value *= _MAGNITUDES[magnitude.lower()]
+    if match["percent"]:
+        return value, "%"
+    currency = match["currency"] or match["currency_after"] or ""
+    return value, _CURRENCY_CODES.get(currency, currency)
+
+
+def _numeric_part(text: str | None) -> bool:
+    return text is None or bool(_NUMBER_PART.fullmatch(text))
+
+
+def _is_amount(text: str, unit: str) -> bool:
+    """Amounts worth reporting: with a unit or thousands separators, which
+    leaves out years, dates and clause numbers."""
+    return bool(unit) or bool(re.search(r"\d[.,]\d{3}", text))
+
+
+def merge_numerical_diffs(diffs, deltas=None):
+    """Merges the changes of numbers with the digits, currency and units
+    around them, so every changed amount is deleted and inserted as a whole.
+
+    Makes a single pass over the diffs; a change is numeric if all its deleted
+    and inserted text is digits, separators and symbols. Changed parts of the
+    same number with equal digits between them become one change. If
+    `deltas` is given, the `NumericDelta` of every changed amount with a
+    currency, percentage or thousands separators is appended to it.
+    """
+    merged = []
+    new_position = 0  # offset in the new text of the text emitted so far
+    equal = ""  # equal text before the current change, not emitted yet
+    span = None  # [prefix, old parts, new parts, context] of the open number
+    gap = ""  # equal digits after the last change of the open number
+
+    def emit(op, text):
+        nonlocal new_position
+        if text:
+            merged.append((op, text))
+            if op != DELETE:
+                new_position += len(text)
+
+    def close(following: str) -> str:
+        """Emits the open number, taking the digits and units at the start of
+        `following`, and returns the rest of `following`."""
+        prefix, old_parts, new_parts, context = span
+        suffix = _SUFFIX.match(following).group(0)
+        old_text = prefix + "".join(old_parts) + suffix
+        new_text = prefix + "".join(new_parts) + suffix
+        offset = new_position
+        emit(DELETE, old_text)
+        emit(INSERT, new_text)
+        if deltas is not None:
+            old_amount, new_amount = parse_amount(old_text), parse_amount(new_text)
+            if old_amount and new_amount and old_amount != new_amount:
+                unit = new_amount[1] or old_amount[1]
+                if _is_amount(old_text, unit) or _is_amount(new_text, unit):
+                    deltas.append(
+                        NumericDelta(
+                            old_amount[0],
+                            new_amount[0],
+                            unit,
+                            old_text.strip(),
+                            new_text.strip(),
+                            offset,
+                            context,
+                        )
+                    )
+        return following[len(suffix) :]
+
+    for op, text in change_runs(diffs):
+        if op == EQUAL:
+            if span is None:
+                equal = text
+            elif _DIGITS.fullmatch(text):
+                gap = text
+            else:
+                equal = close(text)
+                span = None
+            continue
+
+        deleted, inserted = text
+        numeric = (
+            _numeric_part(deleted)
+            and _numeric_part(inserted)
+            and any(c.isdigit() for c in (deleted or "") + (inserted or ""))
+        )
+        if span is not None:
+            if numeric:
+                span[1].extend((gap, deleted or ""))
+                span[2].extend((gap, inserted or ""))
+                gap = ""
+                continue
+            equal = close(gap)
+            span, gap = None, ""
+        if numeric:
+            prefix = _PREFIX.search(equal).group(0)
+            remainder = equal[: len(equal) - len(prefix)]
+            emit(EQUAL, remainder)
+            context = remainder[-CONTEXT_CHARS:].replace("\n", " ").strip()
+            span = [prefix, [deleted or ""], [inserted or ""], context]
+        else:
+            emit(EQUAL, equal)
+            emit(DELETE, deleted)
+            emit(INSERT, inserted)
+        equal = ""
+    if span is not None:
+        equal = close(gap)
+    emit(EQUAL, equal)
+    return merged
@@ -4,16 +4,19 @@ using direct file loading and LLM synthesis with complex total calculation.
 """
 
 import argparse
+import asyncio
 import json
 import locale
-import os
 import re
 from pathlib import Path
 
 from dotenv import load_dotenv
 
-# LlamaIndex Imports instead of LangChain
-from llama_index.llms.google_genai import GoogleGenAI  # Correct class name
+from reporter.core.llm import get_llm
+from reporter.core.token_budget import ContextSource, fit_prompt
+
+from .retrieval import REPORT_SECTION_QUERIES, assemble_context
+from .streaming import Emit, complete_report_pass, stream_completion
 
 # We might use f-strings directly or LlamaIndex PromptTemplate later
 # from llama_index.core.prompts import PromptTemplate
@@ -27,11 +30,23 @@ MODEL_NAME = "gemini-2.0-flash"
 TEMPERATURE = 0.1
 MAX_OUTPUT_TOKENS = 4096
 
+# The placeholder the LLM is asked to generate for each layer's ROL
+ROL_PLACEHOLDER = "[ROL Layer Name %]"
+
 # File Paths
 OUTPUT_REPORT_FILE = (
     Path(__file__).resolve().parent.parent / "generated_florida_proposal_report.md"
 )
 
+# Files of the submission folder this agent reads, fetched by the caller
+TERMS_FILE = "florida_terms.json"
+SUBMISSION_INFO_FILE = "florida_submission.json"
+CONTRACT_FILE = "florida_2024_contract.md"
+INPUT_FILES = (TERMS_FILE, SUBMISSION_INFO_FILE, CONTRACT_FILE)
+
+# Bump whenever prompts or calculations change, this invalidates cached reports
+AGENT_VERSION = "2"
+
 # Report Structure Template (Aligned with Turkey Agent)
 REPORT_STRUCTURE_TEMPLATE = """
 # **Quotation line**
@@ -79,19 +94,17 @@ def load_file(file_path: Path) -> str | None:
         return None
 
 
+def load_inputs(local_data_path: Path) -> dict[str, str | None]:
+    """Loads the agent's input files from a local data directory."""
+    return {name: load_file(local_data_path / name) for name in INPUT_FILES}
+
+
 def initialize_llm():
-    """Initializes the LLM provider based on configuration."""
-    print(f"Initializing LLM: {LLM_PROVIDER} - Model: {MODEL_NAME}")
+    """Returns the shared LLM client for the configured provider and model."""
+    print(f"Using LLM: {LLM_PROVIDER} - Model: {MODEL_NAME}")
     if LLM_PROVIDER == "google":
         try:
-            # Use LlamaIndex GoogleGenAI
-            llm = GoogleGenAI(
-                model_name=MODEL_NAME,
-                temperature=TEMPERATURE,
-                # max_output_tokens=MAX_OUTPUT_TOKENS # Check LlamaIndex equivalent if needed
-            )
-            print("Google GenAI LLM initialized successfully.")
-            return llm
+            return get_llm(MODEL_NAME, TEMPERATURE)
         except Exception as e:
             print(f"Error initializing Google GenAI LLM: {e}")
             return None
@@ -177,9 +190,248 @@ def load_investigation_json(json_path: Path) -> list[str] | None:
         return None
 
 
+# --- Calculation Helpers --- #
+def parse_suggested_percentages(text: str) -> tuple[float | None, float | None]:
+    """Parses the suggested participation percentages from the LLM output."""
+    pattern = r"Suggest to offer quotation line of ([0-9.]+)% across all layers except TOP layer at ([0-9.]+)%"
+    match = re.search(pattern, text, re.IGNORECASE)
+    if match:
+        try:
+            all_layers_perc = float(match.group(1))
+            top_layer_perc = float(match.group(2))
+            print(
+                f"Parsed percentages: All Layers={all_layers_perc:.2f}%, Top Layer={top_layer_perc:.2f}%"
+            )
+            return (
+                all_layers_perc / 100.0,
+                top_layer_perc / 100.0,
+            )  # Convert to decimal for calculation
+        except ValueError:
+            print("Error: Could not convert parsed percentages to float.")
+            return None, None
+    else:
+        print("Error: Could not find or parse suggestion pattern in LLM output.")
+        # Debug: Print text being searched
+        # print("--- Text Searched for Percentages ---")
+        # print(text)
+        # print("-----------------------------------")
+        return None, None
+
+
+def identify_top_layer(layers_data: list) -> str | None:
+    """Identifies the top layer based on the highest attachment point."""
+    if not layers_data:
+        return None
+    top_layer_name = None
+    max_attachment = -1
+
+    for layer in layers_data:
+        attachment_key = None
+        if "occurrenceAttachment" in layer:
+            attachment_key = "occurrenceAttachment"
+        elif "aggregateAttachment" in layer:
+            attachment_key = "aggregateAttachment"
+        # Add other potential keys if needed
+
+        if attachment_key and isinstance(layer.get(attachment_key), (int, float)):
+            attachment = float(layer[attachment_key])
+            if attachment > max_attachment:
+                max_attachment = attachment
+                top_layer_name = layer.get("name")
+        else:
+            print(
+                f"Warning: Layer '{layer.get('name', 'Unnamed')}' missing or has invalid attachment value."
+            )
+
+    if top_layer_name:
+        print(
+            f"Identified top layer (highest attachment using '{attachment_key}'): {top_layer_name}"
+        )
+    else:
+        print(
+            "Warning: Could not definitively identify the top layer based on attachment."
+        )
+    return top_layer_name
+
+
+def calculate_totals_and_rols(
+    layers_data: list, base_rate: float, top_rate: float, top_layer_name: str | None
+) -> tuple[dict, dict]:
+    """Calculates the weighted totals and ROLs for the layers."""
+    total_limit = 0.0
+    total_premium = 0.0
+    rol_dict = {}
+    currency_symbol = "$"  # Default to USD for Florida
+
+    for layer in layers_data:
+        limit = float(
+            layer.get("occurrenceLimit", layer.get("aggregateLimit", 0.0))
+        )
+        absolute_premium = float(
+            layer.get("depositPremium", 0.0)
+        )  # Use the absolute premium value
+        layer_name = layer.get("name")
+
+        # Determine participation rate for this layer
+        participation_rate = top_rate if layer_name == top_layer_name else base_rate
+
+        # Calculate weighted limit and premium for this layer
+        layer_limit_weighted = limit * participation_rate
+        layer_premium_weighted = (
+            absolute_premium * participation_rate
+        )  # Weighted premium is Rate * Absolute Premium
+
+        total_limit += layer_limit_weighted
+        total_premium += layer_premium_weighted
+
+        # Calculate ROL (Rate on Line) = Premium / Limit
+        # Ensure limit is not zero to avoid division error
+        layer_rol = (
+            (layer_premium_weighted / layer_limit_weighted * 100.0)
+            if layer_limit_weighted
+            else 0.0
+        )
+        if layer_name:
+            rol_dict[layer_name] = layer_rol
+
+        # Attempt to get currency (might be per layer or global)
+        if "currency" in layer and layer["currency"] == "USD":
+            currency_symbol = "$"
+        # Add other currency checks if necessary
+
+    # Format results
+    try:
+        locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
+    except locale.Error:
+        locale.setlocale(locale.LC_ALL, "")  # Use default locale as fallback
+
+    formatted_limit = f"{currency_symbol}{locale.format_string('%.2f', total_limit, grouping=True)}"
+    formatted_premium = f"{currency_symbol}{locale.format_string('%.2f', total_premium, grouping=True)}"
+
+    print(
+        f"Calculated Weighted Totals: Limit={formatted_limit}, Premium={formatted_premium}"
+    )
+
+    results = {"total_limit": formatted_limit, "total_premium": formatted_premium}
+    return results, rol_dict
+
+
+def build_placeholder_filler(report_text: str, layers: list, final: bool = True):
+    """
+    Parses the suggested participation from the LLM output and calculates the
+    totals and ROLs. Returns a function replacing the calculated placeholders in
+    the report, or in its sections one after the other.
+
+    Returns None if the percentages cannot be parsed (yet).
+    """
+    # --- Parse Suggested Percentages --- #
+    print("Parsing suggested percentages from LLM output...")
+    all_layers_rate, top_layer_rate = parse_suggested_percentages(report_text)
+
+    if all_layers_rate is None or top_layer_rate is None:
+        return None
+
+    # --- Identify Top Layer --- #
+    print("Identifying top layer (highest attachment)...")
+    top_layer_identified_name = identify_top_layer(layers)
+
+    # --- Calculate Totals and ROLs --- #
+    print("Calculating weighted totals and ROLs...")
+    calculated_results, layer_rols = calculate_totals_and_rols(
+        layers,
+        all_layers_rate,
+        top_layer_rate,
+        top_layer_identified_name,
+    )
+
+    # The n-th ROL placeholder in the report gets the ROL of the n-th layer
+    sorted_layer_names = sorted(
+        layer_rols.keys(),
+        key=lambda x: int(re.search(r"\d+", x).group())
+        if re.search(r"\d+", x)
+        else float("inf"),
+    )
+    # Format ROL as percentage string
+    remaining_rols = [f"{layer_rols[name]:.2f}%" for name in sorted_layer_names]
+
+    def fill(text: str) -> str:
+        # Replace Total Line placeholders
+        text = text.replace("[Total Limit $]", calculated_results["total_limit"])
+        text = text.replace("[Total Premium $]", calculated_results["total_premium"])
+
+        # Replace ROL placeholders sequentially
+        while remaining_rols and ROL_PLACEHOLDER in text:
+            rol_value_str = remaining_rols.pop(0)
+            # Replace the *first* occurrence of the generic placeholder
+            text = text.replace(ROL_PLACEHOLDER, rol_value_str, 1)
+            print(
+                f"  - Replaced one instance of '{ROL_PLACEHOLDER}' with '{rol_value_str}'"
+            )
+
+        # Replace Quotation Proposal placeholders
+        text = text.replace(
+            "[Total Limit Calculated $]", calculated_results["total_limit"]
+        )
+        text = text.replace(
+            "[Total Premium Calculated $]", calculated_results["total_premium"]
+        )
+        return text
+
+    return fill
+
+
+# --- Helper Function to Assemble the Submission Context --- #
+async def build_submission_context(
+    terms_data: str,
+    submission_info_data: str,
+    contract_data: str,
+    queries: list[str],
+) -> tuple[str, list[ContextSource]]:
+    """
+    Combines the submission data into the context of a prompt answering
+    `queries`, with the submission info and the contract reduced to their
+    excerpts relevant to the queries (see `retrieval.assemble_context`).
+    Returns the context, with the placeholders of the sources in place of
+    their texts, and the sources; `fit_prompt` fills them in.
+    """
+    documents = await assemble_context(
+        {SUBMISSION_INFO_FILE: submission_info_data, CONTRACT_FILE: contract_data},
+        queries,
+    )
+    # the contract is reduced first if a prompt is over budget
+    terms, submission_info, contract = sources = [
+        ContextSource(TERMS_FILE, terms_data, priority=2),
+        ContextSource(
+            SUBMISSION_INFO_FILE, documents[SUBMISSION_INFO_FILE], priority=1
+        ),
+        ContextSource(CONTRACT_FILE, documents[CONTRACT_FILE]),
+    ]
+    submission_context = f"""
+# FLORIDA SUBMISSION DATA
+
+## Terms ({TERMS_FILE})
+{terms.placeholder}
+
+---
+
+## Submission Info ({SUBMISSION_INFO_FILE})
+{submission_info.placeholder}
+
+---
+
+## Contract ({CONTRACT_FILE})
+{contract.placeholder}
+
+# END OF SUBMISSION DATA
+"""
+    return submission_context, sources
+
+
 # --- Main Execution --- #
-def generate_florida_proposal(
-    local_data_path: Path, investigation_points: list[str] | None = None
+async def generate_florida_proposal(
+    inputs: dict[str, str | None],
+    investigation_points: list[str] | None = None,
+    emit: Emit | None = None,
 ):
     # Placeholder for structured response
     response = {
@@ -189,21 +441,11 @@ def generate_florida_proposal(
     }
 
     print("--- Starting Florida Proposal Generation (Complex Calc) ---")
-    print(f"Using local data path: {local_data_path}")
-
-    # Construct input file paths using the provided local_data_path
-    terms_file = local_data_path / "florida_terms.json"
-    submission_info_file = local_data_path / "florida_submission.json"
-    contract_file = local_data_path / "florida_2024_contract.md"
-
-    print(terms_file)
-    print(os.path.isfile(terms_file))
 
     # 1. Load Data
-    print("Loading submission data...")
-    terms_data = load_file(terms_file)
-    submission_info_data = load_file(submission_info_file)
-    contract_data = load_file(contract_file)
+    terms_data = inputs.get(TERMS_FILE)
+    submission_info_data = inputs.get(SUBMISSION_INFO_FILE)
+    contract_data = inputs.get(CONTRACT_FILE)
 
     if not all([terms_data, submission_info_data, contract_data]):
         error_msg = (
@@ -229,25 +471,10 @@ def generate_florida_proposal(
         response["error"] = error_msg
         return response
 
-    # Combine data into a single context
-    submission_context = f"""
-# FLORIDA SUBMISSION DATA
-
-## Terms ({terms_file.name})
-{terms_data}
-
----
-
-## Submission Info ({submission_info_file.name})
-{submission_info_data}
-
----
-
-## Contract ({contract_file.name})
-{contract_data}
-
-# END OF SUBMISSION DATA
-"""
+    # Combine data into a single context, with the parts relevant to the report sections
+    submission_context, sources = await build_submission_context(
+        terms_data, submission_info_data, contract_data, REPORT_SECTION_QUERIES
+    )
 
     # 2. Initialize LLM
     llm = initialize_llm()
@@ -301,8 +528,17 @@ Generate the report now.
 
     print("Invoking LLM (Pass 1) to get suggestions and initial report...")
     try:
-        response_pass1 = llm.complete(prompt_pass1_template_str)
-        initial_report_content = response_pass1.text  # Access response text
+        prompt_pass1_template_str = await fit_prompt(
+            "florida.pass1", prompt_pass1_template_str, sources
+        )
+        initial_report_content, final_report_content = await complete_report_pass(
+            llm,
+            prompt_pass1_template_str,
+            lambda text, final: build_placeholder_filler(
+                text, terms_data_dict.get("layers", []), final
+            ),
+            emit,
+        )
         print("LLM Pass 1 complete.")
         # Debug: Print initial LLM output
         # print("--- LLM Pass 1 Raw Output ---")
@@ -314,202 +550,18 @@ Generate the report now.
         return
 
     # --- Data structures for results ---
-    calculated_results = {}
-    layer_rols = {}
     missing_data_from_pass1 = []  # Store missing placeholders
 
-    # --- Parse Suggested Percentages --- #
-    print("Parsing suggested percentages from LLM output...")
-
-    def parse_suggested_percentages(text: str) -> tuple[float | None, float | None]:
-        pattern = r"Suggest to offer quotation line of ([0-9.]+)% across all layers except TOP layer at ([0-9.]+)%"
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            try:
-                all_layers_perc = float(match.group(1))
-                top_layer_perc = float(match.group(2))
-                print(
-                    f"Parsed percentages: All Layers={all_layers_perc:.2f}%, Top Layer={top_layer_perc:.2f}%"
-                )
-                return (
-                    all_layers_perc / 100.0,
-                    top_layer_perc / 100.0,
-                )  # Convert to decimal for calculation
-            except ValueError:
-                print("Error: Could not convert parsed percentages to float.")
-                return None, None
-        else:
-            print("Error: Could not find or parse suggestion pattern in LLM output.")
-            # Debug: Print text being searched
-            # print("--- Text Searched for Percentages ---")
-            # print(text)
-            # print("-----------------------------------")
-            return None, None
-
-    all_layers_rate, top_layer_rate = parse_suggested_percentages(
-        initial_report_content
-    )
-
-    if all_layers_rate is None or top_layer_rate is None:
+    if final_report_content is None:
         print("Aborting due to parsing error.")
         return
 
-    # --- Identify Top Layer --- #
-    print("Identifying top layer (highest attachment)...")
-
-    def identify_top_layer(layers_data: list) -> str | None:
-        if not layers_data:
-            return None
-        top_layer_name = None
-        max_attachment = -1
-
-        for layer in layers_data:
-            attachment_key = None
-            if "occurrenceAttachment" in layer:
-                attachment_key = "occurrenceAttachment"
-            elif "aggregateAttachment" in layer:
-                attachment_key = "aggregateAttachment"
-            # Add other potential keys if needed
-
-            if attachment_key and isinstance(layer.get(attachment_key), (int, float)):
-                attachment = float(layer[attachment_key])
-                if attachment > max_attachment:
-                    max_attachment = attachment
-                    top_layer_name = layer.get("name")
-            else:
-                print(
-                    f"Warning: Layer '{layer.get('name', 'Unnamed')}' missing or has invalid attachment value."
-                )
-
-        if top_layer_name:
-            print(
-                f"Identified top layer (highest attachment using '{attachment_key}'): {top_layer_name}"
-            )
-        else:
-            print(
-                "Warning: Could not definitively identify the top layer based on attachment."
-            )
-        return top_layer_name
-
-    top_layer_identified_name = identify_top_layer(terms_data_dict.get("layers", []))
-
-    # --- Calculate Totals and ROLs --- #
-    print("Calculating weighted totals and ROLs...")
-
-    def calculate_totals_and_rols(
-        layers_data: list, base_rate: float, top_rate: float, top_layer_name: str | None
-    ) -> tuple[dict, dict]:
-        total_limit = 0.0
-        total_premium = 0.0
-        rol_dict = {}
-        currency_symbol = "$"  # Default to USD for Florida
-
-        for layer in layers_data:
-            limit = float(
-                layer.get("occurrenceLimit", layer.get("aggregateLimit", 0.0))
-            )
-            absolute_premium = float(
-                layer.get("depositPremium", 0.0)
-            )  # Use the absolute premium value
-            layer_name = layer.get("name")
-
-            # Determine participation rate for this layer
-            participation_rate = top_rate if layer_name == top_layer_name else base_rate
-
-            # Calculate weighted limit and premium for this layer
-            layer_limit_weighted = limit * participation_rate
-            layer_premium_weighted = (
-                absolute_premium * participation_rate
-            )  # Weighted premium is Rate * Absolute Premium
-
-            total_limit += layer_limit_weighted
-            total_premium += layer_premium_weighted
-
-            # Calculate ROL (Rate on Line) = Premium / Limit
-            # Ensure limit is not zero to avoid division error
-            layer_rol = (
-                (layer_premium_weighted / layer_limit_weighted * 100.0)
-                if layer_limit_weighted
-                else 0.0
-            )
-            if layer_name:
-                rol_dict[layer_name] = layer_rol
-
-            # Attempt to get currency (might be per layer or global)
-            if "currency" in layer and layer["currency"] == "USD":
-                currency_symbol = "$"
-            # Add other currency checks if necessary
-
-        # Format results
-        try:
-            locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
-        except locale.Error:
-            locale.setlocale(locale.LC_ALL, "")  # Use default locale as fallback
-
-        formatted_limit = f"{currency_symbol}{locale.format_string('%.2f', total_limit, grouping=True)}"
-        formatted_premium = f"{currency_symbol}{locale.format_string('%.2f', total_premium, grouping=True)}"
-
-        print(
-            f"Calculated Weighted Totals: Limit={formatted_limit}, Premium={formatted_premium}"
-        )
-
-        results = {"total_limit": formatted_limit, "total_premium": formatted_premium}
-        return results, rol_dict
-
-    calculated_results, layer_rols = calculate_totals_and_rols(
-        terms_data_dict.get("layers", []),
-        all_layers_rate,
-        top_layer_rate,
-        top_layer_identified_name,
-    )
-
-    # --- Placeholder Replacement --- #
-    final_report_content = initial_report_content
-
-    # Replace Total Line placeholders
-    final_report_content = final_report_content.replace(
-        "[Total Limit $]", calculated_results["total_limit"]
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium $]", calculated_results["total_premium"]
-    )
-    print("Replaced Total Line placeholders.")
-
-    # Replace ROL placeholders sequentially
-    print("Replacing ROL placeholders...")
-    sorted_layer_names = sorted(
-        layer_rols.keys(),
-        key=lambda x: int(re.search(r"\d+", x).group())
-        if re.search(r"\d+", x)
-        else float("inf"),
-    )
-    placeholder_generic = "[ROL Layer Name %]"
-    for layer_name in sorted_layer_names:
-        rol_value = layer_rols[layer_name]
-        rol_value_str = f"{rol_value:.2f}%"  # Format ROL as percentage string
-        # Replace the *first* occurrence of the generic placeholder
-        final_report_content = final_report_content.replace(
-            placeholder_generic, rol_value_str, 1
-        )
-        print(
-            f"  - Replaced one instance of '{placeholder_generic}' with '{rol_value_str}'"
-        )
-
     # Check if any generic ROL placeholders remain
-    if placeholder_generic in final_report_content:
+    if ROL_PLACEHOLDER in final_report_content:
         print(
-            f"Warning: Some '{placeholder_generic}' placeholders might remain unreplaced."
+            f"Warning: Some '{ROL_PLACEHOLDER}' placeholders might remain unreplaced."
         )
 
-    # Replace Quotation Proposal placeholders
-    final_report_content = final_report_content.replace(
-        "[Total Limit Calculated $]", calculated_results["total_limit"]
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium Calculated $]", calculated_results["total_premium"]
-    )
-    print("Replaced Quotation Proposal placeholders.")
-
     # Find and store [MISSING: ...] placeholders from Pass 1 output
     missing_pattern = r"(\[MISSING: ([^]]+)\])"
     matches = re.findall(missing_pattern, final_report_content)
@@ -526,6 +578,10 @@ Generate the report now.
     if investigation_points and len(investigation_points) > 0:
         print("\n--- LLM Pass 2: Addressing Investigation Points ---")
         points_list_str = "\n".join([f"- {point}" for point in investigation_points])
+        # Context with the parts relevant to the points
+        submission_context, sources = await build_submission_context(
+            terms_data, submission_info_data, contract_data, investigation_points
+        )
 
         # Define the prompt template (using f-string)
         prompt_pass2_template_str = f"""
@@ -569,10 +625,22 @@ Generate *only* the 'Investigation Point Analysis' section in Markdown format:
 
         print(f"Invoking LLM (Pass 2) for {len(investigation_points)} points...")
         try:
+            prompt_pass2_template_str = await fit_prompt(
+                "florida.pass2", prompt_pass2_template_str, sources
+            )
             # Use LlamaIndex llm.complete()
-            response_pass2 = llm.complete(prompt_pass2_template_str)
-            investigation_analysis_content = response_pass2.text
+            investigation_analysis_content = await stream_completion(
+                llm, prompt_pass2_template_str, emit, stage="investigation"
+            )
             print("LLM Pass 2 successful.")
+            if emit:
+                await emit(
+                    "section",
+                    {
+                        "stage": "investigation",
+                        "markdown": investigation_analysis_content,
+                    },
+                )
             # print("\n--- LLM Pass 2 Raw Output: ---\n", investigation_analysis_content)
         except Exception as e:
             error_msg = (
@@ -606,21 +674,11 @@ Generate *only* the 'Investigation Point Analysis' section in Markdown format:
     else:
         final_report_content += "\n\n## Missing Data\n- None identified."
 
-    # Save the final report
-    output_file_path = OUTPUT_REPORT_FILE
-    print(f"\nSaving final report to: {output_file_path}")
-    try:
-        with open(output_file_path, "w", encoding="utf-8") as f:
-            f.write(final_report_content)
-        print(f"Successfully generated report to {output_file_path}")
-        response["report_markdown"] = final_report_content
-        response["status"] = "success"
-        response["error"] = None
-    except IOError as e:
-        error_msg = f"Error writing report file: {e}"
-        print(error_msg)
-        response["error"] = error_msg
-        # Keep status as error
+    # The report is returned, only direct runs save it to OUTPUT_REPORT_FILE
+    print("Report generation complete.")
+    response["report_markdown"] = final_report_content
+    response["status"] = "success"
+    response["error"] = None
 
     return response  # Return the structured response
 
@@ -651,6 +709,13 @@ if __name__ == "__main__":
     if not data_path.is_dir():
         print(f"Error: Local data directory not found: {data_path}. Aborting.")
     else:
-        result = generate_florida_proposal(data_path, investigation_points_list)
+        result = asyncio.run(
+            generate_florida_proposal(
+                load_inputs(data_path), investigation_points_list
+            )
+        )
         print("\n--- Direct Run Result ---")
         print(json.dumps(result, indent=2))
+        if result["status"] == "success":
+            OUTPUT_REPORT_FILE.write_text(result["report_markdown"], encoding="utf-8")
+            print(f"Saved report to: {OUTPUT_REPORT_FILE}")
@@ -5,16 +5,19 @@ using direct file loading and LLM synthesis (no RAG).
 
 # Imports
 import argparse
+import asyncio
 import json
 import locale
 import re
 from pathlib import Path
 
 from dotenv import load_dotenv
-from llama_index.core.prompts import PromptTemplate
 
-# LlamaIndex Imports instead of LangChain
-from llama_index.llms.google_genai import GoogleGenAI
+from reporter.core.llm import get_llm
+from reporter.core.token_budget import ContextSource, fit_prompt
+
+from .retrieval import REPORT_SECTION_QUERIES, assemble_context
+from .streaming import Emit, complete_report_pass
 
 # --- Configuration ---
 load_dotenv()
@@ -30,6 +33,15 @@ OUTPUT_REPORT_FILE = (
     Path(__file__).resolve().parent.parent / "generated_netherlands_proposal_report.md"
 )
 
+# Files of the submission folder this agent reads, fetched by the caller
+TERMS_FILE = "netherlands_terms.json"
+SUBMISSION_INFO_FILE = "netherlands_submission.json"
+CONTRACT_FILE = "netherlands_2024_contract.md"
+INPUT_FILES = (TERMS_FILE, SUBMISSION_INFO_FILE, CONTRACT_FILE)
+
+# Bump whenever prompts or calculations change, this invalidates cached reports
+AGENT_VERSION = "2"
+
 # Report Structure Template (Aligned with Turkey/Florida, ROL section preserved)
 REPORT_STRUCTURE_TEMPLATE = """
 # **Quotation line**
@@ -79,16 +91,16 @@ def load_file(file_path: Path) -> str | None:
         return None
 
 
+def load_inputs(local_data_path: Path) -> dict[str, str | None]:
+    """Loads the agent's input files from a local data directory."""
+    return {name: load_file(local_data_path / name) for name in INPUT_FILES}
+
+
 def initialize_llm():
-    """Initializes the LLM."""
+    """Returns the shared LLM client for this agent's model."""
     try:
         if LLM_PROVIDER == "google":
-            llm = GoogleGenAI(
-                model_name=MODEL_NAME,
-                temperature=TEMPERATURE,
-                # max_output_tokens=MAX_OUTPUT_TOKENS # Check LlamaIndex equivalent if needed
-            )
-            return llm
+            return get_llm(MODEL_NAME, TEMPERATURE)
         else:
             print(f"Error: LLM provider '{LLM_PROVIDER}' not supported.")
             return None
@@ -254,123 +266,17 @@ def calculate_totals_and_rols(
     return results, rol_dict
 
 
-# --- Main Execution --- #
-def generate_netherlands_proposal(
-    local_data_path: Path, investigation_points: list[str] | None = None
+def build_placeholder_filler(
+    report_text: str, terms_data_dict: dict, final: bool = True
 ):
-    # Placeholder for structured response
-    response = {
-        "report_markdown": "",
-        "status": "error",
-        "error": "Generation not fully implemented",
-    }
-
-    print("--- Starting Netherlands Proposal Generation (Standard Calc) ---")
-    print(f"Using local data path: {local_data_path}")
-
-    # Construct input file paths using the provided local_data_path
-    terms_file = local_data_path / "netherlands_terms.json"
-    submission_info_file = local_data_path / "netherlands_submission.json"
-    contract_file = local_data_path / "netherlands_2024_contract.md"
-
-    # 1. Load Data
-    print("Loading submission data...")
-    terms_data = load_file(terms_file)
-    submission_info_data = load_file(submission_info_file)
-    contract_data = load_file(contract_file)
-
-    if not all([terms_data, submission_info_data, contract_data]):
-        error_msg = (
-            "Error: One or more essential data files could not be loaded. Aborting."
-        )
-        print(error_msg)
-        response["error"] = error_msg
-        return response
-
-    try:
-        terms_data_dict = json.loads(terms_data)  # Keep this for calculation step
-    except json.JSONDecodeError as e:
-        print(f"Error parsing terms JSON data: {e}")
-        return
-    except TypeError:
-        print("Error: terms_data is None, cannot parse JSON.")
-        return
-
-    # Combine data into a single context
-    submission_context = f"""
-# NETHERLANDS SUBMISSION DATA
-
-## Terms ({terms_file.name})
-{terms_data}
-
----
-
-## Submission Info ({submission_info_file.name})
-{submission_info_data}
-
----
-
-## Contract ({contract_file.name})
-{contract_data}
-
-# END OF SUBMISSION DATA
-"""
-
-    # 2. Initialize LLM
-    llm = initialize_llm()
-    if not llm:
-        return
-
-    # --- First LLM Pass to get suggestions and initial report --- #
-    print("\nInvoking LLM (Pass 1) to get suggestions and initial report...")
-    master_prompt_template_pass1 = """
-You are an expert Senior Reinsurance Underwriter specializing in the Netherlands market, tasked with creating a proposal report.
-
-Analyze the following comprehensive submission data meticulously:
-{submission_data_context}
-
-Your goal is to generate a concise, insightful proposal report that STRICTLY adheres to the structure outlined below.
-Fill in the details for every section based *ONLY* on the provided submission data context.
-**Critically, you MUST provide a suggestion for the quotation line percentages in the format '# **Quotation line**\nSuggest to offer quotation line of X% across all layers except TOP layer at Y%' where X and Y are numbers.**
-Leave the '[Total Limit EUR]', '[Total Premium EUR]', '[Total Limit Calculated EUR]', '[Total Premium Calculated EUR]' and ALL '[ROL Layer ... %]' placeholders exactly as they are. These will be calculated later.
-Extract information like Expiring Limit/Premium if available, otherwise use 'Not Found'. Fill other sections based ONLY on the data.
-If specific data for a section (e.g., Historical Losses) is clearly missing from the context, write "[INFO_MISSING] Details not found in provided documents."
-
-**REQUIRED REPORT STRUCTURE OUTLINE (Fill text based on data, suggest percentages, leave specific placeholders):**
-
-{report_structure_template}
-
-**IMPORTANT INSTRUCTIONS:**
-- Fill all bracketed placeholders EXCEPT '[Total Limit EUR]', '[Total Premium EUR]', '[Total Limit Calculated EUR]', '[Total Premium Calculated EUR]', and '[ROL Layer ... %]'.
-- Provide the participation suggestion clearly on its own line after '# **Quotation line**'.
-- If data is missing for a section, use "[INFO_MISSING] Details not found in provided documents."
-- Replicate markdown formatting.
-- Base the entire report solely on the provided data context.
-
-Generate the report now.
-"""
-
-    prompt_pass1 = PromptTemplate(
-        input_variables=["submission_data_context", "report_structure_template"],
-        template=master_prompt_template_pass1,
-    )
-    chain_pass1 = prompt_pass1 | llm
-
-    try:
-        initial_report_content = chain_pass1.invoke(
-            {
-                "submission_data_context": submission_context,
-                "report_structure_template": REPORT_STRUCTURE_TEMPLATE,
-            }
-        )
-        print("LLM Pass 1 complete.")
-    except Exception as e:
-        print(f"Error during LLM invocation (Pass 1): {e}")
-        return
-
-    final_report_content = initial_report_content  # Start with Pass 1 output
-    missing_data_from_pass1 = []
+    """
+    Parses the suggested participation from the LLM output and calculates the
+    totals and ROLs. Returns a function replacing the calculated placeholders in
+    the report, or in its sections one after the other.
 
+    Returns None while the percentages cannot be parsed yet, unless `final` is set,
+    in which case the placeholders are filled with error markers.
+    """
     # --- Parse Suggested Percentages --- #
     print("Parsing suggested percentages from LLM output...")
     participation_all_perc = None
@@ -378,7 +284,7 @@ Generate the report now.
     # Regex adjusted for the specific prompt format
     match = re.search(
         r"Suggest to offer quotation line of (\d{1,3}(?:\.\d{1,2})?)% across all layers except TOP layer at (\d{1,3}(?:\.\d{1,2})?)%",
-        final_report_content,
+        report_text,
         re.IGNORECASE,
     )
 
@@ -393,6 +299,8 @@ Generate the report now.
             print("Error converting parsed percentages to float.")
             participation_all_perc = None
             participation_top_perc = None
+    elif not final:
+        return None
     else:
         print(
             "Could not parse participation percentages from LLM output. Proceeding without calculations."
@@ -438,23 +346,6 @@ Generate the report now.
             }  # Store 0.0 to format later
         print("Skipping calculations due to missing percentages or layers data.")
 
-    # --- Replace Placeholders --- #
-    print("Replacing placeholders in the report...")
-
-    # Replace Total Limit/Premium
-    final_report_content = final_report_content.replace(
-        "[Total Limit EUR]", calculated_totals["total_limit"]
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium EUR]", calculated_totals["total_premium"]
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Limit Calculated EUR]", calculated_totals["total_limit"]
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium Calculated EUR]", calculated_totals["total_premium"]
-    )
-
     # Replace Suggested Percentages
     perc_all_str = (
         f"{participation_all_perc:.2f}%"
@@ -466,21 +357,191 @@ Generate the report now.
         if participation_top_perc is not None
         else "[Not Parsed]"
     )
-    final_report_content = final_report_content.replace("[Calculated %]", perc_all_str)
-    final_report_content = final_report_content.replace(
-        "[Calculated % for Top Layer]", perc_top_str
+
+    def fill(text: str) -> str:
+        # --- Replace Placeholders --- #
+        print("Replacing placeholders in the report...")
+
+        # Replace Total Limit/Premium
+        text = text.replace("[Total Limit EUR]", calculated_totals["total_limit"])
+        text = text.replace("[Total Premium EUR]", calculated_totals["total_premium"])
+        text = text.replace(
+            "[Total Limit Calculated EUR]", calculated_totals["total_limit"]
+        )
+        text = text.replace(
+            "[Total Premium Calculated EUR]", calculated_totals["total_premium"]
+        )
+
+        text = text.replace("[Calculated %]", perc_all_str)
+        text = text.replace("[Calculated % for Top Layer]", perc_top_str)
+
+        # Replace ROL placeholders using the keys from calculated_rols
+        for rol_placeholder, rol_value in calculated_rols.items():
+            if rol_placeholder not in text:
+                continue
+            # Format the ROL value as percentage string
+            rol_str = (
+                f"{rol_value:.2f}%"
+                if isinstance(rol_value, (float, int))
+                else "[Calc Error]"
+            )
+            text = text.replace(rol_placeholder, rol_str)
+            print(f"  - Replaced {rol_placeholder} with {rol_str}")
+        return text
+
+    return fill
+
+
+# --- Helper Function to Assemble the Submission Context --- #
+async def build_submission_context(
+    terms_data: str,
+    submission_info_data: str,
+    contract_data: str,
+    queries: list[str],
+) -> tuple[str, list[ContextSource]]:
+    """
+    Combines the submission data into the context of a prompt answering
+    `queries`, with the submission info and the contract reduced to their
+    excerpts relevant to the queries (see `retrieval.assemble_context`).
+    Returns the context, with the placeholders of the sources in place of
+    their texts, and the sources; `fit_prompt` fills them in.
+    """
+    documents = await assemble_context(
+        {SUBMISSION_INFO_FILE: submission_info_data, CONTRACT_FILE: contract_data},
+        queries,
     )
+    # the contract is reduced first if a prompt is over budget
+    terms, submission_info, contract = sources = [
+        ContextSource(TERMS_FILE, terms_data, priority=2),
+        ContextSource(
+            SUBMISSION_INFO_FILE, documents[SUBMISSION_INFO_FILE], priority=1
+        ),
+        ContextSource(CONTRACT_FILE, documents[CONTRACT_FILE]),
+    ]
+    submission_context = f"""
+# NETHERLANDS SUBMISSION DATA
+
+## Terms ({TERMS_FILE})
+{terms.placeholder}
+
+---
+
+## Submission Info ({SUBMISSION_INFO_FILE})
+{submission_info.placeholder}
+
+---
+
+## Contract ({CONTRACT_FILE})
+{contract.placeholder}
+
+# END OF SUBMISSION DATA
+"""
+    return submission_context, sources
+
+
+# --- Main Execution --- #
+async def generate_netherlands_proposal(
+    inputs: dict[str, str | None],
+    investigation_points: list[str] | None = None,
+    emit: Emit | None = None,
+):
+    # imported here, llama_index is slow to import
+    from llama_index.core.prompts import PromptTemplate
+
+    # Placeholder for structured response
+    response = {
+        "report_markdown": "",
+        "status": "error",
+        "error": "Generation not fully implemented",
+    }
+
+    print("--- Starting Netherlands Proposal Generation (Standard Calc) ---")
 
-    # Replace ROL placeholders using the keys from calculated_rols
-    for rol_placeholder, rol_value in calculated_rols.items():
-        # Format the ROL value as percentage string
-        rol_str = (
-            f"{rol_value:.2f}%"
-            if isinstance(rol_value, (float, int))
-            else "[Calc Error]"
+    # 1. Load Data
+    terms_data = inputs.get(TERMS_FILE)
+    submission_info_data = inputs.get(SUBMISSION_INFO_FILE)
+    contract_data = inputs.get(CONTRACT_FILE)
+
+    if not all([terms_data, submission_info_data, contract_data]):
+        error_msg = (
+            "Error: One or more essential data files could not be loaded. Aborting."
         )
-        final_report_content = final_report_content.replace(rol_placeholder, rol_str)
-        print(f"  - Replaced {rol_placeholder} with {rol_str}")
+        print(error_msg)
+        response["error"] = error_msg
+        return response
+
+    try:
+        terms_data_dict = json.loads(terms_data)  # Keep this for calculation step
+    except json.JSONDecodeError as e:
+        print(f"Error parsing terms JSON data: {e}")
+        return
+    except TypeError:
+        print("Error: terms_data is None, cannot parse JSON.")
+        return
+
+    # Combine data into a single context, with the parts relevant to the report sections
+    submission_context, sources = await build_submission_context(
+        terms_data, submission_info_data, contract_data, REPORT_SECTION_QUERIES
+    )
+
+    # 2. Initialize LLM
+    llm = initialize_llm()
+    if not llm:
+        return
+
+    # --- First LLM Pass to get suggestions and initial report --- #
+    print("\nInvoking LLM (Pass 1) to get suggestions and initial report...")
+    master_prompt_template_pass1 = """
+You are an expert Senior Reinsurance Underwriter specializing in the Netherlands market, tasked with creating a proposal report.
+
+Analyze the following comprehensive submission data meticulously:
+{submission_data_context}
+
+Your goal is to generate a concise, insightful proposal report that STRICTLY adheres to the structure outlined below.
+Fill in the details for every section based *ONLY* on the provided submission data context.
+**Critically, you MUST provide a suggestion for the quotation line percentages in the format '# **Quotation line**\nSuggest to offer quotation line of X% across all layers except TOP layer at Y%' where X and Y are numbers.**
+Leave the '[Total Limit EUR]', '[Total Premium EUR]', '[Total Limit Calculated EUR]', '[Total Premium Calculated EUR]' and ALL '[ROL Layer ... %]' placeholders exactly as they are. These will be calculated later.
+Extract information like Expiring Limit/Premium if available, otherwise use 'Not Found'. Fill other sections based ONLY on the data.
+If specific data for a section (e.g., Historical Losses) is clearly missing from the context, write "[INFO_MISSING] Details not found in provided documents."
+
+**REQUIRED REPORT STRUCTURE OUTLINE (Fill text based on data, suggest percentages, leave specific placeholders):**
+
+{report_structure_template}
+
+**IMPORTANT INSTRUCTIONS:**
+- Fill all bracketed placeholders EXCEPT '[Total Limit EUR]', '[Total Premium EUR]', '[Total Limit Calculated EUR]', '[Total Premium Calculated EUR]', and '[ROL Layer ... %]'.
+- Provide the participation suggestion clearly on its own line after '# **Quotation line**'.
+- If data is missing for a section, use "[INFO_MISSING] Details not found in provided documents."
+- Replicate markdown formatting.
+- Base the entire report solely on the provided data context.
+
+Generate the report now.
+"""
+
+    prompt_pass1 = PromptTemplate(
+        template=master_prompt_template_pass1,
+    )
+
+    try:
+        _, final_report_content = await complete_report_pass(
+            llm,
+            await fit_prompt(
+                "netherlands.pass1",
+                prompt_pass1.format(
+                    submission_data_context=submission_context,
+                    report_structure_template=REPORT_STRUCTURE_TEMPLATE,
+                ),
+                sources,
+            ),
+            lambda text, final: build_placeholder_filler(text, terms_data_dict, final),
+            emit,
+        )
+        print("LLM Pass 1 complete.")
+    except Exception as e:
+        print(f"Error during LLM invocation (Pass 1): {e}")
+        return
+
+    missing_data_from_pass1 = []
 
     # --- Collect Missing Data from Pass 1 --- #
     print("Checking for missing data tags from Pass 1...")
@@ -535,26 +596,55 @@ Based *strictly* on the Submission Data Context, provide a concise answer to the
 """
 
         prompt_pass3 = PromptTemplate(
-            input_variables=["submission_data_context", "user_question"],
             template=master_prompt_template_pass3,
         )
-        chain_pass3 = prompt_pass3 | llm
 
-        for i, question in enumerate(investigation_points):
+        async def answer_question(i: int, question: str):
             print(f"  - Invoking LLM for question {i+1}: '{question[:50]}...' ")
-            try:
-                answer = chain_pass3.invoke(
+            # Context with the parts relevant to the question
+            question_context, question_sources = await build_submission_context(
+                terms_data, submission_info_data, contract_data, [question]
+            )
+            answer = await llm.acomplete(
+                await fit_prompt(
+                    "netherlands.pass3",
+                    prompt_pass3.format(
+                        submission_data_context=question_context,
+                        user_question=question,
+                    ),
+                    question_sources,
+                )
+            )
+            if emit:
+                await emit(
+                    "section",
                     {
-                        "submission_data_context": submission_context,
-                        "user_question": question,
-                    }
+                        "stage": "investigation",
+                        "index": i,
+                        "markdown": f"**Q{i+1}:** {question}\n**A{i+1}:** {answer.text}\n\n",
+                    },
                 )
+            return answer
+
+        # Questions are independent of each other, so ask them concurrently
+        answers = await asyncio.gather(
+            *(
+                answer_question(i, question)
+                for i, question in enumerate(investigation_points)
+            ),
+            return_exceptions=True,
+        )
+
+        for i, (question, answer) in enumerate(
+            zip(investigation_points, answers, strict=True)
+        ):
+            if isinstance(answer, Exception):
+                print(f"    Error invoking LLM for question {i+1}: {answer}")
+                investigation_qa_section += f"**Q{i+1}:** {question}\n**A{i+1}:** [LLM_ERROR] Could not process this question.\n\n"
+            else:
                 investigation_qa_section += (
-                    f"**Q{i+1}:** {question}\n**A{i+1}:** {answer}\n\n"
+                    f"**Q{i+1}:** {question}\n**A{i+1}:** {answer.text}\n\n"
                 )
-            except Exception as e:
-                print(f"    Error invoking LLM for question {i+1}: {e}")
-                investigation_qa_section += f"**Q{i+1}:** {question}\n**A{i+1}:** [LLM_ERROR] Could not process this question.\n\n"
 
         final_report_content += investigation_qa_section
         print("Investigation points processed.")
@@ -571,19 +661,12 @@ Based *strictly* on the Submission Data Context, provide a concise answer to the
         missing_summary += "Please review the source documents or request clarification if this information is critical.\n"
         final_report_content += missing_summary
 
-    # --- 4. Write Final Report --- #
-    print(f"\nWriting final proposal report to: {OUTPUT_REPORT_FILE}")
-    try:
-        with open(OUTPUT_REPORT_FILE, "w", encoding="utf-8") as f:
-            f.write(final_report_content)
-        print("Report generation complete.")
-        response["report_markdown"] = final_report_content
-        response["status"] = "success"
-        response["error"] = None
-    except Exception as e:
-        error_msg = f"Error during final report generation or saving: {e}"
-        print(error_msg)
-        response["error"] = error_msg
+    # --- 4. Return Final Report --- #
+    # The report is returned, only direct runs save it to OUTPUT_REPORT_FILE
+    print("Report generation complete.")
+    response["report_markdown"] = final_report_content
+    response["status"] = "success"
+    response["error"] = None
 
     return response  # Return the structured response
 
@@ -614,6 +697,13 @@ if __name__ == "__main__":
     if not data_path.is_dir():
         print(f"Error: Local data directory not found: {data_path}. Aborting.")
     else:
-        result = generate_netherlands_proposal(data_path, investigation_points_list)
+        result = asyncio.run(
+            generate_netherlands_proposal(
+                load_inputs(data_path), investigation_points_list
+            )
+        )
         print("\n--- Direct Run Result ---")
         print(json.dumps(result, indent=2))
+        if result["status"] == "success":
+            OUTPUT_REPORT_FILE.write_text(result["report_markdown"], encoding="utf-8")
+            print(f"Saved report to: {OUTPUT_REPORT_FILE}")
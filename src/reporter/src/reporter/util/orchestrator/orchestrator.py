@@ -3,13 +3,60 @@ Orchestrates the generation of underwriting proposal reports based on client and
 """
 
 import json
+from collections.abc import Awaitable, Callable
 from pathlib import Path
+from typing import NamedTuple
 
-from .florida_proposal_agent import generate_florida_proposal
-from .netherlands_proposal_agent import generate_netherlands_proposal
+from . import (
+    florida_proposal_agent,
+    netherlands_proposal_agent,
+    turkey_proposal_agent,
+)
+from .streaming import Emit
 
-# Import agent functions (assuming they will be refactored)
-from .turkey_proposal_agent import generate_turkey_proposal
+
+class Agent(NamedTuple):
+    generate: Callable[..., Awaitable[dict]]
+    # submission files the agent reads
+    input_files: tuple[str, ...]
+    # changes whenever the agent's output for the same inputs changes
+    version: str
+
+
+AGENTS = {
+    "turkey": Agent(
+        turkey_proposal_agent.generate_turkey_proposal,
+        turkey_proposal_agent.INPUT_FILES,
+        turkey_proposal_agent.AGENT_VERSION,
+    ),
+    "florida": Agent(
+        florida_proposal_agent.generate_florida_proposal,
+        florida_proposal_agent.INPUT_FILES,
+        florida_proposal_agent.AGENT_VERSION,
+    ),
+    "netherlands": Agent(
+        netherlands_proposal_agent.generate_netherlands_proposal,
+        netherlands_proposal_agent.INPUT_FILES,
+        netherlands_proposal_agent.AGENT_VERSION,
+    ),
+}
+
+
+def get_agent(client_name: str) -> Agent | None:
+    """Returns the client's proposal agent, or None if the client has none."""
+    return AGENTS.get(client_name.lower())
+
+
+def get_agent_models() -> set[tuple[str, float]]:
+    """Returns the (model name, temperature) pairs the agents' LLMs use."""
+    return {
+        (agent.MODEL_NAME, agent.TEMPERATURE)
+        for agent in (
+            turkey_proposal_agent,
+            florida_proposal_agent,
+            netherlands_proposal_agent,
+        )
+    }
 
 
 def load_investigation_json(json_path: Path) -> list[str] | None:
@@ -58,46 +105,37 @@ def load_investigation_json(json_path: Path) -> list[str] | None:
         return None
 
 
-def generate_report_for_client(
+async def generate_report_for_client(
     client_name: str,
-    data_path: Path,
+    inputs: dict[str, str | None],
     investigation_points: list[str] | None = None,
+    emit: Emit | None = None,
 ):
     """Loads data and calls the appropriate agent based on the client name.
 
     Args:
         client_name: The name of the client (e.g., 'turkey', 'florida').
+        inputs: Contents of the agent's `input_files`, keyed by file name.
         investigation_points: A list of strings representing investigation points, or None.
+        emit: Optional callback receiving the report as it is produced.
     """
     # Use the passed list directly
     points_to_investigate = investigation_points if investigation_points else []
 
     # Select and call the appropriate agent
-    client_lower = client_name.lower()
-    agent_response = None  # Variable to hold the response from the agent
-    if client_lower == "turkey":
-        print("\nCalling Turkey Proposal Agent...")
-        agent_response = generate_turkey_proposal(
-            investigation_points=points_to_investigate,
-            local_data_path=data_path,
-        )
-    elif client_lower == "florida":
-        print("\nCalling Florida Proposal Agent...")
-        agent_response = generate_florida_proposal(
-            investigation_points=points_to_investigate,
-            local_data_path=data_path,
-        )
-    elif client_lower == "netherlands":
-        print("\nCalling Netherlands Proposal Agent...")
-        agent_response = generate_netherlands_proposal(
-            investigation_points=points_to_investigate,
-            local_data_path=data_path,
-        )
-    else:
+    agent = get_agent(client_name)
+    if agent is None:
         return {
             "report_markdown": "",
             "status": "error",
             "error": f"Unknown client name: {client_name}",
         }
 
+    print(f"\nCalling {client_name.capitalize()} Proposal Agent...")
+    agent_response = await agent.generate(
+        inputs=inputs,
+        investigation_points=points_to_investigate,
+        emit=emit,
+    )
+
     return agent_response
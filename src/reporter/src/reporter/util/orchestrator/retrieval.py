@@ -0,0 +1,216 @@
+"""
+Retrieval of the submission documents for the proposal agents' prompts.
+
+Instead of pasting whole wordings and submission files into every pass, the
+agents ask `assemble_context` for the parts relevant to what the pass asks
+for: the report sections (`REPORT_SECTION_QUERIES`) or the investigation
+points. The documents are split into chunks of about
+`settings.RETRIEVAL_CHUNK_TOKENS` tokens, embedded once with the embedding
+model of `settings.EMBEDDING_BACKEND` and kept in a llama_index
+`VectorStoreIndex` per document, which the passes of a report and later
+reports on the same documents share. Every query retrieves the
+`settings.RETRIEVAL_TOP_K` most similar chunks of each document; the chunks
+of all queries are merged and returned as excerpts in document order.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from fastapi.concurrency import run_in_threadpool
+
+from reporter.core.config import settings
+from reporter.core.llm import get_embed_model
+from reporter.core.singleflight import get_single_flight
+from reporter.core.token_budget import estimate_tokens
+
+if TYPE_CHECKING:
+    from llama_index.core import VectorStoreIndex
+
+logger = logging.getLogger(__name__)
+
+# One query per section of the report structure the agents share
+REPORT_SECTION_QUERIES = (
+    (
+        "Quotation line: participation share, capacity and line offered on all "
+        "layers and on the top layer"
+    ),
+    "Total line: limits, retentions and premiums of the layers of the programme",
+    (
+        "Expiring terms: expiring limit and expiring premium of the prior year "
+        "programme, renewal"
+    ),
+    (
+        "Why this opportunity: market, exposure, inflation, reinsurance balance, "
+        "payback and financial performance"
+    ),
+    "Rate on line and premium rate of each layer, reinstatements",
+    "Historical losses: loss experience, claims, events and loss ratios",
+    (
+        "Structure and key changes: changes to the programme, coverage, "
+        "exclusions and wording"
+    ),
+    (
+        "Key findings: cedant, period, territory, perils, loss occurrence "
+        "definition, hours clause"
+    ),
+)
+
+# Marks the text left out between two excerpts
+EXCERPT_SEPARATOR = "\n\n[...]\n\n"
+
+# Indexes kept for reuse, an index of the sample submissions is a few MB
+INDEX_CACHE_SIZE = 8
+
+
+class SubmissionIndex:
+    """Vector indexes of the chunks of a set of documents, keyed by name."""
+
+    def __init__(
+        self, documents: dict[str, str], indexes: dict[str, "VectorStoreIndex"]
+    ):
+        self.documents = documents
+        self.indexes = indexes
+
+    @classmethod
+    async def build(cls, documents: dict[str, str]) -> "SubmissionIndex":
+        from llama_index.core import Document, VectorStoreIndex
+        from llama_index.core.node_parser import SentenceSplitter
+        from llama_index.core.schema import MetadataMode
+
+        splitter = SentenceSplitter(
+            chunk_size=settings.RETRIEVAL_CHUNK_TOKENS,
+            chunk_overlap=settings.RETRIEVAL_CHUNK_OVERLAP,
+        )
+        # tokenizing the documents is CPU work, keep it off the event loop
+        nodes = await run_in_threadpool(
+            splitter.get_nodes_from_documents,
+            [Document(text=text, id_=name) for name, text in documents.items()],
+        )
+        # embed here, VectorStoreIndex would embed synchronously
+        embed_model = get_embed_model()
+        embeddings = await embed_model.aget_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        )
+        for node, embedding in zip(nodes, embeddings, strict=True):
+            node.embedding = embedding
+
+        def index(name: str) -> VectorStoreIndex:
+            return VectorStoreIndex(
+                [node for node in nodes if node.ref_doc_id == name],
+                embed_model=embed_model,
+            )
+
+        indexes = {name: await run_in_threadpool(index, name) for name in documents}
+        logger.info(f"Indexed {len(nodes)} chunks of {', '.join(documents)}")
+        return cls(documents, indexes)
+
+    async def retrieve(self, queries: list[str], top_k: int) -> dict[str, str]:
+        """Returns the excerpts of every document relevant to `queries`: the
+        `top_k` chunks of the document most similar to each query, overlapping
+        chunks merged, in document order and separated by
+        `EXCERPT_SEPARATOR`."""
+        # queries are embedded once and looked up in every document's index
+        from llama_index.core.schema import QueryBundle
+
+        embed_model = get_embed_model()
+        embeddings = await asyncio.gather(
+            *(embed_model.aget_query_embedding(query) for query in queries)
+        )
+        bundles = [
+            QueryBundle(query, embedding=embedding)
+            for query, embedding in zip(queries, embeddings, strict=True)
+        ]
+
+        excerpts = {}
+        for name, text in self.documents.items():
+            retriever = self.indexes[name].as_retriever(similarity_top_k=top_k)
+            spans = {
+                (hit.node.start_char_idx, hit.node.end_char_idx)
+                for bundle in bundles
+                for hit in await retriever.aretrieve(bundle)
+            }
+            merged = []
+            for start, end in sorted(spans):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            parts = [text[start:end].strip() for start, end in merged]
+            if merged and merged[0][0] > 0:
+                parts.insert(0, "")
+            if merged and merged[-1][1] < len(text):
+                parts.append("")
+            excerpts[name] = EXCERPT_SEPARATOR.join(parts).strip()
+        return excerpts
+
+
+_indexes: "OrderedDict[str, SubmissionIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+async def get_submission_index(documents: dict[str, str]) -> SubmissionIndex:
+    """Returns the index of `documents`, built on first use."""
+    digest = hashlib.sha256()
+    for part in (
+        settings.EMBEDDING_BACKEND,
+        str(settings.EMBEDDING_MODEL),
+        str(settings.RETRIEVAL_CHUNK_TOKENS),
+        str(settings.RETRIEVAL_CHUNK_OVERLAP),
+        *(part for item in documents.items() for part in item),
+    ):
+        digest.update(part.encode("utf-8") + b"\0")
+    key = digest.hexdigest()
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = await get_single_flight("retrieval_index").run(
+        key, lambda: SubmissionIndex.build(documents)
+    )
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+async def assemble_context(
+    documents: dict[str, str], queries: list[str]
+) -> dict[str, str]:
+    """Returns `documents` with the large ones replaced by their excerpts
+    relevant to `queries`.
+
+    A document is large if its chunks retrieved for all queries could not
+    cover it. Small documents, and all of them if `settings.REPORT_RETRIEVAL`
+    is false or retrieval fails, are returned whole.
+    """
+    top_k = settings.RETRIEVAL_TOP_K
+    max_tokens = len(queries) * top_k * settings.RETRIEVAL_CHUNK_TOKENS
+    large = [
+        name for name, text in documents.items() if estimate_tokens(text) > max_tokens
+    ]
+    if not settings.REPORT_RETRIEVAL or not queries or not large:
+        return dict(documents)
+
+    try:
+        index = await get_submission_index(documents)
+        excerpts = await index.retrieve(list(queries), top_k)
+    except Exception as e:
+        logger.warning(f"Retrieval failed, using the whole documents: {e}")
+        return dict(documents)
+
+    context = dict(documents)
+    for name in large:
+        logger.info(
+            f"Retrieved {estimate_tokens(excerpts[name])} of "
+            f"{estimate_tokens(documents[name])} tokens of {name}"
+        )
+        context[name] = excerpts[name]
+    return context
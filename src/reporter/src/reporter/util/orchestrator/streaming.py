@@ -0,0 +1,127 @@
+"""
+Helpers that let the proposal agents stream their output as it is produced.
+
+Agents report progress through an `Emit` callback with three kinds of events:
+- `token`: a piece of LLM output as it arrives,
+- `section`: a finished markdown section with calculated placeholders filled in,
+- `status`: coarse progress messages.
+"""
+
+import re
+from collections.abc import Awaitable, Callable
+
+Emit = Callable[[str, dict], Awaitable[None]]
+
+# Returns a placeholder filling function once the values it needs can be derived
+# from the given (partial) report text. With `final=True` it must not wait any
+# longer; it may still return None if the values cannot be derived at all.
+FillerFactory = Callable[[str, bool], Callable[[str], str] | None]
+
+HEADING_START = re.compile(r"\n(?=#{1,6}[ \t])")
+
+
+class SectionStreamer:
+    """Splits a streamed markdown report into sections at its headings.
+
+    A section is finished as soon as the next heading starts. Finished sections
+    are held back until `make_filler` can fill their placeholders and are then
+    emitted in order.
+    """
+
+    def __init__(self, emit: Emit, make_filler: FillerFactory, stage: str):
+        self.emit = emit
+        self.make_filler = make_filler
+        self.stage = stage
+        self.text = ""
+        self._fill: Callable[[str], str] | None = None
+        self._pending = ""
+        self._finished: list[str] = []
+        self._held: list[str] = []
+        self._filled: list[str] = []
+
+    async def feed(self, delta: str) -> None:
+        if not delta:
+            return
+        self.text += delta
+        self._pending += delta
+        await self.emit("token", {"stage": self.stage, "delta": delta})
+
+        parts = HEADING_START.split(self._pending)
+        if len(parts) == 1:
+            return
+        self._pending = parts.pop()
+        # split() drops the newline in front of each heading, add it back
+        for part in parts:
+            self._finished.append(part + "\n")
+            self._held.append(part + "\n")
+
+        if self._fill is None:
+            self._fill = self.make_filler("".join(self._finished), False)
+        await self._flush()
+
+    async def finish(self) -> str | None:
+        """Emits the remaining sections and returns the filled report, or None if
+        the placeholders could not be filled."""
+        if self._pending:
+            self._finished.append(self._pending)
+            self._held.append(self._pending)
+            self._pending = ""
+        if self._fill is None:
+            self._fill = self.make_filler(self.text, True)
+        await self._flush(force=True)
+        return "".join(self._filled) if self._fill is not None else None
+
+    async def _flush(self, force: bool = False) -> None:
+        if self._fill is None and not force:
+            return
+        for section in self._held:
+            markdown = self._fill(section) if self._fill is not None else section
+            self._filled.append(markdown)
+            heading = section.lstrip("\n").split("\n", 1)[0]
+            await self.emit(
+                "section",
+                {
+                    "stage": self.stage,
+                    "index": len(self._filled) - 1,
+                    "heading": heading if heading.startswith("#") else None,
+                    "markdown": markdown,
+                },
+            )
+        self._held = []
+
+
+async def complete_report_pass(
+    llm, prompt: str, make_filler: FillerFactory, emit: Emit | None = None
+) -> tuple[str, str | None]:
+    """Runs the report-drafting LLM pass.
+
+    Returns the raw LLM output and the output with its calculated placeholders
+    filled in (None if they could not be filled). With `emit`, the output is
+    streamed and each section is emitted as soon as it can be filled.
+    """
+    if emit is None:
+        response = await llm.acomplete(prompt)
+        fill = make_filler(response.text, True)
+        return response.text, fill(response.text) if fill is not None else None
+
+    streamer = SectionStreamer(emit, make_filler, stage="report")
+    async for chunk in await llm.astream_complete(prompt):
+        await streamer.feed(chunk.delta or "")
+    filled = await streamer.finish()
+    return streamer.text, filled
+
+
+async def stream_completion(
+    llm, prompt: str, emit: Emit | None = None, stage: str = "report"
+) -> str:
+    """Runs an LLM completion, emitting its tokens when `emit` is given."""
+    if emit is None:
+        response = await llm.acomplete(prompt)
+        return response.text
+
+    text = ""
+    async for chunk in await llm.astream_complete(prompt):
+        if chunk.delta:
+            text += chunk.delta
+            await emit("token", {"stage": stage, "delta": chunk.delta})
+    return text
@@ -4,12 +4,18 @@ using direct file loading and LLM synthesis with complex total calculation.
 """
 
 import argparse
+import asyncio
 import json
 import re
 from pathlib import Path
 
 from dotenv import load_dotenv
-from llama_index.llms.google_genai import GoogleGenAI
+
+from reporter.core.llm import get_llm
+from reporter.core.token_budget import ContextSource, fit_prompt
+
+from .retrieval import REPORT_SECTION_QUERIES, assemble_context
+from .streaming import Emit, complete_report_pass, stream_completion
 
 # --- Configuration --- #
 load_dotenv()
@@ -20,11 +26,23 @@ MODEL_NAME = "gemini-2.0-flash"  # Using the consistent model
 TEMPERATURE = 0.1
 MAX_OUTPUT_TOKENS = 4096
 
+# The placeholder the LLM is asked to generate for each layer's ROL
+ROL_PLACEHOLDER = "[ROL Layer Name %]"
+
 # File Paths
 OUTPUT_REPORT_FILE = (
     Path(__file__).resolve().parent.parent / "generated_turkey_proposal_report.md"
 )
 
+# Files of the submission folder this agent reads, fetched by the caller
+TERMS_FILE = "turkey_terms.json"
+SUBMISSION_INFO_FILE = "turkey_submission.json"
+CONTRACT_FILE = "turkey_2024_contract.md"
+INPUT_FILES = (TERMS_FILE, SUBMISSION_INFO_FILE, CONTRACT_FILE)
+
+# Bump whenever prompts or calculations change, this invalidates cached reports
+AGENT_VERSION = "2"
+
 # Report Structure Template (Corrected to match LLM instructions)
 REPORT_STRUCTURE_TEMPLATE = """
 # Underwriting Proposal Report: Turkey
@@ -75,6 +93,11 @@ def load_file(file_path: Path) -> str | None:
         return None
 
 
+def load_inputs(local_data_path: Path) -> dict[str, str | None]:
+    """Loads the agent's input files from a local data directory."""
+    return {name: load_file(local_data_path / name) for name in INPUT_FILES}
+
+
 def load_json_data(file_path: Path) -> dict | None:
     """Loads JSON data from a file."""
     try:
@@ -92,14 +115,10 @@ def load_json_data(file_path: Path) -> dict | None:
 
 
 def initialize_llm():
-    """Initializes the LLM."""
+    """Returns the shared LLM client for this agent's model."""
     try:
         if LLM_PROVIDER == "google":
-            llm = GoogleGenAI(
-                model_name=MODEL_NAME,
-                temperature=TEMPERATURE,
-            )
-            return llm
+            return get_llm(MODEL_NAME, TEMPERATURE)
         else:
             print(f"Error: LLM provider '{LLM_PROVIDER}' not supported.")
             return None
@@ -247,6 +266,87 @@ def calculate_weighted_totals_and_rols(
     return total_limit_calc, total_premium_calc, layer_rols
 
 
+# --- Helper Function to Fill Calculated Placeholders --- #
+def build_placeholder_filler(report_text: str, layers: list[dict], final: bool = True):
+    """
+    Parses the suggested participation from the LLM output and calculates the
+    totals and ROLs. Returns a function replacing the calculated placeholders in
+    the report, or in its sections one after the other.
+
+    Returns None while the percentages cannot be parsed yet, unless `final` is set,
+    in which case 0% is assumed for missing percentages.
+    """
+    # --- Parse Percentages and Calculate Totals (Pass 2 - Script Logic) --- #
+    print("Parsing suggested percentages from LLM output...")
+    all_layers_perc, top_layer_perc = parse_suggested_percentages(report_text)
+
+    if all_layers_perc is None or top_layer_perc is None:
+        if not final:
+            return None
+        print(
+            "Warning: Could not parse percentages from LLM. Using defaults (e.g., 0%)."
+        )
+        # Handle default or error scenario if needed
+        all_layers_perc = all_layers_perc if all_layers_perc is not None else 0.0
+        top_layer_perc = top_layer_perc if top_layer_perc is not None else 0.0
+    else:
+        print(
+            f"Parsed percentages: All Layers={all_layers_perc*100:.2f}%, Top Layer={top_layer_perc*100:.2f}%"
+        )
+
+    # --- Calculations (Existing Logic) --- #
+    print("Identifying top layer (highest occurrenceAttachment)...")
+    top_layer_name = identify_top_layer(layers)
+    print(
+        f"Identified top layer (highest attachment using 'occurrenceAttachment'): {top_layer_name}"
+    )
+
+    print("Calculating weighted totals and ROLs...")
+    total_limit_calc, total_premium_calc, layer_rols = (
+        calculate_weighted_totals_and_rols(
+            layers, all_layers_perc, top_layer_perc, top_layer_name
+        )
+    )
+
+    formatted_total_limit = f"TRY {total_limit_calc:,.2f}"
+    formatted_total_premium = f"TRY {total_premium_calc:,.2f}"
+    print(
+        f"Calculated Weighted Totals: Limit={formatted_total_limit}, Premium={formatted_total_premium}"
+    )
+
+    # Sort layers by name (e.g., Layer 1, Layer 2); the n-th ROL placeholder in the
+    # report gets the ROL of the n-th layer
+    sorted_layer_names = sorted(
+        layer_rols.keys(),
+        key=lambda x: int(re.search(r"\d+", x).group())
+        if re.search(r"\d+", x)
+        else float("inf"),
+    )
+    remaining_rols = [f"{layer_rols[name]:.2f}%" for name in sorted_layer_names]
+
+    def fill(text: str) -> str:
+        # Replace placeholders in the initial report
+        text = text.replace("[Total Limit]", f"Total Limit: {formatted_total_limit}")
+        text = text.replace(
+            "[Total Premium]", f"Total Premium: {formatted_total_premium}"
+        )
+
+        # Replace the *first* occurrence of the generic placeholder per layer
+        while remaining_rols and ROL_PLACEHOLDER in text:
+            rol_value_str = remaining_rols.pop(0)
+            text = text.replace(ROL_PLACEHOLDER, rol_value_str, 1)
+            print(
+                f"  - Replaced one instance of '{ROL_PLACEHOLDER}' with '{rol_value_str}'"
+            )
+
+        # These placeholders appear in the ## Quotation Proposal section
+        text = text.replace("[Total Limit Calculated]", f"{formatted_total_limit}")
+        text = text.replace("[Total Premium Calculated]", f"{formatted_total_premium}")
+        return text
+
+    return fill
+
+
 # --- Helper Function to Extract Concise Subject --- #
 def extract_concise_subject(question):
     """Attempts to extract a concise subject phrase from an investigation question."""
@@ -273,17 +373,68 @@ def extract_concise_subject(question):
     return question[:70] + ("..." if len(question) > 70 else "")
 
 
+# --- Helper Function to Assemble the Submission Context --- #
+async def build_submission_context(
+    terms_data: str,
+    submission_info_data: str,
+    contract_data: str,
+    queries: list[str],
+) -> tuple[str, list[ContextSource]]:
+    """
+    Combines the submission data into the context of a prompt answering
+    `queries`, with the submission info and the contract reduced to their
+    excerpts relevant to the queries (see `retrieval.assemble_context`).
+    Returns the context, with the placeholders of the sources in place of
+    their texts, and the sources; `fit_prompt` fills them in.
+    """
+    documents = await assemble_context(
+        {SUBMISSION_INFO_FILE: submission_info_data, CONTRACT_FILE: contract_data},
+        queries,
+    )
+    # the contract is reduced first if a prompt is over budget
+    terms, submission_info, contract = sources = [
+        ContextSource(TERMS_FILE, terms_data, priority=2),
+        ContextSource(
+            SUBMISSION_INFO_FILE, documents[SUBMISSION_INFO_FILE], priority=1
+        ),
+        ContextSource(CONTRACT_FILE, documents[CONTRACT_FILE]),
+    ]
+    submission_context = f"""
+# TURKEY SUBMISSION DATA
+
+## Terms ({TERMS_FILE})
+{terms.placeholder}
+
+---
+
+## Submission Info ({SUBMISSION_INFO_FILE})
+{submission_info.placeholder}
+
+---
+
+## Contract ({CONTRACT_FILE})
+{contract.placeholder}
+
+# END OF SUBMISSION DATA
+"""
+    return submission_context, sources
+
+
 # --- Main Generation Function --- #
-def generate_turkey_proposal(
-    local_data_path: Path, investigation_points: list[str] | None = None
+async def generate_turkey_proposal(
+    inputs: dict[str, str | None],
+    investigation_points: list[str] | None = None,
+    emit: Emit | None = None,
 ):
     """
     Generates the Turkey underwriting proposal report, incorporating calculations,
     LLM insights, and user-defined investigation points.
 
     Args:
-        local_data_path: Path to the local data directory.
+        inputs: Contents of the `INPUT_FILES`, keyed by file name.
         investigation_points: A list of specific points the user wants investigated.
+        emit: Optional callback receiving tokens and finished sections as they
+            are produced.
     """
     # Placeholder for structured response
     response = {
@@ -293,18 +444,11 @@ def generate_turkey_proposal(
     }
 
     print("--- Starting Turkey Proposal Generation (Standard Calc) ---")
-    print(f"Using local data path: {local_data_path}")
-
-    # Construct input file paths using the provided local_data_path
-    terms_file = local_data_path / "turkey_terms.json"
-    submission_info_file = local_data_path / "turkey_submission.json"
-    contract_file = local_data_path / "turkey_2024_contract.md"
 
     # 1. Load Data
-    print("Loading submission data...")
-    terms_data = load_file(terms_file)
-    submission_info_data = load_file(submission_info_file)
-    contract_data = load_file(contract_file)
+    terms_data = inputs.get(TERMS_FILE)
+    submission_info_data = inputs.get(SUBMISSION_INFO_FILE)
+    contract_data = inputs.get(CONTRACT_FILE)
 
     if not all([terms_data, submission_info_data, contract_data]):
         error_msg = (
@@ -371,118 +515,29 @@ def generate_turkey_proposal(
 
     print("Invoking LLM (Pass 1) to get suggestions and initial report...")
     try:
-        # Combine data into a single context
-        submission_context = f"""
-# TURKEY SUBMISSION DATA
-
-## Terms ({terms_file.name})
-{terms_data}
-
----
-
-## Submission Info ({submission_info_file.name})
-{submission_info_data}
-
----
-
-## Contract ({contract_file.name})
-{contract_data}
-
-# END OF SUBMISSION DATA
-"""
-        prompt_value_pass1 = prompt_pass1_template_str.format(
-            submission_context=submission_context
+        # Combine data into a single context, with the parts relevant to the report sections
+        submission_context, sources = await build_submission_context(
+            terms_data, submission_info_data, contract_data, REPORT_SECTION_QUERIES
+        )
+        prompt_value_pass1 = await fit_prompt(
+            "turkey.pass1",
+            prompt_pass1_template_str.format(submission_context=submission_context),
+            sources,
+        )
+        layers_for_calc = json.loads(terms_data).get("layers", [])
+        _, final_report_content = await complete_report_pass(
+            llm,
+            prompt_value_pass1,
+            lambda text, final: build_placeholder_filler(text, layers_for_calc, final),
+            emit,
         )
-        response_pass1 = llm.complete(prompt_value_pass1)
-        initial_report_content = response_pass1.text
     except Exception as e:
         print(f"Error during LLM invocation (Pass 1): {e}")
         return response
 
-    # --- Parse Percentages and Calculate Totals (Pass 2 - Script Logic) --- #
-    print("Parsing suggested percentages from LLM output...")
-    all_layers_perc, top_layer_perc = parse_suggested_percentages(
-        initial_report_content
-    )
-
-    if all_layers_perc is None or top_layer_perc is None:
-        print(
-            "Warning: Could not parse percentages from LLM. Using defaults (e.g., 0%)."
-        )
-        # Handle default or error scenario if needed
-        all_layers_perc = all_layers_perc if all_layers_perc is not None else 0.0
-        top_layer_perc = top_layer_perc if top_layer_perc is not None else 0.0
-    else:
-        print(
-            f"Parsed percentages: All Layers={all_layers_perc*100:.2f}%, Top Layer={top_layer_perc*100:.2f}%"
-        )
-
-    # --- Calculations (Existing Logic) --- #
-    # (Keep the calculation logic for top layer, weighted totals, ROLs as before)
-    print("Identifying top layer (highest occurrenceAttachment)...")
-    layers_for_calc = json.loads(terms_data).get("layers", [])
-    top_layer_name = identify_top_layer(layers_for_calc)
-    print(
-        f"Identified top layer (highest attachment using 'occurrenceAttachment'): {top_layer_name}"
-    )
-
-    print("Calculating weighted totals and ROLs...")
-    total_limit_calc, total_premium_calc, layer_rols = (
-        calculate_weighted_totals_and_rols(
-            layers_for_calc, all_layers_perc, top_layer_perc, top_layer_name
-        )
-    )
-
-    formatted_total_limit = f"TRY {total_limit_calc:,.2f}"
-    formatted_total_premium = f"TRY {total_premium_calc:,.2f}"
-    print(
-        f"Calculated Weighted Totals: Limit={formatted_total_limit}, Premium={formatted_total_premium}"
-    )
-
-    # Replace placeholders in the initial report
-    final_report_content = initial_report_content.replace(
-        "[Total Limit]", f"Total Limit: {formatted_total_limit}"
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium]", f"Total Premium: {formatted_total_premium}"
-    )
-
-    print("Replacing ROL placeholders...")
-    # Sort layers by name (e.g., Layer 1, Layer 2) to ensure order if needed, though sequential replacement might be sufficient
-    sorted_layer_names = sorted(
-        layer_rols.keys(),
-        key=lambda x: int(re.search(r"\d+", x).group())
-        if re.search(r"\d+", x)
-        else float("inf"),
-    )
-    for layer_name in sorted_layer_names:
-        rol_value_str = f"{layer_rols[layer_name]:.2f}%"
-        placeholder_generic = (
-            "[ROL Layer Name %]"  # The placeholder the LLM was asked to generate
-        )
-        # Replace the *first* occurrence of the generic placeholder
-        final_report_content = final_report_content.replace(
-            placeholder_generic, rol_value_str, 1
-        )
-        print(
-            f"  - Replaced one instance of '{placeholder_generic}' with '{rol_value_str}'"
-        )
-
     # Check if any generic placeholders remain (indicates mismatch between LLM output and calculation)
-    if placeholder_generic in final_report_content:
-        print(
-            f"Warning: Some '{placeholder_generic}' placeholders might remain unreplaced."
-        )
-
-    # --- Replace Quotation Proposal placeholders --- #
-    # These placeholders appear in the ## Quotation Proposal section
-    final_report_content = final_report_content.replace(
-        "[Total Limit Calculated]", f"{formatted_total_limit}"
-    )
-    final_report_content = final_report_content.replace(
-        "[Total Premium Calculated]", f"{formatted_total_premium}"
-    )
-    print("Replaced Quotation Proposal placeholders.")
+    if ROL_PLACEHOLDER in final_report_content:
+        print(f"Warning: Some '{ROL_PLACEHOLDER}' placeholders might remain unreplaced.")
 
     # --- Pass 3: User Investigation Points (Optional) --- #
     if investigation_points:
@@ -507,6 +562,10 @@ def generate_turkey_proposal(
         **SUBMISSION DATA CONTEXT:**
         {submission_context}
         """
+        # Context with the parts relevant to the points
+        submission_context, sources = await build_submission_context(
+            terms_data, submission_info_data, contract_data, investigation_points
+        )
         # Format the points for the prompt
         points_list_str = "\n".join([f"- {p}" for p in investigation_points])
         prompt_pass3 = prompt_pass3_template_str.format(
@@ -515,10 +574,17 @@ def generate_turkey_proposal(
         )
 
         try:
+            prompt_pass3 = await fit_prompt("turkey.pass3", prompt_pass3, sources)
             # Use llm.complete with the formatted prompt string
-            response_pass3 = llm.complete(prompt_pass3)
-            investigation_results = response_pass3.text
+            investigation_results = await stream_completion(
+                llm, prompt_pass3, emit, stage="investigation"
+            )
             print("Investigation results received.")
+            if emit:
+                await emit(
+                    "section",
+                    {"stage": "investigation", "markdown": investigation_results},
+                )
             # Append results (or placeholders) to the main report
             final_report_content += "\n\n" + investigation_results
 
@@ -609,25 +675,8 @@ def generate_turkey_proposal(
         # Remove trailing newline if added
         final_report_content = final_report_content.rstrip()
 
-    # --- Save Final Report --- #
-    print(f"Saving final report to: {OUTPUT_REPORT_FILE}")
-    try:
-        with open(OUTPUT_REPORT_FILE, "w", encoding="utf-8") as f:
-            # Ensure the LLM output starts with the expected markdown format if needed
-            if not initial_report_content.strip().startswith(
-                "# Underwriting Proposal Report: Turkey"
-            ):
-                # Prepend standard header if LLM omitted it (less likely now with template)
-                # f.write("# Underwriting Proposal Report: Turkey\n\n")
-                pass  # Assume template ensures header
-            # Write the main report content generated
-            f.write(final_report_content)
-    except IOError as e:
-        print(f"Error writing report file: {e}")
-
+    # The report is returned, only direct runs save it to OUTPUT_REPORT_FILE
     print("--- Report generation complete. ---")
-
-    print(f"Successfully generated report to {OUTPUT_REPORT_FILE}")
     response["report_markdown"] = final_report_content
     response["status"] = "success"
     response["error"] = None
@@ -660,6 +709,13 @@ if __name__ == "__main__":
     if not data_path.is_dir():
         print(f"Error: Local data directory not found: {data_path}. Aborting.")
     else:
-        result = generate_turkey_proposal(data_path, investigation_points_list)
+        result = asyncio.run(
+            generate_turkey_proposal(
+                load_inputs(data_path), investigation_points_list
+            )
+        )
         print("\n--- Direct Run Result ---")
         print(json.dumps(result, indent=2))
+        if result["status"] == "success":
+            OUTPUT_REPORT_FILE.write_text(result["report_markdown"], encoding="utf-8")
+            print(f"Saved report to: {OUTPUT_REPORT_FILE}")
@@ -1,27 +1,105 @@
+import asyncio
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-from llama_index.core import Document, Settings
-from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
-from llama_index.llms.google_genai import GoogleGenAI
+from reporter.core.config import settings
+from reporter.core.llm import get_llm
+from reporter.core.token_budget import check_prompt
 
-# configure llm and embedding model
-Settings.llm = GoogleGenAI(model_name="models/gemini-2.0-flash-latest")
-Settings.embed_model = GoogleGenAIEmbedding(model_name="models/embedding-001")
+# Bump whenever the prompt or parsing changes, this invalidates cached analyses
+ANALYSIS_VERSION = "2"
+
+# Clause sections of a summary by clause, and the change blocks of a section
+_CLAUSE_BOUNDARY = re.compile(r"\n(?=CLAUSE )")
+_CHANGE_BOUNDARY = re.compile(r"\n(?=\n\n=+ CHANGE \d+ =+\n)")
+
+
+def split_summary(summary_text, max_tokens):
+    """Splits a diff summary into chunks of at most about `max_tokens` tokens.
+
+    Chunks end at clause boundaries where possible, clauses too large for one
+    chunk are split between their change blocks and the clause label is
+    repeated in every chunk. A single change block larger than `max_tokens`
+    becomes a chunk of its own.
+    """
+    max_chars = int(max_tokens * settings.LLM_CHARS_PER_TOKEN)
+    if len(summary_text) <= max_chars:
+        return [summary_text]
+
+    units = []
+    for section in _CLAUSE_BOUNDARY.split(summary_text):
+        if len(section) <= max_chars:
+            units.append(section)
+            continue
+        blocks = _CHANGE_BOUNDARY.split(section)
+        label = section.split("\n", 1)[0] if section.startswith("CLAUSE ") else ""
+        units.append(blocks[0])
+        units.extend(
+            f"{label} (continued)\n{block}" if label else block for block in blocks[1:]
+        )
+
+    chunks, current, size = [], [], 0
+    for unit in units:
+        if current and size + len(unit) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _unique(items):
+    """Items in order without repetitions, ignoring case and spacing."""
+    seen = set()
+    unique = []
+    for item in items:
+        key = " ".join(str(item).lower().split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
 
 
 class SignificantAnalysis:
-    """Analyzes a contract diff summary focusing on significant changes and suggestions, outputting JSON."""
+    """Analyzes a contract diff summary focusing on significant changes and suggestions, outputting JSON.
+
+    Summaries longer than `chunk_tokens` (`settings.ANALYSIS_CHUNK_TOKENS` if
+    None) are analysed map-reduce style: the chunks of `split_summary` are
+    analysed concurrently, at most `settings.ANALYSIS_CONCURRENCY` at a time,
+    and their partial results are merged by a final, small LLM call. Every
+    prompt is checked against the token budget of its call ("analysis" or
+    "analysis.reduce") before it is sent.
+    """
+
+    def __init__(self, summary_text, chunk_tokens=None):
+        from llama_index.core import Document
 
-    def __init__(self, summary_text):
         self.summary_text = summary_text
         self.document = Document(text=self.summary_text)
-        self.llm = Settings.llm
+        self.llm = get_llm()
+        self.chunks = split_summary(
+            summary_text, chunk_tokens or settings.ANALYSIS_CHUNK_TOKENS
+        )
 
-    def _build_prompt(self):
-        """Builds the prompt for the LLM analysis, requesting JSON output."""
+    def _build_prompt(self, summary_text=None, part=None):
+        """Builds the prompt for the LLM analysis, requesting JSON output.
+
+        `part` is (index, count) when `summary_text` is one of several chunks
+        of the summary."""
+        if summary_text is None:
+            summary_text = self.summary_text
+        scope = ""
+        if part is not None:
+            scope = (
+                f"\n        This is part {part[0]} of {part[1]} of the summary, the "
+                "other parts are analyzed separately; analyze only the changes in "
+                "this part.\n"
+            )
         return f"""
-        Analyze the following contract diff summary, which includes changes between two versions of a contract.
+        Analyze the following contract diff summary, which includes changes between two versions of a contract.{scope}
         Focus ONLY on the following aspects:
 
         1.  **Significant Changes:** Identify the most impactful changes based *only* on the provided summary (consider financial impact, scope changes, liability shifts). Describe each significant change as a **brief, factual statement only**. **DO NOT include explanations, implications, or the (CHANGE #) markers in your descriptions.** Just state what changed.
@@ -51,18 +129,110 @@ class SignificantAnalysis:
 
         Ensure the output is valid JSON. Analyze the summary provided below:
         ------------------------------------------------------------
-        {self.summary_text}
+        {summary_text}
+        ------------------------------------------------------------
+        JSON Analysis:
+        """
+
+    def _build_reduce_prompt(self, partial_results):
+        """Builds the prompt merging the analyses of the summary's chunks."""
+        partials = json.dumps(partial_results, indent=2, ensure_ascii=False)
+        return f"""
+        The following JSON objects are analyses of consecutive parts of one
+        contract diff summary. Merge them into a single analysis of the whole
+        contract:
+
+        - `significant_changes`: all significant changes of the parts, without
+          duplicates, most impactful first. Keep each a brief, factual statement.
+        - `overall_impression`: one overall impression of all the changes.
+        - `suggestions_for_investigation`: the suggestions of the parts, merging
+          overlapping ones.
+
+        Structure your entire response as a single JSON object with exactly
+        these three keys and ensure it is valid JSON.
+        ------------------------------------------------------------
+        {partials}
         ------------------------------------------------------------
         JSON Analysis:
         """
 
+    def _merge_results(self, partial_results):
+        """Merges the analyses of the chunks without the LLM, the fallback if
+        the reduce step fails."""
+        return {
+            "significant_changes": _unique(
+                change for r in partial_results for change in r["significant_changes"]
+            ),
+            "overall_impression": " ".join(
+                r["overall_impression"] for r in partial_results
+            ),
+            "suggestions_for_investigation": _unique(
+                s for r in partial_results for s in r["suggestions_for_investigation"]
+            ),
+        }
+
     def run_analysis(self):
-        """Runs the LLM analysis and returns the structured JSON result."""
-        prompt = self._build_prompt()
+        """Runs the LLM analysis and returns the structured JSON result.
+
+        Blocks until done, also when called from a running event loop, whose
+        thread cannot run another loop: the analysis then runs on a loop of
+        its own thread."""
         print("Analyzing summary content for significant changes (JSON output)...")
-        response = self.llm.complete(prompt)
-        response_text = response.text.strip()
+        if len(self.chunks) == 1:
+            prompt = self._build_prompt()
+            check_prompt("analysis", prompt)
+            response = self.llm.complete(prompt)
+            return self._parse_response(response.text.strip())
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun_analysis())
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.arun_analysis()).result()
+
+    async def arun_analysis(self):
+        """Async variant of `run_analysis` that does not block the event loop."""
+        print("Analyzing summary content for significant changes (JSON output)...")
+        if len(self.chunks) == 1:
+            prompt = self._build_prompt()
+            check_prompt("analysis", prompt)
+            response = await self.llm.acomplete(prompt)
+            return self._parse_response(response.text.strip())
+
+        # map: analyse the chunks concurrently
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+        count = len(self.chunks)
+
+        async def analyze(index, chunk):
+            prompt = self._build_prompt(chunk, (index, count))
+            check_prompt("analysis", prompt)
+            async with semaphore:
+                response = await self.llm.acomplete(prompt)
+            return self._parse_response(response.text.strip())
+
+        print(f"Analyzing the summary in {count} chunks...")
+        partial_results = await asyncio.gather(
+            *(analyze(index, chunk) for index, chunk in enumerate(self.chunks, 1))
+        )
+        for result in partial_results:
+            if "error" in result:
+                return result
+
+        # reduce: merge the partial results
+        prompt = self._build_reduce_prompt(partial_results)
+        try:
+            check_prompt("analysis.reduce", prompt)
+            response = await self.llm.acomplete(prompt)
+            merged = self._parse_response(response.text.strip())
+        except Exception as e:
+            merged = {"error": f"Reduce step failed: {e}"}
+        if "error" in merged:
+            print(f"{merged['error']}, merging the partial analyses without the LLM.")
+            return self._merge_results(partial_results)
+        return merged
 
+    def _parse_response(self, response_text):
+        """Parses and validates the JSON analysis from the raw LLM response."""
         # Attempt to clean and parse the JSON output from the LLM
         try:
             # Find the start and end of the JSON block
@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+# the settings are read on import and S3 has no defaults; keep the on-disk
+# caches of the tests out of the shared locations
+_tmp = tempfile.mkdtemp(prefix="reporter-tests-")
+os.environ.setdefault("S3_BUCKET", "test")
+os.environ.setdefault("S3_ENDPOINT_URL", "localhost:9000")
+os.environ.setdefault("S3_ACCESS_KEY", "test")
+os.environ.setdefault("S3_SECRET_KEY", "test")
+for name in ("LLM_CACHE", "REPORT_CACHE", "DIFF_CACHE", "JOB_STORE"):
+    os.environ.setdefault(f"{name}_PATH", os.path.join(_tmp, f"{name.lower()}.db"))
+os.environ.setdefault("OBJECT_CACHE_PATH", os.path.join(_tmp, "objects"))
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
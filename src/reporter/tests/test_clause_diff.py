@@ -0,0 +1,172 @@
+from reporter.util.clause_diff import (
+    Clause,
+    pair_clauses,
+    segment_clauses,
+    summarize_clauses,
+)
+from reporter.util.diff_engines import run_diff_engine
+
+OLD = """Article 1 - Period
+This Contract covers losses occurring from 1 January 2024.
+
+Article 2 - Limit
+The Reinsurer shall be liable for USD 5,000,000 each and every loss.
+
+Article 3 - Exclusions
+This Contract excludes war and terrorism.
+"""
+
+
+def _diffed(text1: str, text2: str) -> list[dict]:
+    clauses = pair_clauses(text1, text2)
+    for clause in clauses:
+        old_text, new_text = clause.pop("old_text"), clause.pop("new_text")
+        clause["diffs"] = []
+        if clause["status"] != "unchanged":
+            clause["diffs"], clause["stats"] = run_diff_engine(
+                "word", old_text, new_text, False
+            )
+    return clauses
+
+
+def test_summary_of_changed_clauses():
+    new = OLD.replace("5,000,000", "7,500,000")
+
+    summary, numeric_changes, _ = summarize_clauses(_diffed(OLD, new))
+
+    assert "CLAUSE article-2 (Limit): modified" in summary
+    assert "article-1" not in summary and "article-3" not in summary
+    assert [change["clause_id"] for change in numeric_changes] == ["article-2"]
+
+
+def test_clauses_with_only_cosmetic_changes_are_left_out():
+    new = OLD.replace("war and terrorism.", "war and terrorism;").replace(
+        "The Reinsurer", "the Reinsurer"
+    )
+
+    summary, _, change_classes = summarize_clauses(
+        _diffed(OLD, new), cosmetic_case=True
+    )
+
+    assert "CLAUSE" not in summary
+    assert "CHANGE" not in summary
+    assert change_classes["punctuation"] == 1 and change_classes["case"] == 1
+
+    # changes of case are substantive unless asked for
+    summary, _, change_classes = summarize_clauses(_diffed(OLD, new))
+    assert "CLAUSE article-2 (Limit): modified" in summary
+    assert "article-3" not in summary
+    assert change_classes["case"] == 0 and change_classes["substantive"] == 1
+
+    summary, _, _ = summarize_clauses(_diffed(OLD, new), drop_cosmetic=False)
+    assert "CLAUSE article-2 (Limit): modified" in summary
+    assert "CLAUSE article-3 (Exclusions): modified" in summary
+
+
+def test_moved_clauses_with_only_cosmetic_changes_are_listed():
+    period = "## Period\nThis Contract covers losses occurring from 1 January.\n\n"
+    limit = "## Limit\nThe Reinsurer shall be liable for USD 5,000,000.\n\n"
+    exclusions = "## Exclusions\nThis Contract excludes war and terrorism.\n"
+    old = period + limit + exclusions
+    new = limit.replace("5,000,000.", "5,000,000;") + period + exclusions
+
+    summary, _, _ = summarize_clauses(_diffed(old, new))
+
+    assert "CLAUSE limit (Limit): modified, moved, cosmetic changes only" in summary
+    assert "CHANGE" not in summary
+
+
+def test_segmentation_gives_back_the_text():
+    preamble = "REINSURANCE CONTRACT\n\n"
+    text = preamble + OLD + "## Schedule\nLayers.\n"
+
+    clauses = segment_clauses(text)
+
+    assert "".join(clause.text for clause in clauses) == text
+    assert [(clause.id, clause.title) for clause in clauses] == [
+        ("preamble", ""),
+        ("article-1", "Period"),
+        ("article-2", "Limit"),
+        ("article-3", "Exclusions"),
+        ("schedule", "Schedule"),
+    ]
+
+
+def test_segmentation_of_headings():
+    text = (
+        "ARTICLE IV\nDEFINITIONS\nTerms.\n"
+        "Section 2.1a: Scope\nText.\n"
+        "Section 2.1a: Scope\nMore text.\n"
+    )
+
+    clauses = segment_clauses(text)
+
+    assert [(clause.id, clause.title) for clause in clauses] == [
+        ("article-iv", "DEFINITIONS"),
+        ("section-2.1a", "Scope"),
+        ("section-2.1a-2", "Scope"),
+    ]
+    assert segment_clauses("No headings.\n") == [
+        Clause("document", "", "No headings.\n")
+    ]
+
+
+def _pairs(text1: str, text2: str) -> dict[str, dict]:
+    return {clause["clause_id"]: clause for clause in pair_clauses(text1, text2)}
+
+
+def test_renumbered_clauses_are_aligned_by_title():
+    new = OLD.replace("Article 2 - Limit", "Article 3 - Limit").replace(
+        "Article 3 - Exclusions", "Article 4 - Exclusions"
+    )
+
+    pairs = _pairs(OLD, new)
+
+    assert pairs["article-3"]["old_clause_id"] == "article-2"
+    assert pairs["article-3"]["renumbered"] and not pairs["article-3"]["moved"]
+    assert pairs["article-4"]["old_clause_id"] == "article-3"
+    assert pairs["article-1"]["status"] == "unchanged"
+
+
+def test_moved_clauses():
+    clauses = segment_clauses(OLD)
+    new = clauses[1].text + clauses[2].text + clauses[0].text
+
+    pairs = pair_clauses(OLD, new)
+
+    assert [pair["clause_id"] for pair in pairs] == [
+        "article-2",
+        "article-3",
+        "article-1",
+    ]
+    assert [pair["clause_id"] for pair in pairs if pair["moved"]] == ["article-1"]
+    assert {pair["status"] for pair in pairs} == {"unchanged"}
+
+
+def test_added_and_deleted_clauses():
+    clauses = segment_clauses(OLD)
+    added = "Article 4 - Arbitration\nDisputes go to arbitration in London.\n"
+    new = clauses[0].text + clauses[2].text.replace("war", "war, riot") + added
+
+    pairs = pair_clauses(OLD, new)
+
+    assert [
+        (pair["old_clause_id"], pair["new_clause_id"], pair["status"]) for pair in pairs
+    ] == [
+        ("article-1", "article-1", "unchanged"),
+        ("article-2", None, "deleted"),
+        ("article-3", "article-3", "modified"),
+        (None, "article-4", "added"),
+    ]
+    assert not any(pair["moved"] for pair in pairs)
+
+
+def test_retitled_clauses_are_aligned_by_id_or_text():
+    new = OLD.replace("Article 2 - Limit", "Article 2 - Limit of Liability").replace(
+        "Article 3 - Exclusions", "Article 9 - General Exclusions"
+    )
+
+    pairs = _pairs(OLD, new)
+
+    assert pairs["article-2"]["old_clause_id"] == "article-2"
+    assert pairs["article-9"]["old_clause_id"] == "article-3"
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from reporter.util import cleaning_rules
+from reporter.util.cleaning_rules import UnknownRuleSetError, get_rule_set
+from reporter.util.document_cleaner import DEFAULT_RULES, HEADER_FOOTER, Rule
+
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cleaning_rules.settings, "CLEANING_RULES_DIR", str(tmp_path))
+    cleaning_rules.load_rule_sets.cache_clear()
+    yield tmp_path
+    cleaning_rules.load_rule_sets.cache_clear()
+
+
+def _write(rules_dir, name: str, data: dict):
+    (rules_dir / f"{name}.json").write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_rule_sets_extend_each_other(rules_dir):
+    _write(
+        rules_dir,
+        "broker",
+        {
+            "extends": "default",
+            "rules": [
+                {"name": "broker_footer", "kind": "header_footer", "pattern": "XYZ"},
+                {"name": "slip", "kind": "header_footer", "pattern": "Slip"},
+            ],
+        },
+    )
+    _write(
+        rules_dir,
+        "Client",
+        {
+            "extends": "BROKER",
+            "detect_headers_footers": False,
+            "rules": [{"name": "client", "kind": "page_break", "pattern": "---"}],
+        },
+    )
+
+    broker = get_rule_set("broker")
+    client = get_rule_set("client")
+
+    names = [rule.name for rule in DEFAULT_RULES]
+    assert [rule.name for rule in broker.rules] == [*names, "slip"]
+    # a rule with the name of an inherited one replaces it in place
+    assert broker.rules[names.index("broker_footer")] == Rule(
+        "broker_footer", HEADER_FOOTER, "XYZ"
+    )
+    assert client.rules[: len(broker.rules)] == broker.rules
+    assert broker.detect_headers_footers and not client.detect_headers_footers
+    assert (
+        len({get_rule_set().fingerprint, broker.fingerprint, client.fingerprint}) == 3
+    )
+
+
+def test_default_rule_set(rules_dir):
+    assert get_rule_set() is get_rule_set("Default")
+    assert get_rule_set().rules == DEFAULT_RULES
+
+
+def test_unknown_rule_set(rules_dir):
+    _write(rules_dir, "broker", {})
+
+    with pytest.raises(UnknownRuleSetError, match="available: broker, default"):
+        get_rule_set("client")
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        ({"rules": [{"name": "a", "kind": "other", "pattern": "a"}]}, "unknown kind"),
+        ({"rules": [{"name": "a", "kind": "page_break", "pattern": "("}]}, "pattern"),
+        ({"rules": [{"name": "a"}]}, "invalid rule"),
+        ({"extends": "client"}, "extend each other"),
+    ],
+)
+def test_invalid_rule_sets(rules_dir, data, message):
+    _write(rules_dir, "client", data)
+
+    with pytest.raises(ValueError, match=message):
+        get_rule_set("client")
@@ -0,0 +1,111 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from reporter.core.sqlite_cache import SqliteCache
+from reporter.util import clause_diff, compare_contracts
+from reporter.util.cleaning_rules import RuleSet, get_rule_set
+from reporter.util.document_cleaner import PAGE_BREAK, Rule
+
+OLD = (
+    "Article 1 - Limits\nThe limit is USD 1,000,000 each loss. Draft\n\n"
+    "Article 2 - Exclusions\nWar and terrorism are excluded.\n"
+)
+NEW = OLD.replace("1,000,000", "2,000,000")
+
+# the function run in the process pool by each stage, once per run of it
+STAGES = {
+    "clean_document_with_stats": "clean",
+    "pair_clauses": "diff",
+    "summarize_clauses": "summary",
+}
+
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch):
+    """Runs the comparison pipeline in this process with its own stage cache,
+    counting the runs of every stage."""
+    runs = Counter()
+    cache = SqliteCache(str(tmp_path / "diff.db"), ttl_seconds=3600, max_bytes=10**8)
+    monkeypatch.setattr(compare_contracts, "get_diff_cache", lambda: cache)
+
+    async def run_inline(func, *args):
+        if func.__name__ in STAGES:
+            runs[STAGES[func.__name__]] += 1
+        return func(*args)
+
+    for module in (compare_contracts, clause_diff):
+        monkeypatch.setattr(module, "run_in_process_pool", run_inline)
+
+    class FakeAnalysis:
+        def __init__(self, summary: str):
+            self.summary = summary
+
+        async def arun_analysis(self) -> dict:
+            runs["analysis"] += 1
+            return {"significant_changes": [self.summary]}
+
+    monkeypatch.setattr(compare_contracts, "SignificantAnalysis", FakeAnalysis)
+    return runs
+
+
+def _compare(**kwargs) -> dict:
+    return asyncio.run(
+        compare_contracts.compare_contracts(
+            OLD, NEW, diff_engine="word", by_clause=True, **kwargs
+        )
+    )
+
+
+def test_repeat_comparisons_are_served_from_the_cache(stages):
+    first = _compare()
+    assert stages == {"clean": 2, "diff": 1, "summary": 1, "analysis": 1}
+
+    assert _compare() == first
+    assert stages == {"clean": 2, "diff": 1, "summary": 1, "analysis": 1}
+
+
+@pytest.mark.parametrize(
+    "version, recomputed",
+    [
+        ("CLEAN_VERSION", {"clean": 2, "diff": 1, "summary": 1}),
+        ("DIFF_VERSION", {"diff": 1, "summary": 1}),
+        ("CLAUSE_VERSION", {"diff": 1, "summary": 1}),
+        ("SUMMARY_VERSION", {"summary": 1}),
+        ("ANALYSIS_VERSION", {"analysis": 1}),
+    ],
+)
+def test_bumping_a_stage_version_recomputes_it_and_later_stages(
+    stages, monkeypatch, version, recomputed
+):
+    first = _compare()
+    before = stages.copy()
+
+    monkeypatch.setattr(compare_contracts, version, "bumped")
+    second = _compare()
+
+    # recomputed diffs differ in their timings only
+    for key in ("significant_changes", "numeric_changes", "change_classes"):
+        assert second[key] == first[key]
+    # the analysis is keyed by the summary text, an unchanged summary
+    # reuses it
+    assert stages - before == Counter(recomputed)
+
+
+def test_changed_rules_recompute_every_stage(stages, monkeypatch):
+    default = get_rule_set()
+    draft = RuleSet("draft", (*default.rules, Rule("draft", PAGE_BREAK, r" Draft")))
+    rule_sets = {"default": default, "draft": draft}
+    monkeypatch.setattr(compare_contracts, "get_rule_set", rule_sets.__getitem__)
+    first = _compare()
+    before = stages.copy()
+
+    changed = _compare(rule_set="draft")
+
+    assert stages - before == Counter(clean=2, diff=1, summary=1, analysis=1)
+    assert "Draft" in first["significant_changes"][0]
+    assert "Draft" not in changed["significant_changes"][0]
+    # the comparison with the other rules is still cached
+    assert _compare() == first
+    assert stages - before == Counter(clean=2, diff=1, summary=1, analysis=1)
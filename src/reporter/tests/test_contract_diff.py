@@ -0,0 +1,137 @@
+import random
+
+import pytest
+from diff_match_patch import diff_match_patch
+
+from reporter.util.contract_diff import generate_llm_diff_summary, iter_change_blocks
+
+
+def _old_summary(diffs, context_chars=75):
+    """The summary as generated before the single-pass `iter_change_blocks`,
+    one block per change, with the context taken from the whole texts."""
+    parts = [f"Summary of Contract Changes:\n{'=' * 30}\n"]
+    count = pos1 = pos2 = 0
+    text1 = "".join(data for op, data in diffs if op != 1)
+    text2 = "".join(data for op, data in diffs if op != -1)
+    skip = -1
+    for i, (op, data) in enumerate(diffs):
+        if i == skip:
+            continue
+        if op == 0:
+            pos1 += len(data)
+            pos2 += len(data)
+            continue
+        count += 1
+        parts.append(f"\n\n==================== CHANGE {count} ====================")
+        before = text1[max(0, pos1 - context_chars) : pos1].replace("\n", " ")
+        parts.append(f"CONTEXT_BEFORE: ...{before.strip()}")
+        deleted, inserted = "(No text deleted)", "(No text inserted)"
+        if op == -1:
+            deleted = data.strip()
+            pos1 += len(data)
+            if i + 1 < len(diffs) and diffs[i + 1][0] == 1:
+                inserted = diffs[i + 1][1].strip()
+                pos2 += len(diffs[i + 1][1])
+                skip = i + 1
+        else:
+            inserted = data.strip()
+            pos2 += len(data)
+        parts.append(f"--- DELETED ---\n{deleted}")
+        parts.append(f"+++ INSERTED +++\n{inserted}")
+        after = text2[pos2 : pos2 + context_chars].replace("\n", " ")
+        parts.append(f"CONTEXT_AFTER: {after.strip()}...")
+        parts.append("=============================================")
+    return "\n".join(parts)
+
+
+def _lines(block: str) -> list[str]:
+    return block.strip().split("\n")
+
+
+@pytest.mark.parametrize("gap", [1, 50, 149])
+def test_close_changes_are_merged(gap):
+    between = "m" * gap
+    diffs = [
+        (0, "a" * 100),
+        (-1, "old one"),
+        (1, "new one"),
+        (0, between),
+        (1, "added"),
+        (0, "z" * 100),
+    ]
+
+    (block,) = iter_change_blocks(diffs, context_chars=75)
+
+    assert _lines(block) == [
+        "==================== CHANGE 1 ====================",
+        "CONTEXT_BEFORE: ..." + "a" * 75,
+        "--- DELETED ---",
+        "old one",
+        "+++ INSERTED +++",
+        "new one",
+        f"UNCHANGED: {between}",
+        "--- DELETED ---",
+        "(No text deleted)",
+        "+++ INSERTED +++",
+        "added",
+        "CONTEXT_AFTER: " + "z" * 75 + "...",
+        "=============================================",
+    ]
+
+
+@pytest.mark.parametrize("gap", [150, 400])
+def test_distant_changes_are_split(gap):
+    between = "".join(chr(ord("a") + i % 26) for i in range(gap))
+    diffs = [(0, "x" * 20), (-1, "removed"), (0, between), (-1, "gone"), (1, "new")]
+
+    blocks = list(iter_change_blocks(diffs, context_chars=75, start=7))
+
+    assert [_lines(block) for block in blocks] == [
+        [
+            "==================== CHANGE 7 ====================",
+            "CONTEXT_BEFORE: ..." + "x" * 20,
+            "--- DELETED ---",
+            "removed",
+            "+++ INSERTED +++",
+            "(No text inserted)",
+            f"CONTEXT_AFTER: {between[:75]}...",
+            "=============================================",
+        ],
+        [
+            "==================== CHANGE 8 ====================",
+            f"CONTEXT_BEFORE: ...{between[-75:]}",
+            "--- DELETED ---",
+            "gone",
+            "+++ INSERTED +++",
+            "new",
+            "CONTEXT_AFTER: ...",
+            "=============================================",
+        ],
+    ]
+
+
+def test_leading_change_has_no_context_before():
+    diffs = [(1, "Preamble\n"), (0, "Article 1\nThe limit applies.")]
+
+    (block,) = iter_change_blocks(diffs, context_chars=10)
+
+    assert _lines(block)[1] == "CONTEXT_BEFORE: ..."
+    assert _lines(block)[-2] == "CONTEXT_AFTER: Article 1..."
+
+
+def test_summary_of_distant_changes_is_unchanged():
+    rng = random.Random(7)
+    words = [f"w{rng.randrange(1000)}" for _ in range(3000)]
+    new = list(words)
+    # one changed, removed or added word every 40 words at least
+    for i in range(20, len(words) - 40, 40 + rng.randrange(40)):
+        new[i] = rng.choice(["CHANGED", "", f"{new[i]} ADDED"])
+    dmp = diff_match_patch()
+    diffs = dmp.diff_main(" ".join(words), " ".join(new))
+    dmp.diff_cleanupSemantic(diffs)
+
+    summary = generate_llm_diff_summary(diffs)
+
+    assert summary.count("CHANGE ") > 30
+    assert "UNCHANGED: " not in summary
+    assert summary == _old_summary(diffs)
@@ -0,0 +1,110 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from reporter.util.diff_engines import (
+    DELETE,
+    DIFF_ENGINES,
+    EQUAL,
+    INSERT,
+    UnknownDiffEngineError,
+    change_runs,
+    get_diff_engine,
+    run_diff_engine,
+)
+
+FILES = Path(__file__).resolve().parent.parent / "files"
+
+WORDS = ["the", "Reinsurer", "shall", "pay", "5%", "USD", "1,000,000", "loss", "é"]
+# repeated lines test the unique and rare line anchors of patience and histogram
+LINES = ["Article 1", "", "The Reinsurer shall pay.", "| a | b |", "  indented"]
+
+
+def _line(rng: random.Random) -> str:
+    if rng.random() < 0.4:
+        return rng.choice(LINES)
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+
+
+def _edit(rng: random.Random, lines: list[str]) -> list[str]:
+    lines = list(lines)
+    for _ in range(rng.randint(0, 6)):
+        position = rng.randint(0, len(lines))
+        action = rng.choice(["insert", "delete", "replace", "move"])
+        if action == "insert" or not lines:
+            lines.insert(position, _line(rng))
+            continue
+        position = min(position, len(lines) - 1)
+        if action == "delete":
+            del lines[position]
+        elif action == "replace":
+            words = lines[position].split(" ")
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+            lines[position] = " ".join(words)
+        else:
+            lines.insert(rng.randint(0, len(lines)), lines.pop(position))
+    return lines
+
+
+def _texts(seed: int) -> tuple[str, str]:
+    rng = random.Random(seed)
+    old = [_line(rng) for _ in range(rng.randint(0, 30))]
+    new = _edit(rng, old)
+    ending1, ending2 = rng.choice(["", "\n"]), rng.choice(["", "\n"])
+    return "\n".join(old) + ending1, "\n".join(new) + ending2
+
+
+def _sides(diffs) -> tuple[str, str]:
+    old = "".join(text for op, text in diffs if op != INSERT)
+    new = "".join(text for op, text in diffs if op != DELETE)
+    return old, new
+
+
+@pytest.mark.parametrize("engine", DIFF_ENGINES)
+def test_diffs_reproduce_both_texts(engine):
+    for seed in range(200):
+        text1, text2 = _texts(seed)
+        diffs, stats = run_diff_engine(engine, text1, text2, trace_memory=False)
+        assert _sides(diffs) == (text1, text2), f"seed {seed}"
+        assert stats["hunks"] == sum(op != EQUAL for op, _ in diffs)
+        if text1 == text2:
+            assert all(op == EQUAL for op, _ in diffs), f"seed {seed}"
+
+
+@pytest.mark.parametrize("engine", DIFF_ENGINES)
+def test_diffs_of_wordings_reproduce_both_texts(engine):
+    old = (FILES / "submission_turkey" / "turkey_2023_wording.md").read_text("utf-8")
+    new = (FILES / "submission_turkey" / "turkey_2024_wording (1).md").read_text(
+        "utf-8"
+    )
+
+    diffs, stats = run_diff_engine(engine, old, new, trace_memory=False)
+
+    assert _sides(diffs) == (old, new)
+    assert stats["engine"] == engine
+    assert stats["peak_memory_bytes"] is None
+
+
+def test_peak_memory():
+    _, stats = run_diff_engine("WORD", "a b c\n", "a d c\n")
+
+    assert stats["engine"] == "word"
+    assert stats["peak_memory_bytes"] > 0
+
+
+def test_change_runs():
+    diffs = [(EQUAL, "a"), (DELETE, "b"), (INSERT, "c"), (EQUAL, "d"), (INSERT, "e")]
+
+    assert list(change_runs(diffs)) == [
+        (EQUAL, "a"),
+        (None, ("b", "c")),
+        (EQUAL, "d"),
+        (None, (None, "e")),
+    ]
+
+
+def test_unknown_engine():
+    assert get_diff_engine("Patience") is DIFF_ENGINES["patience"]
+    with pytest.raises(UnknownDiffEngineError, match="available: char, line"):
+        get_diff_engine("myers")
@@ -0,0 +1,131 @@
+import random
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from reporter.util.document_cleaner import (
+    DEFAULT_RULES,
+    DETECTED_HEADER_FOOTER,
+    clean_document_multipass,
+    clean_text,
+    get_cleaner,
+)
+
+FILES = Path(__file__).resolve().parent.parent / "files"
+
+# Lines the default rules treat specially, and their near misses
+LINES = [
+    "Page 5",
+    "Page 16 X",
+    "Page B-12",
+    "Page 7 ",
+    " Page 5",
+    "**--- PAGE BREAK ---**",
+    "text **---PAGE BREAK---** text",
+    "Contract X",
+    "  Broker ABC  ",
+    "23\\X",
+    "25\\X",
+    "Contract X and more",
+    "",
+    "",
+    " ",
+    "\t",
+    "Article 1 - Definitions",
+    "The Reinsurer shall pay 5% of the loss.",
+    "| Layer | Limit |",
+]
+# Lines a multi-pass pattern can match across, cleaned by the fallback
+CROSS_LINE = ["Page", "Page ", "X", "**---", "PAGE BREAK ---**"]
+
+
+def _document(seed: int) -> str:
+    rng = random.Random(seed)
+    return "\n".join(
+        rng.choice(CROSS_LINE if rng.random() < 0.02 else LINES)
+        for _ in range(rng.randint(0, 60))
+    )
+
+
+def test_single_pass_equals_multipass():
+    for seed in range(500):
+        text = _document(seed)
+        assert clean_text(text, detect_headers_footers=False) == (
+            clean_document_multipass(text)
+        ), f"seed {seed}"
+
+
+@pytest.mark.parametrize(
+    "path", sorted(FILES.glob("submission_*/*.md")), ids=lambda path: path.name
+)
+def test_single_pass_equals_multipass_on_wordings(path):
+    text = path.read_text(encoding="utf-8")
+
+    assert clean_text(text, detect_headers_footers=False) == (
+        clean_document_multipass(text)
+    )
+
+
+def test_removed_characters_per_rule():
+    text = "Intro\nPage 5\nBody **--- PAGE BREAK ---** text\n\nContract X\nEnd"
+    removed = Counter()
+
+    cleaned = clean_text(text, removed=removed, detect_headers_footers=False)
+
+    assert cleaned == "Intro\n\nBody  text\n\nEnd"
+    assert removed == {"page_number": 6, "page_break": 22, "contract_header": 10}
+
+
+BODIES = ["Definitions.", "Cover.", "Exclusions.", "Claims.", "Arbitration."]
+
+
+def _paged(pages: int) -> str:
+    return "\n**--- PAGE BREAK ---**\n".join(
+        f"REINSURANCE WORDING 2024\n\n{BODIES[page - 1]}\n\nPAGE {page} OF {pages}"
+        for page in range(1, pages + 1)
+    )
+
+
+def test_running_headers_and_footers_are_detected_by_default():
+    text = _paged(5)
+
+    detected = get_cleaner(DEFAULT_RULES).detect_headers_footers(text.split("\n"))
+    assert {rule.name for rule in detected} == {DETECTED_HEADER_FOOTER}
+    assert len(detected) == 2
+
+    cleaned = clean_text(text)
+    assert "REINSURANCE WORDING" not in cleaned
+    assert "OF 5" not in cleaned
+    assert cleaned.split("\n\n") == BODIES
+    assert "PAGE 3 OF 5" in clean_text(text, detect_headers_footers=False)
+
+
+def test_short_documents_have_no_running_headers():
+    assert get_cleaner().detect_headers_footers(_paged(1).split("\n")) == ()
+
+
+def test_unknown_rule_kind():
+    with pytest.raises(ValueError, match="Unknown kind"):
+        get_cleaner((*DEFAULT_RULES, DEFAULT_RULES[0]._replace(kind="other")))
+
+
+def test_single_pass_counts_equal_multipass():
+    for seed in range(500):
+        text = _document(seed)
+        removed, reference = Counter(), Counter()
+
+        clean_text(text, removed=removed, detect_headers_footers=False)
+        clean_document_multipass(text, reference)
+
+        assert removed == reference, f"seed {seed}"
+
+
+def test_cross_line_matches_are_counted_by_the_fallback():
+    text = "Intro\nPage\n5\nBody\n**---\nPAGE BREAK ---** text"
+    removed = Counter()
+
+    cleaned = clean_text(text, removed=removed, detect_headers_footers=False)
+
+    assert cleaned == "Intro\n\nBody\n text"
+    assert removed == {"page_number": 6, "page_break": 22}
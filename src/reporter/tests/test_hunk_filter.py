@@ -0,0 +1,97 @@
+from collections import Counter
+
+import pytest
+
+from reporter.util.contract_diff import generate_llm_diff_summary
+from reporter.util.diff_engines import DELETE, EQUAL, INSERT, run_diff_engine
+from reporter.util.hunk_filter import (
+    SUBSTANTIVE,
+    classify_change,
+    filter_cosmetic_changes,
+)
+from reporter.util.numeric_diff import merge_numerical_diffs
+
+
+@pytest.mark.parametrize(
+    "deleted, inserted, expected",
+    [
+        ("a  b", "a b", "whitespace"),
+        ("“limit”", '"limit"', "typography"),
+        ("**Limit**", "Limit", "markdown"),
+        ("| a |", "a", "table"),
+        ("Limit;", "Limit:", "punctuation"),
+        ("(the Reinsurer)", "the Reinsurer", "punctuation"),
+        ("clause - as", "clause as", "punctuation"),
+    ],
+)
+def test_cosmetic_changes(deleted, inserted, expected):
+    assert classify_change(deleted, inserted) == expected
+    assert classify_change(deleted, inserted, case=True) == expected
+
+
+def test_case_changes_are_cosmetic_only_if_asked_for():
+    assert classify_change("Reinsurer", "reinsurer") == SUBSTANTIVE
+    assert classify_change("Reinsurer", "reinsurer", case=True) == "case"
+    assert classify_change("“Insured”", '"insured"', case=True) == "case"
+
+
+def test_defined_term_change_is_kept():
+    counts = Counter()
+    diffs = [(EQUAL, "the "), (DELETE, "insured"), (INSERT, "Insured")]
+
+    assert filter_cosmetic_changes(diffs, counts) == diffs
+    assert counts == {SUBSTANTIVE: 1}
+
+
+@pytest.mark.parametrize(
+    "deleted, inserted",
+    [
+        ("$", "€"),
+        ("£", "$"),
+        ("5%", "5"),
+        ("≤", "≥"),
+        ("<", ">"),
+        ("+", ""),
+        ("-5", "5"),
+        ("1.5", "15"),
+        ("1,000", "1000,"),
+        ("excluded", "included"),
+    ],
+)
+def test_substantive_changes(deleted, inserted):
+    assert classify_change(deleted, inserted) == SUBSTANTIVE
+
+
+def test_currency_change_is_kept():
+    diffs = [(EQUAL, "Premium "), (DELETE, "$"), (INSERT, "€"), (EQUAL, "5m")]
+    assert filter_cosmetic_changes(diffs) == diffs
+
+
+def test_cosmetic_change_is_dropped_and_counted():
+    counts = Counter()
+    diffs = [(EQUAL, "the "), (DELETE, "Reinsurer"), (INSERT, "reinsurer")]
+    assert filter_cosmetic_changes(diffs, counts, case=True) == [
+        (EQUAL, "the "),
+        (EQUAL, "reinsurer"),
+    ]
+    assert counts == {"case": 1}
+
+
+def test_keep_cosmetic_changes():
+    diffs = [(EQUAL, "the "), (DELETE, "Reinsurer;"), (INSERT, "Reinsurer:")]
+    assert filter_cosmetic_changes(diffs, drop=False) == diffs
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ("Premium $5m per layer", "Premium €5m per layer"),
+        ("Limit GBP 5m, £ 10m", "Limit GBP 5m, $ 10m"),
+        ("Retention 5% of the loss", "Retention 5 of the loss"),
+        ("if the loss ≤ the retention", "if the loss ≥ the retention"),
+    ],
+)
+def test_substantive_change_reaches_the_summary(old, new):
+    diffs, _ = run_diff_engine("char", old, new, trace_memory=False)
+    diffs = filter_cosmetic_changes(merge_numerical_diffs(diffs))
+    assert "CHANGE 1" in generate_llm_diff_summary(diffs)
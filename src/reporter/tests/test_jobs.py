@@ -0,0 +1,183 @@
+import asyncio
+import threading
+
+import pytest
+
+from reporter.core import jobs
+from reporter.core.config import settings
+from reporter.core.jobs import JobQueue, JobStore, QueueFullError
+from reporter.schemas.job import JobStatus
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(settings, "JOB_STORE_PATH", path)
+    monkeypatch.setattr(settings, "JOB_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(jobs, "_job_store", None)
+    return path
+
+
+def test_every_job_is_claimed_once(store_path):
+    JobStore(store_path)
+    for i in range(50):
+        JobStore(store_path).create("report", {"i": i})
+
+    claimed = []
+
+    def claim(owner):
+        # one connection per "process"
+        store = JobStore(store_path)
+        while (job := store.claim("report", owner, 60)) is not None:
+            claimed.append(job["payload"]["i"])
+
+    threads = [threading.Thread(target=claim, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(50))
+
+
+def test_only_expired_leases_are_claimed_again(store_path):
+    store = JobStore(store_path)
+    job = store.create("report", {})
+    assert store.claim("report", "a", 60)["id"] == job["id"]
+    assert store.claim("report", "b", 60) is None
+
+    # a lease that has already expired, as if its process had died
+    store.create("report", {})
+    store.claim("report", "a", -1)
+    stale = store.claim("report", "b", 60)
+    assert stale is not None and stale["owner"] == "b"
+    # the previous owner cannot finish the job any more
+    assert not store.finish(stale["id"], "a", status=JobStatus.SUCCEEDED)
+    assert store.finish(stale["id"], "b", status=JobStatus.SUCCEEDED)
+
+
+def run_queues(count, handler, payloads, workers=2, max_size=100):
+    """Runs `count` queues sharing the store, like the workers of `count`
+    processes, until all `payloads` have finished."""
+
+    async def main():
+        queues = [JobQueue("report", handler, workers, max_size) for _ in range(count)]
+        for queue in queues:
+            await queue.start()
+        try:
+            submitted = [
+                await queues[i % count].submit(payload)
+                for i, payload in enumerate(payloads)
+            ]
+            return [await queues[0].wait(job["id"], 10) for job in submitted]
+        finally:
+            for queue in queues:
+                await queue.stop()
+
+    return asyncio.run(main())
+
+
+def test_jobs_run_once_across_processes(store_path):
+    runs = []
+
+    async def handler(payload):
+        runs.append(payload["i"])
+        await asyncio.sleep(0.01)
+        return {"status": "success", "i": payload["i"]}
+
+    finished = run_queues(3, handler, [{"i": i} for i in range(20)])
+    assert sorted(runs) == list(range(20))
+    assert [job["status"] for job in finished] == [JobStatus.SUCCEEDED] * 20
+    assert [job["result"]["i"] for job in finished] == list(range(20))
+
+
+def test_failed_jobs(store_path):
+    async def handler(payload):
+        raise ValueError("no report")
+
+    (job,) = run_queues(1, handler, [{}])
+    assert job["status"] == JobStatus.FAILED and job["error"] == "no report"
+
+
+def test_error_results_fail_the_job(store_path):
+    async def handler(payload):
+        return {"status": "error", "error": "Unknown client name: mars"}
+
+    (job,) = run_queues(1, handler, [{}])
+    assert job["status"] == JobStatus.FAILED
+    assert job["error"] == "Unknown client name: mars"
+    assert job["result"]["status"] == "error"
+
+
+def test_queue_full(store_path):
+    async def main():
+        queue = JobQueue("report", None, workers=0, max_size=2)
+        await queue.start()
+        await queue.submit({})
+        await queue.submit({})
+        with pytest.raises(QueueFullError):
+            await queue.submit({})
+
+    asyncio.run(main())
+
+
+def test_stopped_queue_releases_its_job(store_path):
+    async def main():
+        running = asyncio.Event()
+
+        async def handler(payload):
+            running.set()
+            await asyncio.sleep(60)
+
+        queue = JobQueue("report", handler, workers=1, max_size=10)
+        await queue.start()
+        job = await queue.submit({})
+        await running.wait()
+        await queue.stop()
+        return await queue.get(job["id"])
+
+    job = asyncio.run(main())
+    assert job["status"] == JobStatus.QUEUED and job["owner"] is None
+
+
+def test_waiting_on_jobs_of_other_processes_leaves_no_events(store_path):
+    async def handler(payload):
+        await asyncio.sleep(0.1)
+        return {"status": "success"}
+
+    async def main():
+        runner = JobQueue("report", handler, workers=1, max_size=10)
+        waiter = JobQueue("report", handler, workers=0, max_size=10)
+        for queue in (runner, waiter):
+            await queue.start()
+        try:
+            job = await waiter.submit({})
+            # times out while the job runs, then waits until it has finished
+            waited = [await waiter.wait(job["id"], t) for t in (0.01, 10)]
+            assert [job["status"] == JobStatus.SUCCEEDED for job in waited] == [
+                False,
+                True,
+            ]
+            return runner._done, waiter._done
+        finally:
+            for queue in (runner, waiter):
+                await queue.stop()
+
+    assert asyncio.run(main()) == ({}, {})
+
+
+def test_workers_survive_store_errors(store_path, monkeypatch):
+    failures = [RuntimeError("database is locked")] * 2
+    claim = JobStore.claim
+
+    def flaky_claim(self, *args):
+        if failures:
+            raise failures.pop()
+        return claim(self, *args)
+
+    monkeypatch.setattr(JobStore, "claim", flaky_claim)
+
+    async def handler(payload):
+        return {"status": "success"}
+
+    (job,) = run_queues(1, handler, [{}], workers=1)
+    assert job["status"] == JobStatus.SUCCEEDED and failures == []
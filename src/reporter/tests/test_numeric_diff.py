@@ -0,0 +1,80 @@
+import pytest
+
+from reporter.util.diff_engines import run_diff_engine
+from reporter.util.numeric_diff import merge_numerical_diffs, parse_amount
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("USD 5,000,000", (5e6, "USD")),
+        ("$5m", (5e6, "USD")),
+        ("€ 2.5 million", (2.5e6, "EUR")),
+        ("TL 2.500.000", (2.5e6, "TRY")),
+        ("7,5%", (7.5, "%")),
+        ("12.5 percent", (12.5, "%")),
+        ("750k", (750e3, "")),
+        ("1,000", (1000.0, "")),
+    ],
+)
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1,000 b", "10,000 m", "5 k", "Article", ""])
+def test_no_amount(text):
+    assert parse_amount(text) is None
+
+
+def merge(old, new):
+    diffs, _ = run_diff_engine("char", old, new, trace_memory=False)
+    deltas = []
+    merged = merge_numerical_diffs(diffs, deltas)
+    return merged, deltas
+
+
+def new_text(diffs):
+    return "".join(text for op, text in diffs if op >= 0)
+
+
+def old_text(diffs):
+    return "".join(text for op, text in diffs if op <= 0)
+
+
+@pytest.mark.parametrize(
+    "old, new, change",
+    [
+        ("Limit: USD 5,000,000 xs", "Limit: USD 7,500,000 xs", (5e6, 7.5e6, "USD")),
+        ("Retention $5m each", "Retention $7.5m each", (5e6, 7.5e6, "USD")),
+        ("rate of 12.5% of", "rate of 15% of", (12.5, 15.0, "%")),
+        ("EUR 2.5 million", "EUR 3 million", (2.5e6, 3e6, "EUR")),
+    ],
+)
+def test_amount_changes(old, new, change):
+    merged, deltas = merge(old, new)
+    assert old_text(merged) == old and new_text(merged) == new
+    assert [(d.old_value, d.new_value, d.unit) for d in deltas] == [change]
+    delta = deltas[0]
+    assert new[delta.offset :].startswith(delta.new_text)
+
+
+@pytest.mark.parametrize(
+    "old, new, old_amount, new_amount",
+    [
+        ("within 10,000 m of the", "within 20,000 m of the", "10,000", "20,000"),
+        ("items 1,000 b) and", "items 2,000 b) and", "1,000", "2,000"),
+        ("limit 5,000 k) each", "limit 6,000 k) each", "5,000", "6,000"),
+    ],
+)
+def test_letter_after_space_is_no_magnitude(old, new, old_amount, new_amount):
+    merged, deltas = merge(old, new)
+    assert old_text(merged) == old and new_text(merged) == new
+    assert [(d.old_text, d.new_text, d.unit) for d in deltas] == [
+        (old_amount, new_amount, "")
+    ]
+    assert deltas[0].new_value == float(new_amount.replace(",", ""))
+
+
+def test_years_and_clause_numbers_are_no_amounts():
+    _, deltas = merge("Article 12 of 2023", "Article 14 of 2024")
+    assert deltas == []
@@ -0,0 +1,65 @@
+import os
+import threading
+
+from reporter.core.object_cache import ObjectCache
+
+
+def test_entries_are_keyed_by_etag(tmp_path):
+    cache = ObjectCache(str(tmp_path), max_bytes=100)
+
+    cache.put("bucket", "a.md", '"v1"', b"first")
+
+    assert cache.get("bucket", "a.md", "v1") == b"first"
+    assert cache.get("bucket", "a.md", "v2") is None
+    assert cache.get("other", "a.md", "v1") is None
+    assert cache.snapshot() == {
+        "max_bytes": 100,
+        "entries": 1,
+        "bytes": 5,
+        "hits": 1,
+        "misses": 2,
+        "evictions": 0,
+    }
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ObjectCache(str(tmp_path), max_bytes=10)
+    cache.put("bucket", "a", "1", b"aaaa")
+    cache.put("bucket", "b", "1", b"bbbb")
+    for name in ("a", "b"):
+        os.utime(cache._entry("bucket", name, "1"), (1, 1))
+    # reading an entry makes it the most recently used
+    cache.get("bucket", "a", "1")
+
+    cache.put("bucket", "c", "1", b"cccc")
+
+    assert cache.get("bucket", "b", "1") is None
+    assert cache.get("bucket", "a", "1") == b"aaaa"
+    assert cache.get("bucket", "c", "1") == b"cccc"
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_objects_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = ObjectCache(str(tmp_path), max_bytes=3)
+
+    cache.put("bucket", "a", "1", b"aaaa")
+
+    assert cache.get("bucket", "a", "1") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_concurrent_writers_share_the_directory(tmp_path):
+    caches = [ObjectCache(str(tmp_path), max_bytes=1000) for _ in range(4)]
+
+    def write(cache: ObjectCache):
+        for _ in range(20):
+            cache.put("bucket", "a", "1", b"a" * 100)
+
+    threads = [threading.Thread(target=write, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [entry.suffix for entry in tmp_path.iterdir()] == [""]
+    assert caches[0].get("bucket", "a", "1") == b"a" * 100
@@ -0,0 +1,139 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from reporter.api.v1.endpoints import report
+from reporter.api.v1.endpoints.report import _etag_matches
+from reporter.core.config import settings
+from reporter.core.report_cache import report_cache_key
+from reporter.main import app
+
+ETAGS = {"submission_x/terms.json": '"abc"', "submission_x/wording.md": "def"}
+
+
+def _key(**kwargs) -> str:
+    arguments = {
+        "client": "Florida",
+        "etags": ETAGS,
+        "investigation_points": ["Check  the\nlimits", ""],
+        "agent_version": "2",
+    }
+    return report_cache_key(**(arguments | kwargs))
+
+
+def test_key_ignores_formatting():
+    assert _key() == _key(
+        client="florida",
+        etags={name: etag.strip('"') for name, etag in ETAGS.items()},
+        investigation_points=["Check the limits"],
+    )
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"client": "turkey"},
+        {"etags": ETAGS | {"submission_x/wording.md": "changed"}},
+        {"investigation_points": ["Check the premium"]},
+        {"agent_version": "3"},
+    ],
+)
+def test_key_changes_with_the_request(arguments):
+    assert _key(**arguments) != _key()
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [
+        ("REPORT_RETRIEVAL", False),
+        ("RETRIEVAL_TOP_K", 5),
+        ("EMBEDDING_BACKEND", "other"),
+        ("LLM_CHARS_PER_TOKEN", 3.5),
+        ("LLM_PROMPT_TOKEN_BUDGET", 1000),
+        ("LLM_PROMPT_BUDGETS", {"florida.pass1": 1000}),
+        ("LLM_REDUCTION_STRATEGY", "summarize"),
+    ],
+)
+def test_key_changes_with_the_prompt_settings(monkeypatch, setting, value):
+    key = _key()
+    monkeypatch.setattr(settings, setting, value)
+
+    assert _key() != key
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        ('"k"', True),
+        ('W/"k"', True),
+        ('"a", "k"', True),
+        ("*", True),
+        ('"a"', False),
+        ("k", False),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    assert _etag_matches(if_none_match, '"k"') is matches
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Serves /generate from a fake agent, counting its reports."""
+    calls = []
+
+    async def generate_report_for_client(client_name, inputs, **kwargs):
+        calls.append(client_name)
+        return {"report_markdown": f"report {len(calls)}", "status": "success"}
+
+    monkeypatch.setattr(
+        report, "stat_objects", lambda bucket, names: dict.fromkeys(names, "e1")
+    )
+    monkeypatch.setattr(report, "fetch_objects", lambda *args, **kwargs: {})
+    monkeypatch.setattr(
+        report, "generate_report_for_client", generate_report_for_client
+    )
+    return calls
+
+
+def test_generate_serves_cached_reports_and_not_modified(agent, monkeypatch):
+    http = TestClient(app)
+    request = {"client": f"client-{uuid.uuid4().hex}"}
+
+    first = http.post("/api/v1/generate", json=request)
+    etag = first.headers["ETag"]
+    cached = http.post("/api/v1/generate", json=request)
+    not_modified = http.post(
+        "/api/v1/generate", json=request, headers={"If-None-Match": etag}
+    )
+
+    assert first.json()["report_markdown"] == "report 1"
+    assert cached.json() == first.json() and cached.headers["ETag"] == etag
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert len(agent) == 1
+
+    # a changed prompt budget generates a new report with a new ETag
+    monkeypatch.setattr(settings, "LLM_PROMPT_TOKEN_BUDGET", 1000)
+    changed = http.post(
+        "/api/v1/generate", json=request, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.json()["report_markdown"] == "report 2"
+    assert changed.headers["ETag"] != etag
+
+
+def test_generate_does_not_cache_failed_reports(agent, monkeypatch):
+    async def fail(client_name, inputs, **kwargs):
+        agent.append(client_name)
+        return {"report_markdown": "", "status": "error", "error": "failed"}
+
+    monkeypatch.setattr(report, "generate_report_for_client", fail)
+    http = TestClient(app)
+    request = {"client": f"client-{uuid.uuid4().hex}"}
+
+    responses = [http.post("/api/v1/generate", json=request) for _ in range(2)]
+
+    assert [response.json()["status"] for response in responses] == ["error"] * 2
+    assert all("ETag" not in response.headers for response in responses)
+    assert len(agent) == 2
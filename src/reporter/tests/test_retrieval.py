@@ -0,0 +1,103 @@
+import asyncio
+import math
+
+import pytest
+
+from reporter.core.config import settings
+from reporter.core.hashing_embedding import HashingEmbedding
+from reporter.core.llm import UnknownEmbeddingBackendError, get_embed_model
+from reporter.util.orchestrator.retrieval import (
+    EXCERPT_SEPARATOR,
+    assemble_context,
+    get_submission_index,
+)
+
+TOPICS = [
+    "The hours clause limits each loss occurrence to 168 consecutive hours.",
+    "Terrorism is excluded under the NMA 2921 terrorism exclusion clause.",
+    "The premium is payable in four equal instalments each quarter.",
+    "Claims shall be notified to the reinsurer within thirty days.",
+]
+# a long wording, one paragraph per line
+WORDING = "\n\n".join(
+    f"Article {i}. {TOPICS[i % len(TOPICS)]} Filler text number {i} of the "
+    "contract wording that repeats the usual boilerplate language."
+    for i in range(400)
+)
+
+
+@pytest.fixture(autouse=True)
+def retrieval(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "hashing")
+    monkeypatch.setattr(settings, "REPORT_RETRIEVAL", True)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_TOKENS", 64)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_OVERLAP", 8)
+    monkeypatch.setattr(settings, "RETRIEVAL_TOP_K", 2)
+
+
+def test_hashing_embedding():
+    model = HashingEmbedding()
+    vector = model.get_text_embedding("hours clause")
+    assert vector == model.get_query_embedding("Hours clause")
+    assert math.isclose(sum(x * x for x in vector), 1.0)
+
+    def similarity(a, b):
+        return sum(
+            x * y for x, y in zip(model.get_text_embedding(a), vector, strict=True)
+        )
+
+    assert similarity(TOPICS[0], vector) > similarity(TOPICS[1], vector)
+
+
+def test_embedding_backends():
+    assert isinstance(get_embed_model("hashing"), HashingEmbedding)
+    assert get_embed_model() is get_embed_model("HASHING")
+    with pytest.raises(UnknownEmbeddingBackendError):
+        get_embed_model("nope")
+
+
+def assemble(documents, queries):
+    return asyncio.run(assemble_context(documents, queries))
+
+
+def test_excerpts_of_large_documents():
+    documents = {"terms": "Terms of the layers", "contract": WORDING}
+    context = assemble(documents, ["terrorism exclusion"])
+    assert context["terms"] == documents["terms"]
+
+    excerpts = context["contract"]
+    assert len(excerpts) < len(WORDING) / 10
+    assert "terrorism exclusion" in excerpts.lower()
+    # excerpts are parts of the wording, in document order
+    marker = EXCERPT_SEPARATOR.strip()
+    parts = [part.strip() for part in excerpts.split(marker) if part.strip()]
+    positions = [WORDING.index(part) for part in parts]
+    assert positions == sorted(positions)
+
+
+def test_small_documents_and_disabled_retrieval_are_whole(monkeypatch):
+    documents = {"contract": WORDING}
+    queries = ["hours clause"] * 1000
+    assert assemble(documents, queries) == documents
+
+    monkeypatch.setattr(settings, "REPORT_RETRIEVAL", False)
+    assert assemble(documents, ["hours clause"]) == documents
+
+
+def test_failed_retrieval_uses_whole_documents(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "nope")
+    documents = {"contract": WORDING}
+    assert assemble(documents, ["hours clause"]) == documents
+
+
+def test_index_is_built_once():
+    documents = {"contract": WORDING + " once"}
+
+    async def main():
+        return await asyncio.gather(
+            get_submission_index(documents), get_submission_index(documents)
+        )
+
+    first, second = asyncio.run(main())
+    assert first is second
+    assert asyncio.run(get_submission_index(documents)) is first
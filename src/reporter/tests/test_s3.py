@@ -0,0 +1,124 @@
+import hashlib
+import io
+
+import pytest
+from minio.error import S3Error
+
+from reporter.core import s3
+from reporter.core.object_cache import get_object_cache
+from reporter.core.s3 import MissingObjectError, ObjectChangedError, fetch_objects
+
+
+class _Stat:
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+class _Response(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class FakeS3:
+    """Serves objects from memory, replacing an object's body with the next
+    one in `updates` after its stat, like a writer racing the download."""
+
+    def __init__(self, objects: dict[str, bytes]):
+        self.objects = dict(objects)
+        self.updates: dict[str, list[bytes]] = {}
+        self.gets = 0
+
+    @staticmethod
+    def etag(data: bytes) -> str:
+        return hashlib.md5(data).hexdigest()
+
+    def _error(self, code: str, object_name: str) -> S3Error:
+        return S3Error(None, code, code, object_name, "request", "host")
+
+    def stat_object(self, bucket_name, object_name):
+        if object_name not in self.objects:
+            raise self._error("NoSuchKey", object_name)
+        etag = self.etag(self.objects[object_name])
+        if self.updates.get(object_name):
+            self.objects[object_name] = self.updates[object_name].pop(0)
+        return _Stat(etag)
+
+    def get_object(self, bucket_name, object_name, request_headers=None):
+        self.gets += 1
+        if object_name not in self.objects:
+            raise self._error("NoSuchKey", object_name)
+        data = self.objects[object_name]
+        if_match = (request_headers or {}).get("If-Match")
+        if if_match and if_match != f'"{self.etag(data)}"':
+            raise self._error("PreconditionFailed", object_name)
+        return _Response(data)
+
+
+@pytest.fixture
+def fake_s3(monkeypatch, request):
+    client = FakeS3(
+        {f"{request.node.name}/a": b"first a", f"{request.node.name}/b": b"first b"}
+    )
+    monkeypatch.setattr(s3, "get_s3_client", lambda: client)
+    return client
+
+
+def _names(request) -> list[str]:
+    return [f"{request.node.name}/a", f"{request.node.name}/b"]
+
+
+def test_fetches_and_caches_the_objects(fake_s3, request):
+    names = _names(request)
+
+    downloads = fetch_objects("bucket", names)
+    assert [downloads[name].data for name in names] == [b"first a", b"first b"]
+    assert not any(download.cached for download in downloads.values())
+
+    downloads = fetch_objects("bucket", names)
+    assert all(download.cached for download in downloads.values())
+    assert fake_s3.gets == 2
+
+
+def test_refetches_objects_changed_after_the_stat(fake_s3, request):
+    names = _names(request)
+    fake_s3.updates[names[1]] = [b"second b"]
+
+    downloads = fetch_objects("bucket", names)
+
+    assert downloads[names[1]].data == b"second b"
+    # only the bodies of the snapshot that was downloaded are cached
+    cache = get_object_cache()
+    assert cache.get("bucket", names[1], FakeS3.etag(b"first b")) is None
+    assert cache.get("bucket", names[1], FakeS3.etag(b"second b")) == b"second b"
+
+
+def test_changed_objects_of_a_given_snapshot_fail(fake_s3, request):
+    names = _names(request)
+    etags = s3.stat_objects("bucket", names)
+    fake_s3.objects[names[0]] = b"second a"
+
+    with pytest.raises(ObjectChangedError) as error:
+        fetch_objects("bucket", names, etags=etags)
+    assert error.value.object_names == [names[0]]
+
+
+def test_objects_changing_on_every_snapshot_fail(fake_s3, request, monkeypatch):
+    names = _names(request)
+    monkeypatch.setattr(s3.settings, "S3_SNAPSHOT_ATTEMPTS", 2)
+    fake_s3.updates[names[0]] = [b"second a", b"third a"]
+
+    with pytest.raises(ObjectChangedError):
+        fetch_objects("bucket", names)
+
+
+def test_missing_objects(fake_s3, request):
+    names = _names(request)
+
+    with pytest.raises(MissingObjectError) as error:
+        fetch_objects("bucket", [names[0], "missing"])
+    assert error.value.object_names == ["missing"]
+
+    etags = s3.stat_objects("bucket", names)
+    del fake_s3.objects[names[1]]
+    with pytest.raises(MissingObjectError):
+        fetch_objects("bucket", names, etags=etags)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from reporter.core.config import settings
+from reporter.util import significant_analysis
+from reporter.util.clause_diff import pair_clauses, summarize_clauses
+from reporter.util.diff_engines import run_diff_engine
+from reporter.util.significant_analysis import SignificantAnalysis, split_summary
+
+_CHANGE = re.compile(r"=+ CHANGE (\d+) =+")
+_PART = re.compile(r"This is part (\d+) of (\d+)")
+
+
+def _summary(clauses: int = 8, long_clause_changes: int = 12) -> str:
+    """A summary by clause of `clauses` changed clauses, the last of them with
+    `long_clause_changes` changes far apart."""
+    filler = " ".join(f"word{i}" for i in range(80))
+    old = "".join(
+        f"Article {i} - Title {i}\nThe limit is USD {i},000,000 each loss.\n\n"
+        for i in range(1, clauses)
+    )
+    old += f"Article {clauses} - Long\n" + "".join(
+        f"Item {i} retention {i}%. {filler}\n" for i in range(long_clause_changes)
+    )
+    new = old.replace("000,000", "500,000").replace("retention", "deductible")
+    pairs = pair_clauses(old, new)
+    for pair in pairs:
+        pair["diffs"], _ = run_diff_engine(
+            "word", pair.pop("old_text"), pair.pop("new_text"), False
+        )
+    return summarize_clauses(pairs)[0]
+
+
+def _changes(text: str) -> list[int]:
+    return [int(number) for number in _CHANGE.findall(text)]
+
+
+def test_short_summaries_are_one_chunk():
+    summary = _summary(clauses=2, long_clause_changes=1)
+
+    assert split_summary(summary, 10_000) == [summary]
+
+
+def test_chunks_are_cut_at_clause_and_change_boundaries():
+    summary = _summary()
+    max_tokens = 400
+    max_chars = max_tokens * settings.LLM_CHARS_PER_TOKEN
+
+    chunks = split_summary(summary, max_tokens)
+
+    assert len(chunks) > 2
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+    # every change block is in exactly one chunk, whole and in order
+    assert [n for chunk in chunks for n in _changes(chunk)] == _changes(summary)
+    blocks = re.split(r"\n(?=\n\n=+ CHANGE)", summary)
+    for block in blocks[1:]:
+        block = block.split("\nCLAUSE ")[0]
+        assert sum(block.strip() in chunk for chunk in chunks) == 1
+    for chunk in chunks[1:]:
+        assert chunk.startswith("CLAUSE ")
+    # a clause split between its changes repeats its label
+    continued = re.findall(r"^(.*) \(continued\)$", "\n".join(chunks), re.MULTILINE)
+    assert set(continued) == {"CLAUSE article-8 (Long): modified"}
+
+
+def _analysis(changes: list[str], impression: str = "Minor.") -> str:
+    return json.dumps(
+        {
+            "significant_changes": changes,
+            "overall_impression": impression,
+            "suggestions_for_investigation": ["Check the limits."],
+        }
+    )
+
+
+class FakeLLM:
+    """Analyses every part as its own change; merges as `reduce` says."""
+
+    def __init__(self, reduce: str = "ok"):
+        self.reduce = reduce
+        self.prompts: list[str] = []
+
+    def complete(self, prompt: str):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=_analysis(["Whole change."]))
+
+    async def acomplete(self, prompt: str):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0)
+        if "Merge them into a single analysis" in prompt:
+            if self.reduce == "raise":
+                raise RuntimeError("quota exceeded")
+            if self.reduce == "garbage":
+                return SimpleNamespace(text="Sorry, I cannot do that.")
+            return SimpleNamespace(text=_analysis(["Merged."], "Merged impression."))
+        part = _PART.search(prompt)
+        if part is None:
+            return SimpleNamespace(text=_analysis(["Whole change."]))
+        changes = [f"Change of part {part[1]}.", "Limits  increased."]
+        return SimpleNamespace(text=f"```json\n{_analysis(changes)}\n```")
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(significant_analysis, "get_llm", lambda: fake)
+    return fake
+
+
+def test_single_chunk_skips_the_reduce_step(llm):
+    analysis = SignificantAnalysis(_summary(clauses=2, long_clause_changes=1))
+
+    result = asyncio.run(analysis.arun_analysis())
+
+    assert result["significant_changes"] == ["Whole change."]
+    assert len(llm.prompts) == 1 and _PART.search(llm.prompts[0]) is None
+
+
+def test_chunks_are_analysed_and_reduced(llm):
+    analysis = SignificantAnalysis(_summary(), chunk_tokens=400)
+    count = len(analysis.chunks)
+
+    result = asyncio.run(analysis.arun_analysis())
+
+    assert result["significant_changes"] == ["Merged."]
+    assert result["overall_impression"] == "Merged impression."
+    parts = sorted(_PART.search(prompt).groups() for prompt in llm.prompts[:-1])
+    assert parts == sorted((str(i), str(count)) for i in range(1, count + 1))
+    # the reduce prompt carries every partial analysis
+    for i in range(1, count + 1):
+        assert f"Change of part {i}." in llm.prompts[-1]
+
+
+@pytest.mark.parametrize("reduce", ["raise", "garbage"])
+def test_failed_reduce_merges_without_the_llm(llm, reduce):
+    llm.reduce = reduce
+    analysis = SignificantAnalysis(_summary(), chunk_tokens=400)
+    count = len(analysis.chunks)
+
+    result = asyncio.run(analysis.arun_analysis())
+
+    assert result == {
+        "significant_changes": ["Change of part 1.", "Limits  increased."]
+        + [f"Change of part {i}." for i in range(2, count + 1)],
+        "overall_impression": " ".join(["Minor."] * count),
+        "suggestions_for_investigation": ["Check the limits."],
+    }
+
+
+def test_failed_chunk_fails_the_analysis(llm, monkeypatch):
+    analysis = SignificantAnalysis(_summary(), chunk_tokens=400)
+
+    async def garbage(prompt: str):
+        return SimpleNamespace(text="not json")
+
+    monkeypatch.setattr(llm, "acomplete", garbage)
+
+    assert "error" in asyncio.run(analysis.arun_analysis())
+
+
+def test_run_analysis_outside_and_inside_an_event_loop(llm):
+    analysis = SignificantAnalysis(_summary(), chunk_tokens=400)
+
+    assert analysis.run_analysis()["significant_changes"] == ["Merged."]
+
+    async def main():
+        # a synchronous caller on the event loop's thread
+        return analysis.run_analysis()
+
+    assert asyncio.run(main())["significant_changes"] == ["Merged."]
+    assert SignificantAnalysis("short").run_analysis()["significant_changes"] == [
+        "Whole change."
+    ]
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from reporter.core.singleflight import SingleFlight, get_single_flight
+
+
+def test_concurrent_calls_share_one_computation():
+    group = SingleFlight()
+    computations = []
+
+    async def compute(value: int) -> int:
+        computations.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        same = await asyncio.gather(
+            *(group.run("a", lambda: compute(1)) for _ in range(5))
+        )
+        other = await group.run("b", lambda: compute(2))
+        again = await group.run("a", lambda: compute(3))
+        return same, other, again
+
+    assert asyncio.run(main()) == ([1] * 5, 2, 3)
+    assert computations == [1, 2, 3]
+    assert group.snapshot() == {"calls": 7, "coalesced": 4, "in_flight": 0}
+
+
+def test_callers_share_the_exception():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("failed")
+
+    async def main():
+        return await asyncio.gather(
+            group.run("a", fail), group.run("a", fail), return_exceptions=True
+        )
+
+    errors = asyncio.run(main())
+    assert [str(error) for error in errors] == ["failed", "failed"]
+    assert group.coalesced == 1
+
+
+def test_cancelled_callers_do_not_cancel_the_computation():
+    group = SingleFlight()
+    finished = []
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        finished.append(True)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(group.run("a", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(group.run("a", compute))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert finished == [True]
+
+
+def test_groups_are_shared_by_name():
+    assert get_single_flight("test") is get_single_flight("test")
+    assert get_single_flight("test") is not get_single_flight("other test")
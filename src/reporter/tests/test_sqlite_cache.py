@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import pytest
+
+from reporter.core import sqlite_cache
+from reporter.core.llm_cache import CachedLLM
+from reporter.core.sqlite_cache import SqliteCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SqliteCache(str(tmp_path / "cache.db"), ttl_seconds=60, max_bytes=10)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(sqlite_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_get_and_set(cache):
+    assert cache.get("a") is None
+
+    cache.set("a", b"123")
+    cache.set("a", b"1234")
+
+    assert cache.get("a") == b"1234"
+    snapshot = cache.snapshot()
+    assert snapshot["entries"] == 1 and snapshot["bytes"] == 4
+    assert snapshot["hits"] == 1 and snapshot["misses"] == 1
+
+
+def test_entries_expire(cache, clock):
+    cache.set("a", b"1")
+    clock[0] += 61
+
+    assert cache.get("a") is None
+    assert cache.snapshot()["expirations"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    cache.set("a", b"1234")
+    clock[0] += 1
+    cache.set("b", b"1234")
+    clock[0] += 1
+    cache.get("a")
+    clock[0] += 1
+
+    cache.set("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_values_larger_than_the_cache_are_not_stored(cache):
+    cache.set("a", b"12345678901")
+
+    assert cache.get("a") is None
+
+
+def test_processes_share_the_database(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SqliteCache(path, ttl_seconds=60, max_bytes=10).set("a", b"1")
+
+    assert SqliteCache(path, ttl_seconds=60, max_bytes=10).get("a") == b"1"
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def _response(self, text: str, delta=None):
+        from llama_index.core.llms import CompletionResponse
+
+        return CompletionResponse(text=text, delta=delta)
+
+    async def acomplete(self, prompt: str, **kwargs):
+        self.calls += 1
+        return self._response(prompt.upper() if prompt != "empty" else "")
+
+    async def astream_complete(self, prompt: str, **kwargs):
+        self.calls += 1
+
+        async def stream():
+            for word in prompt.upper().split():
+                yield self._response("", delta=word)
+
+        return stream()
+
+
+def test_completions_are_cached(tmp_path):
+    cache = SqliteCache(str(tmp_path / "llm.db"), ttl_seconds=60, max_bytes=1000)
+    llm = FakeLLM()
+    cached = CachedLLM(llm, "model", 0.0, cache)
+
+    async def main():
+        first = await cached.acomplete("prompt")
+        second = await cached.acomplete("prompt")
+        other_model = await CachedLLM(llm, "other", 0.0, cache).acomplete("prompt")
+        await cached.acomplete("empty")
+        await cached.acomplete("empty")
+        return first.text, second.text, other_model.text
+
+    assert asyncio.run(main()) == ("PROMPT", "PROMPT", "PROMPT")
+    assert llm.calls == 4
+
+
+def test_streamed_completions_are_cached_once_consumed(tmp_path):
+    cache = SqliteCache(str(tmp_path / "llm.db"), ttl_seconds=60, max_bytes=1000)
+    llm = FakeLLM()
+    cached = CachedLLM(llm, "model", 0.0, cache)
+
+    async def stream() -> list[str]:
+        return [chunk.delta async for chunk in await cached.astream_complete("a b")]
+
+    async def main():
+        partial = await cached.astream_complete("a b")
+        await anext(partial)
+        return await stream(), await stream()
+
+    assert asyncio.run(main()) == (["A", "B"], ["AB"])
+    assert llm.calls == 2
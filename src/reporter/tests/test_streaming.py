@@ -0,0 +1,220 @@
+import asyncio
+import json
+import re
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from reporter.api.v1.endpoints import report
+from reporter.main import app
+from reporter.util.orchestrator.streaming import (
+    SectionStreamer,
+    complete_report_pass,
+    stream_completion,
+)
+
+REPORT = [
+    "# **Quotation",
+    " line**\nSuggest to offer ",
+    "All Layers: 5% and Top Layer: 2.5%\n",
+    "#",
+    "# Total line\nLimit [Total Limit $]\n",
+    "## Key findings\nNone.",
+]
+
+
+class FakeLLM:
+    """Answers every prompt with `deltas`, streamed or as one response."""
+
+    def __init__(self, deltas: list[str]):
+        self.deltas = deltas
+
+    async def acomplete(self, prompt: str):
+        return SimpleNamespace(text="".join(self.deltas))
+
+    async def astream_complete(self, prompt: str):
+        async def stream():
+            for delta in self.deltas:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(delta=delta)
+
+        return stream()
+
+
+_RATES = re.compile(r"All Layers: (\d+(?:\.\d+)?)%.*Top Layer: (\d+(?:\.\d+)?)%")
+
+
+def make_filler(text: str, final: bool):
+    """Fills "[Total Limit $]" once both participation rates can be parsed."""
+    match = _RATES.search(text)
+    if match is None:
+        return None
+    return lambda section: section.replace("[Total Limit $]", f"{match[1]}M")
+
+
+class Recorder:
+    def __init__(self):
+        self.events: list[tuple[str, dict]] = []
+
+    async def __call__(self, event: str, data: dict):
+        self.events.append((event, data))
+
+    def of(self, event: str) -> list[dict]:
+        return [data for name, data in self.events if name == event]
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_sections_split_at_headings_across_deltas():
+    emit = Recorder()
+
+    raw, filled = _run(complete_report_pass(FakeLLM(REPORT), "p", make_filler, emit))
+
+    assert raw == "".join(REPORT)
+    assert [data["delta"] for data in emit.of("token")] == REPORT
+    sections = emit.of("section")
+    assert [data["heading"] for data in sections] == [
+        "# **Quotation line**",
+        "## Total line",
+        "## Key findings",
+    ]
+    assert [data["index"] for data in sections] == [0, 1, 2]
+    assert sections[1]["markdown"] == "## Total line\nLimit 5M\n"
+    assert filled == "".join(data["markdown"] for data in sections)
+    assert filled == raw.replace("[Total Limit $]", "5M")
+
+
+def test_sections_are_held_until_the_filler_is_ready():
+    emit = Recorder()
+    deltas = ["# Intro\nText.\n", "## Rates\nSoon.\n", "## Quote\nAll Layers: 5%"]
+    deltas += [" Top Layer: 2%\n", "## End\n"]
+
+    async def main():
+        streamer = SectionStreamer(emit, make_filler, stage="report")
+        sections = []
+        for delta in deltas:
+            await streamer.feed(delta)
+            sections.append(len(emit.of("section")))
+        return sections
+
+    # the rates are parsed from finished sections only, the one holding them
+    # finishes when the next heading starts
+    assert _run(main()) == [0, 0, 0, 0, 3]
+    assert [event for event, _ in emit.events].index("section") == len(deltas)
+
+
+def test_finish_flushes_the_sections_left():
+    emit = Recorder()
+
+    async def main():
+        streamer = SectionStreamer(emit, make_filler, stage="report")
+        await streamer.feed("# Quote\nAll Layers: 5% Top Layer: 2%")
+        assert emit.of("section") == []
+        return await streamer.finish()
+
+    assert _run(main()) == "# Quote\nAll Layers: 5% Top Layer: 2%"
+    assert [data["heading"] for data in emit.of("section")] == ["# Quote"]
+
+
+def test_finish_emits_unfilled_sections_if_the_filler_never_is_ready():
+    emit = Recorder()
+
+    async def main():
+        streamer = SectionStreamer(emit, make_filler, stage="report")
+        await streamer.feed("Preamble\n# Quote\nNo rates.\n# End\n")
+        return await streamer.finish()
+
+    assert _run(main()) is None
+    sections = emit.of("section")
+    assert [data["heading"] for data in sections] == [None, "# Quote", "# End"]
+    assert "".join(data["markdown"] for data in sections) == (
+        "Preamble\n# Quote\nNo rates.\n# End\n"
+    )
+
+
+def test_completions_without_emit_are_not_streamed():
+    raw, filled = _run(complete_report_pass(FakeLLM(REPORT), "p", make_filler))
+
+    assert filled == raw.replace("[Total Limit $]", "5M")
+    assert _run(stream_completion(FakeLLM(["a", "b"]), "p")) == "ab"
+
+
+def test_stream_completion_emits_tokens():
+    emit = Recorder()
+
+    text = _run(stream_completion(FakeLLM(["a", "", "b"]), "p", emit, stage="x"))
+
+    assert text == "ab"
+    assert emit.events == [
+        ("token", {"stage": "x", "delta": "a"}),
+        ("token", {"stage": "x", "delta": "b"}),
+    ]
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Serves the report endpoints from `FakeLLM(REPORT)` without S3."""
+    calls = []
+
+    async def snapshot_submission(request):
+        return report.SubmissionSnapshot({}, uuid.uuid4().hex)
+
+    async def generate_report_for_client(client_name, inputs, **kwargs):
+        calls.append(client_name)
+        if client_name == "failing":
+            raise RuntimeError("agent failed")
+        _, filled = await complete_report_pass(
+            FakeLLM(REPORT), "prompt", make_filler, kwargs["emit"]
+        )
+        return {"report_markdown": filled, "status": "success"}
+
+    monkeypatch.setattr(report, "snapshot_submission", snapshot_submission)
+    monkeypatch.setattr(report, "fetch_objects", lambda *args, **kwargs: {})
+    monkeypatch.setattr(
+        report, "generate_report_for_client", generate_report_for_client
+    )
+    return calls
+
+
+def _events(client: str) -> list[tuple[str, dict]]:
+    http = TestClient(app)
+    with http.stream(
+        "POST", "/api/v1/generate/stream", json={"client": client}
+    ) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    events = []
+    for message in body.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+def test_report_stream_events(fake_agent):
+    events = _events("streaming")
+
+    names = [event for event, _ in events]
+    assert names[:2] == ["status", "status"]
+    assert [data["stage"] for _, data in events[:2]] == ["download", "generate"]
+    assert names[-1] == "done"
+    body = names[2:-1]
+    assert body.count("section") == 3 and body.count("token") == len(REPORT)
+    # the first section follows the delta completing the next heading
+    assert body.index("section") == REPORT.index("#") + 2
+    sections = [data for event, data in events if event == "section"]
+    assert events[-1][1] == {
+        "report_markdown": "".join(data["markdown"] for data in sections),
+        "status": "success",
+    }
+
+
+def test_report_stream_error(fake_agent):
+    events = _events("failing")
+
+    assert events[-1] == ("error", {"error": "Error Processing report: agent failed"})
+    assert "done" not in [event for event, _ in events]
+    assert fake_agent == ["failing"]
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from reporter.core import llm
+from reporter.core.config import settings
+from reporter.core.token_budget import (
+    ContextSource,
+    PromptTooLargeError,
+    check_prompt,
+    estimate_tokens,
+    fit_prompt,
+    prompt_token_snapshots,
+)
+
+
+@pytest.fixture(autouse=True)
+def budgets(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHARS_PER_TOKEN", 4.0)
+    monkeypatch.setattr(
+        settings, "LLM_PROMPT_BUDGETS", {"test": 1000, "summarize": 10_000}
+    )
+
+
+TERMS = ContextSource("terms", "T" * 400, priority=2)
+INFO = ContextSource("info", "I" * 800, priority=1)
+CONTRACT = ContextSource("contract", "C" * 8000)
+SOURCES = [TERMS, INFO, CONTRACT]
+TEMPLATE = (
+    f"Answer from the terms:\n{TERMS.placeholder}\n---\n{INFO.placeholder}\n"
+    f"---\n{CONTRACT.placeholder}\nEnd"
+)
+
+
+def fit(template=TEMPLATE, sources=SOURCES, strategy=None, call="test"):
+    return asyncio.run(fit_prompt(call, template, sources, strategy))
+
+
+def test_prompt_within_budget_is_filled_in():
+    sources = [ContextSource("terms", "terms text"), ContextSource("info", "")]
+    template = f"A {sources[0].placeholder} B {sources[1].placeholder} C"
+    assert fit(template, sources) == "A terms text B  C"
+
+
+@pytest.mark.parametrize("strategy", ["truncate", "drop"])
+def test_lowest_priority_source_is_reduced(strategy):
+    prompt = fit(strategy=strategy)
+    assert estimate_tokens(prompt) <= 1000
+    assert prompt.startswith(f"Answer from the terms:\n{TERMS.text}\n---\n{INFO.text}")
+    assert CONTRACT.text not in prompt and prompt.endswith("\nEnd")
+
+
+def test_summarize(monkeypatch):
+    prompts = []
+
+    class FakeLLM:
+        async def acomplete(self, prompt):
+            prompts.append(prompt)
+            return SimpleNamespace(text="  the contract in short  ")
+
+    monkeypatch.setattr(llm, "get_llm", FakeLLM)
+    prompt = fit(strategy="summarize")
+    assert prompt.endswith("---\nthe contract in short\nEnd")
+    assert len(prompts) == 1 and "contract" in prompts[0]
+
+
+def test_none_strategy_fails():
+    with pytest.raises(PromptTooLargeError) as error:
+        fit(strategy="none")
+    assert error.value.call == "test" and error.value.budget == 1000
+
+
+def test_prompt_that_cannot_fit_fails(monkeypatch):
+    monkeypatch.setitem(settings.LLM_PROMPT_BUDGETS, "test", 10)
+    with pytest.raises(PromptTooLargeError):
+        fit(strategy="drop")
+
+
+def test_source_text_in_the_template_is_left_alone():
+    # the contract text also appears before its placeholder, and two sources
+    # have the same text; only the placeholders are filled in
+    twin = ContextSource("twin", CONTRACT.text)
+    template = f"{CONTRACT.text[:50]}\n{CONTRACT.placeholder}\n{twin.placeholder}"
+    prompt = fit(template, [twin, CONTRACT], strategy="truncate")
+    assert prompt.startswith(CONTRACT.text[:50] + "\n")
+    assert estimate_tokens(prompt) <= 1000
+
+
+def test_empty_source_is_not_inserted_at_the_start():
+    empty = ContextSource("empty", "", priority=1)
+    template = f"Start\n{empty.placeholder}\n{CONTRACT.placeholder}"
+    prompt = fit(template, [empty, CONTRACT])
+    assert prompt.startswith("Start\n\nC") and estimate_tokens(prompt) <= 1000
+
+
+def test_duplicate_source_names():
+    with pytest.raises(ValueError):
+        fit(TEMPLATE, [TERMS, TERMS])
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        fit(strategy="shrink")
+
+
+def test_check_prompt_records_the_calls():
+    check_prompt("recorded", "x" * 40)
+    with pytest.raises(PromptTooLargeError):
+        check_prompt("recorded", "x" * 40_000_000)
+    assert prompt_token_snapshots()["recorded"] == {
+        "calls": 1,
+        "tokens": 10,
+        "max_tokens": 10,
+        "reduced": 0,
+        "rejected": 1,
+    }